@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Copyright 2022 Dell Inc. or its subsidiaries. All Rights Reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Client-side benchmark suite for sfsslib, run against the sfssmock stand-in
+server. For each data set size (number of hosts), the selected workloads
+report throughput and per-request latency percentiles:
+
+    pool        get_hosts() with a new connection per request vs. pooled keep-alive
+    list        get_hosts() and get_subsystems()
+    zoning      sfsszoning.BulkZoner.zone_hosts() without activation
+    activation  activate_zone_group()/deactivate_zone_group() of a zone group
+                holding one zone per host
+
+Usage:
+    ./benchmark.py [--sizes 10,1000,10000] [--workloads pool,list,zoning,activation]
+                   [--workers N] [--latency SECONDS] [--tls] [--routes]
+                   [--batch-size N]
+"""
+
+import sys
+import time
+import argparse
+import collections
+import concurrent.futures
+
+import urllib3
+import sfsslib
+import sfssmock
+import sfsszoning
+import sfssmetrics
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+class _TimedRestApi(sfsslib.RestApi):
+    '''RestApi recording the latency of every request, by HTTP method'''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = collections.defaultdict(list)
+        self.add_hook(lambda event: self.latencies[event.method].append(event.elapsed))
+
+
+def percentile(values: list, pct: float):
+    '''@return: The @pct percentile of @values (nearest-rank method)'''
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def _report(label: str, count: int, elapsed: float, latencies: list):
+    if latencies:
+        p50, p95, p99 = (percentile(latencies, pct) * 1000 for pct in (50, 95, 99))
+        stats = f'p50 {p50:8.2f} ms  p95 {p95:8.2f} ms  p99 {p99:8.2f} ms'
+    else:
+        stats = ''
+    print(f'  {label:<34} {count:7d} req {count / elapsed:10.1f} req/s  {stats}')
+
+
+def _client(server, args, **kwargs):
+    kwargs.setdefault('pool_size', args.workers)
+    # The workloads repeat identical GETs concurrently: measure them, do not coalesce them
+    kwargs.setdefault('coalesce', False)
+    if args.metrics is not None:
+        kwargs['hooks'] = [args.metrics]
+    return _TimedRestApi(server.address, 'admin', 'adminpass', scheme=server.scheme, **kwargs)
+
+
+def _repeat(func, count: int, workers: int):
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda _: func(), range(count)))
+    if not all(results):
+        sys.exit('Some requests failed')
+    return time.perf_counter() - start
+
+
+def bench_pool(server, args, size):
+    count = args.requests
+    for label, keep_alive in (('get_hosts, new connection/request', False), ('get_hosts, pooled keep-alive', True)):
+        with _client(server, args, keep_alive=keep_alive) as sfss:
+            elapsed = _repeat(lambda: sfss.get_hosts(1), count, args.workers)
+            _report(label, count, elapsed, sfss.latencies['GET'])
+
+
+def bench_list(server, args, size):
+    # Keep the amount of data transferred roughly constant across sizes
+    count = max(10, args.requests * 10 // max(size, 10))
+    for name in ('get_hosts', 'get_subsystems'):
+        with _client(server, args) as sfss:
+            func = getattr(sfss, name)
+            elapsed = _repeat(lambda: func(1), count, args.workers)
+            _report(name, count, elapsed, sfss.latencies['GET'])
+
+
+def bench_zoning(server, args, size):
+    zone_group_name = f'bench-zoning-{size}'
+    with _client(server, args) as sfss:
+        start = time.perf_counter()
+        result = sfsszoning.BulkZoner(sfss, max_workers=args.workers, batch_size=args.batch_size).zone_hosts(
+            1, zone_group_name, activate=False
+        )
+        elapsed = time.perf_counter() - start
+        if not result.ok:
+            sys.exit(f'Zoning failed: {result.failures[:5]}')
+        writes = sfss.latencies['POST']
+        label = f'zone_hosts ({len(result.zones)} zones{", $batch" if args.batch_size else ""})'
+        _report(label, len(writes), elapsed, writes)
+        sfss.delete_zone_group(1, result.zone_group_id)
+
+
+def bench_activation(server, args, size):
+    zone_group_name = f'bench-activation-{size}'
+    with _client(server, args) as sfss:
+        result = sfsszoning.BulkZoner(sfss, max_workers=args.workers).zone_hosts(1, zone_group_name, activate=False)
+        if not result.ok:
+            sys.exit(f'Zoning failed: {result.failures[:5]}')
+        sfss.latencies.clear()
+
+        count = 20
+        start = time.perf_counter()
+        for _ in range(count):
+            if not sfss.activate_zone_group(1, result.zone_group_id):
+                sys.exit('Activation failed')
+            if not sfss.deactivate_zone_group(1, result.zone_group_id):
+                sys.exit('Deactivation failed')
+        elapsed = time.perf_counter() - start
+        _report('activate + deactivate', 2 * count, elapsed, sfss.latencies['PUT'])
+        sfss.delete_zone_group(1, result.zone_group_id)
+
+
+WORKLOADS = {
+    'pool': bench_pool,
+    'list': bench_list,
+    'zoning': bench_zoning,
+    'activation': bench_activation,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='sfsslib benchmark suite (uses the sfssmock stand-in server)')
+    parser.add_argument('--sizes', default='10,1000,10000', help='Comma-separated numbers of hosts (default: 10,1000,10000)')
+    parser.add_argument('--subsystems', type=int, default=4, help='Number of subsystems (default: 4)')
+    parser.add_argument('--workloads', default=','.join(WORKLOADS), help=f'Comma-separated workloads (default: {",".join(WORKLOADS)})')
+    parser.add_argument('--workers', type=int, default=8, help='Client threads and pooled connections (default: 8)')
+    parser.add_argument('--requests', type=int, default=500, help='Base number of requests for pool/list (default: 500)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Server latency added to every request, in seconds (default: 0)')
+    parser.add_argument('--tls', action='store_true', help='Serve HTTPS with a self-signed certificate')
+    parser.add_argument('--batch-size', type=int, default=0, help='Zoning: send the writes with $batch requests of that size')
+    parser.add_argument('--routes', action='store_true', help='Also report the latency of every route (see sfssmetrics)')
+    args = parser.parse_args()
+    args.metrics = sfssmetrics.Metrics() if args.routes else None
+
+    workloads = args.workloads.split(',')
+    for workload in workloads:
+        if workload not in WORKLOADS:
+            sys.exit(f'Unknown workload: {workload}')
+
+    for size in (int(size) for size in args.sizes.split(',')):
+        with sfssmock.MockServer(
+            hosts=size, subsystems=args.subsystems, latency=args.latency, tls=args.tls, batch=args.batch_size > 0
+        ) as server:
+            print(f'{size} hosts, {args.subsystems} subsystems, {args.workers} workers, {server.scheme.upper()}')
+            for workload in workloads:
+                WORKLOADS[workload](server, args, size)
+            if args.metrics is not None:
+                print(args.metrics.report())
+                args.metrics.reset()
+
+
+if __name__ == '__main__':
+    main()
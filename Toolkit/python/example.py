@@ -17,43 +17,44 @@ limitations under the License.
 
 import sys
 import sfsslib
-
-sfss = sfsslib.RestApi('w.x.y.z', 'admin', 'adminpass')
-
-
-def zone(instance: int, zone_group_name: str):
-    zone_group_id = sfss.create_zone_group(instance, zone_group_name)
-    if zone_group_id is None:
-        sys.exit('Failed to create zone group')
-
-    # Create Zones foreach Host
-    hosts = sfss.get_hosts(instance)
-    for host in hosts:
-        zone_name = host['TransportAddress']
-        zone_id = sfss.create_zone(instance, zone_group_id, zone_name)
-        if zone_id is None:
-            sys.exit(f'Failed to create zone {zone_name}')
-
-        nqn = host['NQN']  # REVIEW: Unused
-        id = host['Id']
-        reply = sfss.add_zone_member(instance, zone_group_id, zone_id, id, 'Host')
-        if not reply.ok:
-            sys.exit('Failed to add zone member (Host)')
-
-        # For each subsystem, add subsystem NQN to the Host Zone
-        subsystems = sfss.get_subsystems(instance)
-        for subsystem in subsystems:
-            nqn = subsystem['NQN']  # REVIEW: Unused
-            id = subsystem['Id']
-            reply = sfss.add_zone_member(instance, zone_group_id, zone_id, id, 'Subsystem')
-            if not reply.ok:
-                sys.exit('Failed to add zone member (Subsystem)')
-
-    # Activate the Zone group
-    reply = sfss.activate_zone_group(instance, zone_group_id)
-    if not reply.ok:
-        sys.exit('Failed to activate zone group')
-
-
-zone(1, 'ZG-VLAN100')  # Zone A
-zone(2, 'ZG-VLAN200')  # Zone B
+import sfssfleet
+import sfsszoning
+
+ZONE_GROUPS = {
+    1: 'ZG-VLAN100',  # Zone A
+    2: 'ZG-VLAN200',  # Zone B
+}
+
+# Failed requests are retried (see sfsslib.RetryPolicy) and the limiter adapts the
+# number of concurrent requests to what the SFSS sustains without answering 429/5xx.
+fleet = sfssfleet.Fleet(
+    [sfssfleet.Endpoint('w.x.y.z', 'admin', 'adminpass', instances=tuple(ZONE_GROUPS))],
+    max_per_endpoint=len(ZONE_GROUPS),
+    pool_size=32,
+    make_limiter=lambda: sfsslib.AdaptiveLimiter(limit=8, max_limit=32),
+    retry=sfsslib.RetryPolicy(),
+)
+
+
+def zone(sfss: sfsslib.RestApi, instance: int):
+    # Create one zone per Host containing the Host and every Subsystem, then activate the zone group
+    return sfsszoning.BulkZoner(sfss, max_workers=16).zone_hosts(instance, ZONE_GROUPS[instance])
+
+
+# Both CDC instances are zoned in parallel
+failed = False
+for result in fleet.run(zone):
+    zone_group_name = ZONE_GROUPS[result.instance]
+    if not result.ok:
+        print(f'Zoning of {zone_group_name} on {result.endpoint} failed: {result.error}', file=sys.stderr)
+        failed = True
+        continue
+    for failure in result.value.failures:
+        print(f'Failed to {failure.operation} {failure.target} {failure.error}'.rstrip(), file=sys.stderr)
+    if not result.value.ok:
+        print(f'Zoning of {zone_group_name} completed with {len(result.value.failures)} failure(s)', file=sys.stderr)
+        failed = True
+
+fleet.close()
+if failed:
+    sys.exit(1)
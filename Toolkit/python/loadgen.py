@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Copyright 2022 Dell Inc. or its subsidiaries. All Rights Reserved.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Synthetic registration and zoning load generator for CDC scale testing.
+It drives the following phases against an SFSS (or the sfssmock stand-in
+server with --mock), each at a configurable rate and concurrency:
+
+    register    pull_register_ddc() of --ddcs DDCs, with consecutive addresses of --subnet
+    zones       create_zone() of --zones zones in a new zone group
+    members     add_zone_member() of --members hosts (and one subsystem) to every zone
+    activation  activate_zone_group()/deactivate_zone_group() of that zone group, --activations times
+
+then deletes everything it created (delete_zone_group() and delete_ddc()),
+also when a phase fails or the run is interrupted, unless --no-cleanup is
+given. It reports, per phase and for the cleanup, the throughput, the
+latency percentiles and the error rate. Requests are not retried unless
+--retries is given, so that the errors reported are those of the CDC.
+
+Usage:
+    ./loadgen.py [--address ADDR --username USER --password PASSWORD | --mock]
+                 [--ddcs N] [--zones N] [--members N] [--activations N]
+                 [--rate OPS_PER_SECOND] [--concurrency N] [--no-cleanup] [--routes] [--json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import ipaddress
+import threading
+import collections
+import dataclasses
+import concurrent.futures
+
+import urllib3
+import sfsslib
+import sfssmock
+import sfssmetrics
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+PHASES = ('register', 'zones', 'members', 'activation')
+
+
+class Pacer:
+    '''Spread the operations evenly at @rate per second (open loop); a @rate of 0 means no limit'''
+
+    def __init__(self, rate: float):
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.perf_counter()
+            start = max(self._next, now)
+            self._next = start + self._interval
+        if start > now:
+            time.sleep(start - now)
+
+
+@dataclasses.dataclass
+class PhaseResult:
+    name: str
+    ops: int = 0
+    elapsed: float = 0.0
+    latencies: list = dataclasses.field(default_factory=list)  # Seconds, one per call
+    errors: collections.Counter = dataclasses.field(default_factory=collections.Counter)  # reason -> count
+
+    @property
+    def error_rate(self):
+        return sum(self.errors.values()) / self.ops if self.ops else 0.0
+
+    def summary(self):
+        p50, p95, p99 = sfssmetrics.percentiles(self.latencies)
+        return {
+            'phase': self.name,
+            'ops': self.ops,
+            'elapsed': self.elapsed,
+            'throughput': self.ops / self.elapsed if self.elapsed else 0.0,
+            'p50': p50,
+            'p95': p95,
+            'p99': p99,
+            'error_rate': self.error_rate,
+            'errors': dict(self.errors),
+        }
+
+
+def run_phase(name: str, calls: list, concurrency: int, rate: float):
+    '''
+    Issue @calls, a list of (function, args), from @concurrency threads at
+    up to @rate calls per second. A call fails when it raises or returns a
+    false value (the sfsslib.RestApi convention).
+    @return: (PhaseResult, list of the values returned, None for failed calls)
+    '''
+    result = PhaseResult(name, ops=len(calls))
+    pacer = Pacer(rate)
+    lock = threading.Lock()
+
+    def call(func, args):
+        pacer.wait()
+        start = time.perf_counter()
+        try:
+            value = func(*args)
+            error = None if value else 'rejected'
+        except Exception as ex:  # pylint: disable=broad-except
+            value, error = None, type(ex).__name__
+        with lock:
+            result.latencies.append(time.perf_counter() - start)
+            if error is not None:
+                result.errors[error] += 1
+        return value if error is None else None
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        values = list(pool.map(lambda item: call(*item), calls))
+    result.elapsed = time.perf_counter() - start
+    return result, values
+
+
+@dataclasses.dataclass
+class Created:
+    '''What generate() created on the CDC, recorded as soon as created, for cleanup()'''
+
+    ddc_ids: list = dataclasses.field(default_factory=list)
+    zone_group_id: str = None
+
+
+# ******************************************************************************
+def generate(sfss: sfsslib.RestApi, args, results: list, created: Created):
+    '''
+    Run the phases selected in @args, appending their PhaseResults to
+    @results and recording in @created what must be deleted afterwards.
+    '''
+    instance = args.instance
+    phases = args.phases.split(',')
+    run = {'concurrency': args.concurrency, 'rate': args.rate}
+
+    if 'register' in phases:
+
+        def register(address: str):
+            reply = sfss.pull_register_ddc(instance, 'TCP', address, args.port, True)
+            if reply:
+                created.ddc_ids.append(reply.get('EId') or reply.get('Id'))
+            return reply
+
+        addresses = ipaddress.ip_network(args.subnet).hosts()
+        calls = [(register, (str(next(addresses)),)) for _ in range(args.ddcs)]
+        result, _ = run_phase('register', calls, **run)
+        results.append(result)
+
+    zone_group_id = None
+    if {'zones', 'members', 'activation'} & set(phases):
+        zone_group_id = created.zone_group_id = sfss.create_zone_group(instance, args.zone_group)
+        if zone_group_id is None:
+            sys.exit(f'Could not create zone group {args.zone_group}')
+
+    zone_ids = []
+    if 'zones' in phases:
+        calls = [(sfss.create_zone, (instance, zone_group_id, f'loadgen-{idx}')) for idx in range(args.zones)]
+        result, zone_ids = run_phase('zones', calls, **run)
+        results.append(result)
+        zone_ids = [zone_id for zone_id in zone_ids if zone_id]
+
+    if 'members' in phases and zone_ids:
+        hosts = [host['Id'] for host in sfss.get_hosts(instance, select=['Id'])]
+        subsystems = [subsystem['Id'] for subsystem in sfss.get_subsystems(instance, select=['Id'])]
+        if not hosts:
+            # Zoning by NQN does not require the hosts to be registered
+            hosts = [f'nqn.2014-08.org.nvmexpress:uuid:00000000-0000-0000-0000-{idx:012x}' for idx in range(args.members)]
+        calls = []
+        for idx, zone_id in enumerate(zone_ids):
+            for offset in range(args.members):
+                host = hosts[(idx * args.members + offset) % len(hosts)]
+                calls.append((sfss.add_zone_member, (instance, zone_group_id, zone_id, host, 'Host')))
+            if subsystems:
+                calls.append((sfss.add_zone_member, (instance, zone_group_id, zone_id, subsystems[idx % len(subsystems)], 'Subsystem')))
+        result, _ = run_phase('members', calls, **run)
+        results.append(result)
+
+    if 'activation' in phases:
+        # Activations of one zone group are sequential by nature
+        calls = []
+        for _ in range(args.activations):
+            calls.append((sfss.activate_zone_group, (instance, zone_group_id)))
+            calls.append((sfss.deactivate_zone_group, (instance, zone_group_id)))
+        result, _ = run_phase('activation', calls, concurrency=1, rate=args.rate)
+        results.append(result)
+
+
+
+def cleanup(sfss: sfsslib.RestApi, args, created: Created):
+    '''
+    Delete the DDCs and the zone group (with its zones) of @created
+    @return: A PhaseResult, None if there was nothing to delete
+    '''
+    calls = [(sfss.delete_ddc, (args.instance, ddc_id)) for ddc_id in created.ddc_ids]
+    if created.zone_group_id is not None:
+        calls.append((sfss.delete_zone_group, (args.instance, created.zone_group_id)))
+    if not calls:
+        return None
+    result, _ = run_phase('cleanup', calls, args.concurrency, args.rate)
+    return result
+
+
+def report(results: list):
+    lines = [f'{"phase":<12} {"ops":>7} {"seconds":>9} {"ops/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"errors":>8}  reasons']
+    for result in results:
+        row = result.summary()
+        latencies = ''.join(f' {row[q] * 1000:9.2f}' if row[q] is not None else f' {"":>9}' for q in ('p50', 'p95', 'p99'))
+        reasons = ', '.join(f'{reason}: {count}' for reason, count in result.errors.most_common())
+        lines.append(
+            f'{row["phase"]:<12} {row["ops"]:7d} {row["elapsed"]:9.2f} {row["throughput"]:9.1f}{latencies} {row["error_rate"]:8.2%}  {reasons}'
+        )
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic registration and zoning load generator for the CDC')
+    parser.add_argument('--address', default=os.environ.get('SFSS_ADDRESS'), help='SFSS address (default: $SFSS_ADDRESS)')
+    parser.add_argument('--username', default=os.environ.get('SFSS_USERNAME', 'admin'), help='Default: $SFSS_USERNAME or admin')
+    parser.add_argument('--password', default=os.environ.get('SFSS_PASSWORD'), help='Default: $SFSS_PASSWORD')
+    parser.add_argument('--mock', action='store_true', help='Run against a local sfssmock stand-in server')
+    parser.add_argument('--mock-hosts', type=int, default=1000, help='Hosts registered with the stand-in server (default: 1000)')
+    parser.add_argument('--instance', type=int, default=1, help='CDC instance (default: 1)')
+    parser.add_argument('--phases', default=','.join(PHASES), help=f'Comma-separated phases (default: {",".join(PHASES)})')
+    parser.add_argument('--ddcs', type=int, default=1000, help='DDCs to register (default: 1000)')
+    parser.add_argument('--subnet', default='10.200.0.0/16', help='Addresses of the DDCs (default: 10.200.0.0/16)')
+    parser.add_argument('--port', type=int, default=8009, help='TRSVCID of the DDCs (default: 8009)')
+    parser.add_argument('--zones', type=int, default=1000, help='Zones to create (default: 1000)')
+    parser.add_argument('--members', type=int, default=1, help='Host members per zone (default: 1)')
+    parser.add_argument('--zone-group', default='loadgen', help='Name of the zone group to create (default: loadgen)')
+    parser.add_argument('--activations', type=int, default=5, help='Activate/deactivate cycles (default: 5)')
+    parser.add_argument('--rate', type=float, default=0.0, help='Operations per second in every phase (default: no limit)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent operations (default: 16)')
+    parser.add_argument('--retries', type=int, default=0, help='Retries of failed requests (default: 0)')
+    parser.add_argument('--no-cleanup', action='store_true', help='Keep the DDCs and the zone group created')
+    parser.add_argument('--routes', action='store_true', help='Also report the latency and HTTP statuses of every route')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    args = parser.parse_args()
+
+    for phase in args.phases.split(','):
+        if phase not in PHASES:
+            sys.exit(f'Unknown phase: {phase}')
+    if not args.mock and not args.address:
+        sys.exit('--address (or SFSS_ADDRESS) or --mock is required')
+    if 'register' in args.phases.split(','):
+        try:
+            subnet = ipaddress.ip_network(args.subnet)
+        except ValueError as ex:
+            sys.exit(f'Invalid --subnet: {ex}')
+        if sum(1 for _ in itertools.islice(subnet.hosts(), args.ddcs)) < args.ddcs:
+            sys.exit(f'--subnet {args.subnet} has fewer than --ddcs {args.ddcs} addresses')
+
+    metrics = sfssmetrics.Metrics()
+    kwargs = {
+        'pool_size': args.concurrency,
+        'hooks': [metrics],
+        'retry': sfsslib.RetryPolicy(attempts=args.retries + 1),
+        'coalesce': False,
+    }
+    server = sfssmock.MockServer(hosts=args.mock_hosts).start() if args.mock else None
+    try:
+        if server is not None:
+            sfss = sfsslib.RestApi(server.address, 'admin', 'adminpass', scheme=server.scheme, **kwargs)
+        else:
+            sfss = sfsslib.RestApi(args.address, args.username, args.password, **kwargs)
+        results = []
+        created = Created()
+        with sfss:
+            try:
+                generate(sfss, args, results, created)
+            finally:
+                if not args.no_cleanup:
+                    result = cleanup(sfss, args, created)
+                    if result is not None:
+                        results.append(result)
+    finally:
+        if server is not None:
+            server.stop()
+
+    if args.json:
+        print(json.dumps({'phases': [result.summary() for result in results], 'routes': metrics.summary()}, indent=2))
+    else:
+        print(report(results))
+        if args.routes:
+            print(metrics.report())
+    if any(result.errors for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
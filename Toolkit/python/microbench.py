@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Copyright 2022 Dell Inc. or its subsidiaries. All Rights Reserved.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Microbenchmarks of the client-side cost of a sfsslib call, without any
+network I/O, for every JSON library installed:
+
+    encode    JsonCodec.dumps() of the bodies of the write requests
+    decode    JsonCodec.loads() of a get_hosts() reply of --hosts hosts, with and without strip_odata
+    dispatch  RestApi calls answered in-process with canned replies, i.e. the URI, headers,
+              encoding, reply wrapping, decoding and reply handler of every call
+
+Usage:
+    ./microbench.py [--benchmarks encode,decode,dispatch] [--codecs orjson,ujson,json]
+                    [--hosts N] [--seconds SECONDS]
+"""
+
+import sys
+import time
+import argparse
+
+import requests
+import sfsslib
+import sfssmock
+
+BENCHMARKS = ('encode', 'decode', 'dispatch')
+
+BODIES = {
+    'create_zone': {'ZoneName': 'zone-0001'},
+    'add_zone_member': {
+        'ZoneMemberId': 'nqn.2014-08.org.nvmexpress:uuid:00000000-0000-0000-0000-000000000001',
+        'ZoneMemberType': 'FullQualifiedName',
+        'Role': 'Host',
+    },
+    'pull_register_ddc': {
+        'TransportType': 'TCP',
+        'TransportAddress': '10.200.0.1',
+        'PortId': 8009,
+        'TransportAddressFamily': 'IPV4',
+        'Activate': True,
+    },
+}
+
+
+class _LoopbackRestApi(sfsslib.RestApi):
+    '''RestApi answering every request in-process with a canned reply: @listing for GETs, an EId otherwise'''
+
+    def __init__(self, listing: bytes, *args, **kwargs):
+        super().__init__('127.0.0.1', 'admin', 'adminpass', *args, **kwargs)
+        self._listing = listing
+
+    def _send(self, method: str, oid: str, data: bytes, headers, stream: bool, attempt: int):
+        self.__uri__(oid)
+        self.__hdrs__(headers)
+        reply = requests.Response()
+        reply.status_code = 200 if method == 'GET' else 201
+        reply._content = self._listing if method == 'GET' else b'{"EId":"config:zg:zone-0001"}'  # pylint: disable=protected-access
+        return reply
+
+
+def timeit(func, seconds: float):
+    '''@return: Microseconds per call of @func(), run repeatedly for about @seconds'''
+    func()
+    calls = 0
+    batch = 1
+    start = time.perf_counter()
+    while True:
+        for _ in range(batch):
+            func()
+        calls += batch
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return elapsed / calls * 1e6
+        batch *= 2
+
+
+def run(args):
+    '''@return: List of (benchmark, case, codec, microseconds per call)'''
+    codecs = []
+    for name in args.codecs.split(','):
+        try:
+            codecs.append(sfsslib.json_codec(name))
+        except ImportError:
+            print(f'{name} is not installed', file=sys.stderr)
+    benchmarks = args.benchmarks.split(',')
+    listing = sfsslib.json_codec('json').dumps({'Hosts': [sfssmock.make_host(1, idx) for idx in range(args.hosts)]})
+    rows = []
+
+    for codec in codecs:
+        if 'encode' in benchmarks:
+            for case, body in BODIES.items():
+                rows.append(('encode', case, codec.name, timeit(lambda: codec.dumps(body), args.seconds)))
+        if 'decode' in benchmarks:
+            rows.append(('decode', f'{args.hosts} hosts', codec.name, timeit(lambda: codec.loads(listing), args.seconds)))
+            stripped = _LoopbackRestApi(listing, codec=codec, strip_odata=True)._decode  # pylint: disable=protected-access
+            rows.append(('decode', f'{args.hosts} hosts, strip_odata', codec.name, timeit(lambda: stripped(listing), args.seconds)))
+        if 'dispatch' in benchmarks:
+            sfss = _LoopbackRestApi(listing, codec=codec, coalesce=False)
+            calls = {
+                'create_zone': lambda: sfss.create_zone(1, 'config:zg', 'zone-0001'),
+                'add_zone_member': lambda: sfss.add_zone_member(1, 'config:zg', 'config:zg:zone-0001', 'nqn.2014-08.org', 'Host'),
+                'pull_register_ddc': lambda: sfss.pull_register_ddc(1, 'TCP', '10.200.0.1', 8009, True),
+                f'get_hosts, {args.hosts} hosts': lambda: sfss.get_hosts(1),
+            }
+            for case, call in calls.items():
+                rows.append(('dispatch', case, codec.name, timeit(call, args.seconds)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmarks of the client-side cost of sfsslib calls')
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARKS), help=f'Default: {",".join(BENCHMARKS)}')
+    parser.add_argument('--codecs', default=','.join(sfsslib.JSON_LIBRARIES), help='JSON libraries (default: all installed)')
+    parser.add_argument('--hosts', type=int, default=1000, help='Hosts in the decoded listings (default: 1000)')
+    parser.add_argument('--seconds', type=float, default=0.5, help='Time spent on every case (default: 0.5)')
+    args = parser.parse_args()
+
+    for benchmark in args.benchmarks.split(','):
+        if benchmark not in BENCHMARKS:
+            sys.exit(f'Unknown benchmark: {benchmark}')
+
+    print(f'{"benchmark":<10} {"case":<32} {"codec":<8} {"us/call":>10}')
+    for benchmark, case, codec, micros in run(args):
+        print(f'{benchmark:<10} {case:<32} {codec:<8} {micros:10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Copyright 2022 Dell Inc. or its subsidiaries. All Rights Reserved.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Command-line client for the SFSS REST API (see sfsslib.RestApi).
+
+Usage:
+    ./sfss.py [--address ADDR] [--username USER] [--password PASSWORD] [--format json|csv]
+              [--batch FILE] [--socket PATH] COMMAND [ARGS...]
+
+Commands:
+    instances                                          List the CDC instances
+    hosts | subsystems | ddcs [--fields F1,F2...]      List the hosts, subsystems or DDCs
+    ddc add TRTYPE TRADDR TRSVCID [--no-activate]      Register a DDC (pull registration)
+    ddc delete DDC_ID
+    ddc sync FILE [--keep-stale] [--dry-run]           Register the DDCs of FILE ("TRTYPE TRADDR TRSVCID"
+                                                       lines) that are missing, delete the others
+    zone-groups                                        List the zone groups
+    zone-group create|delete|activate|deactivate NAME
+    zones ZONE_GROUP [--zonedb active]                 List the zones of a zone group
+    zone create|delete ZONE_GROUP ZONE
+    members ZONE_GROUP ZONE [--zonedb active]          List the members of a zone
+    member add ZONE_GROUP ZONE MEMBER_ID --role Host|Subsystem
+    serve                                              Run as a daemon, see --socket
+
+Every command accepts -i/--instance N (the CDC instance, default: 1).
+
+The address and credentials default to the SFSS_ADDRESS, SFSS_USERNAME and
+SFSS_PASSWORD environment variables. With --batch FILE ('-' for stdin), the
+commands of FILE, one per line, are run over a single connection. With
+--socket PATH (or SFSS_SOCKET), the command is run by "sfss.py serve" listening
+on PATH, which keeps its connection to the SFSS open across invocations;
+the client then does not even import sfsslib, so it starts in a few tens of
+milliseconds.
+@example:
+   export SFSS_ADDRESS=1.2.3.4 SFSS_USERNAME=admin SFSS_PASSWORD=adminpass
+   ./sfss.py --format csv hosts --fields NQN,TransportAddress
+   ./sfss.py zone-group create ZG-VLAN100
+   printf 'zone create ZG-VLAN100 zone1\\nmember add ZG-VLAN100 zone1 nqn... --role Host\\n' | ./sfss.py --batch -
+
+   SFSS_SOCKET=/tmp/sfss.sock ./sfss.py serve &
+   SFSS_SOCKET=/tmp/sfss.sock ./sfss.py hosts
+"""
+
+# Only light modules are imported here: sfsslib (and thus requests) is only
+# imported once a command has to talk to the SFSS.
+import os
+import io
+import csv
+import sys
+import json
+import shlex
+import argparse
+
+
+class _UsageError(Exception):
+    def __init__(self, message: str, status: int = 2):
+        super().__init__(message)
+        self.status = status
+
+
+class _CommandError(Exception):
+    pass
+
+
+class _Parser(argparse.ArgumentParser):
+    '''ArgumentParser raising _UsageError instead of exiting, so that a bad line does not end a batch'''
+
+    def error(self, message):
+        raise _UsageError(f'{self.prog}: error: {message}')
+
+    def exit(self, status=0, message=None):
+        raise _UsageError((message or '').rstrip('\n'), status)
+
+
+# ******************************************************************************
+def _zone_group_id(sfss, args, zonedb: str = 'config'):
+    if zonedb == 'config':
+        zone_group_id = sfss.get_zone_group_id(args.instance, args.zone_group)
+    else:
+        # Zone group IDs are "<zonedb>:<name>:<...>"
+        zone_group_ids = sfss.get_active_zonedbs(args.instance).get('ZoneGroups', [])
+        zone_group_id = next((zgid for zgid in zone_group_ids if zgid.split(':')[1] == args.zone_group), None)
+    if zone_group_id is None:
+        raise _CommandError(f'No zone group {args.zone_group} in the {zonedb} ZoneDB')
+    return zone_group_id
+
+
+def _zone_id(sfss, args, zone_group_id: str, zonedb: str = 'config'):
+    if zonedb == 'config':
+        zone_id = sfss.get_zone_id(args.instance, zone_group_id, args.zone)
+    else:
+        zones = sfss.get_zones(args.instance, zone_group_id, zonedb=zonedb)
+        zone_id = next((zone['ZoneId'] for zone in zones if zone.get('ZoneName') == args.zone), None)
+    if zone_id is None:
+        raise _CommandError(f'No zone {args.zone} in zone group {args.zone_group}')
+    return zone_id
+
+
+def _checked(value, what: str):
+    if not value:
+        raise _CommandError(f'The SFSS rejected: {what}')
+    return value
+
+
+def _list(sfss, args):
+    fields = args.fields.split(',') if args.fields else None
+    return getattr(sfss, f'get_{args.command}')(args.instance, select=fields)
+
+
+def _instances(sfss, args):
+    return sfss.get_cdc_instances()
+
+
+def _ddc_sync(sfss, args):
+    import sfssddc  # pylint: disable=import-outside-toplevel
+
+    targets = []
+    with open(args.file, encoding='utf-8') as file:
+        for number, line in enumerate(file, 1):
+            fields = shlex.split(line.replace(',', ' '), comments=True)
+            if not fields:
+                continue
+            if len(fields) != 3:
+                raise _CommandError(f'{args.file}:{number}: expected TRTYPE TRADDR TRSVCID')
+            targets.append(tuple(fields))
+
+    plans, result = sfssddc.DdcSync(sfss, prune=not args.keep_stale).sync({args.instance: targets}, args.dry_run)
+    if result is None:
+        rows = [{'Action': 'register', 'Target': ' '.join(map(str, key))} for key in plans[0].register]
+        rows += [{'Action': 'delete', 'Target': ddc['Id']} for ddc in plans[0].delete]
+        return rows
+    if result.failures:
+        raise _CommandError('\n'.join(f'{failure.operation} {failure.target}: {failure.error}' for failure in result.failures))
+    rows = [{'Action': 'register', 'Target': ' '.join(map(str, key))} for _, key in result.registered]
+    rows += [{'Action': 'delete', 'Target': ddc_id} for _, ddc_id in result.deleted]
+    return rows
+
+
+def _ddc(sfss, args):
+    if args.action == 'sync':
+        return _ddc_sync(sfss, args)
+    if args.action == 'add':
+        return _checked(
+            sfss.pull_register_ddc(args.instance, args.trtype, args.traddr, args.trsvcid, args.activate),
+            f'ddc add {args.trtype} {args.traddr} {args.trsvcid}',
+        )
+    _checked(sfss.delete_ddc(args.instance, args.ddc_id), f'ddc delete {args.ddc_id}')
+    return {'Id': args.ddc_id}
+
+
+def _zone_groups(sfss, args):
+    return [{'ZoneGroupId': zone_group_id, 'Name': zone_group_id.split(':')[1]} for zone_group_id in sfss.get_zone_group_ids(args.instance)]
+
+
+def _zone_group(sfss, args):
+    if args.action == 'create':
+        zone_group_id = _checked(sfss.create_zone_group(args.instance, args.zone_group), f'zone-group create {args.zone_group}')
+    else:
+        zone_group_id = _zone_group_id(sfss, args)
+        method = getattr(sfss, f'{args.action}_zone_group')
+        _checked(method(args.instance, zone_group_id), f'zone-group {args.action} {args.zone_group}')
+    return {'ZoneGroupId': zone_group_id}
+
+
+def _zones(sfss, args):
+    return sfss.get_zones(args.instance, _zone_group_id(sfss, args, args.zonedb), zonedb=args.zonedb)
+
+
+def _zone(sfss, args):
+    zone_group_id = _zone_group_id(sfss, args)
+    if args.action == 'create':
+        zone_id = _checked(sfss.create_zone(args.instance, zone_group_id, args.zone), f'zone create {args.zone_group} {args.zone}')
+    else:
+        zone_id = _zone_id(sfss, args, zone_group_id)
+        _checked(sfss.delete_zone(args.instance, zone_group_id, zone_id), f'zone delete {args.zone_group} {args.zone}')
+    return {'ZoneId': zone_id}
+
+
+def _members(sfss, args):
+    zone_group_id = _zone_group_id(sfss, args, args.zonedb)
+    zone_id = _zone_id(sfss, args, zone_group_id, args.zonedb)
+    return sfss.get_zone_members(args.instance, zone_group_id, zone_id, zonedb=args.zonedb)
+
+
+def _member(sfss, args):
+    zone_group_id = _zone_group_id(sfss, args)
+    zone_id = _zone_id(sfss, args, zone_group_id)
+    member_id = sfss.add_zone_member(args.instance, zone_group_id, zone_id, args.member, args.role)
+    _checked(member_id, f'member add {args.zone_group} {args.zone} {args.member}')
+    return {'ZoneMemberId': member_id}
+
+
+def _command_parser():
+    '''@return: The parser of the COMMAND [ARGS...] part of the command line (also used for --batch lines)'''
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-i', '--instance', type=int, default=1, help='CDC instance (default: 1)')
+
+    parser = _Parser(prog='sfss.py', description='SFSS command')
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND', required=True)
+
+    cmd = commands.add_parser('instances', parents=[common], help='List the CDC instances')
+    cmd.set_defaults(func=_instances)
+    for name in ('hosts', 'subsystems', 'ddcs'):
+        cmd = commands.add_parser(name, parents=[common], help=f'List the {name}')
+        cmd.add_argument('--fields', help='Comma-separated fields to return (default: all)')
+        cmd.set_defaults(func=_list)
+
+    cmd = commands.add_parser('ddc', help='Register, delete or synchronize DDCs')
+    actions = cmd.add_subparsers(dest='action', required=True)
+    action = actions.add_parser('add', parents=[common])
+    action.add_argument('trtype', help='Transport type, e.g. TCP')
+    action.add_argument('traddr', help='Transport address')
+    action.add_argument('trsvcid', type=int, help='Transport service ID (port)')
+    action.add_argument('--no-activate', dest='activate', action='store_false', help='Do not activate the DDC')
+    action = actions.add_parser('delete', parents=[common])
+    action.add_argument('ddc_id')
+    action = actions.add_parser('sync', parents=[common])
+    action.add_argument('file', help='One "TRTYPE TRADDR TRSVCID" line per DDC')
+    action.add_argument('--keep-stale', action='store_true', help='Do not delete the DDCs that are not in FILE')
+    action.add_argument('--dry-run', action='store_true', help='Only list the changes')
+    cmd.set_defaults(func=_ddc)
+
+    cmd = commands.add_parser('zone-groups', parents=[common], help='List the zone groups')
+    cmd.set_defaults(func=_zone_groups)
+    cmd = commands.add_parser('zone-group', parents=[common], help='Create, delete, activate or deactivate a zone group')
+    cmd.add_argument('action', choices=('create', 'delete', 'activate', 'deactivate'))
+    cmd.add_argument('zone_group', metavar='NAME')
+    cmd.set_defaults(func=_zone_group)
+
+    cmd = commands.add_parser('zones', parents=[common], help='List the zones of a zone group')
+    cmd.add_argument('zone_group', metavar='ZONE_GROUP')
+    cmd.add_argument('--zonedb', choices=('config', 'active'), default='config', help='ZoneDB to read (default: config)')
+    cmd.set_defaults(func=_zones)
+    cmd = commands.add_parser('zone', parents=[common], help='Create or delete a zone')
+    cmd.add_argument('action', choices=('create', 'delete'))
+    cmd.add_argument('zone_group', metavar='ZONE_GROUP')
+    cmd.add_argument('zone', metavar='ZONE')
+    cmd.set_defaults(func=_zone)
+
+    cmd = commands.add_parser('members', parents=[common], help='List the members of a zone')
+    cmd.add_argument('zone_group', metavar='ZONE_GROUP')
+    cmd.add_argument('zone', metavar='ZONE')
+    cmd.add_argument('--zonedb', choices=('config', 'active'), default='config', help='ZoneDB to read (default: config)')
+    cmd.set_defaults(func=_members)
+    cmd = commands.add_parser('member', help='Add a member to a zone')
+    actions = cmd.add_subparsers(dest='action', required=True)
+    action = actions.add_parser('add', parents=[common])
+    action.add_argument('zone_group', metavar='ZONE_GROUP')
+    action.add_argument('zone', metavar='ZONE')
+    action.add_argument('member', metavar='MEMBER_ID', help='Host or subsystem Id (or NQN)')
+    action.add_argument('--role', choices=('Host', 'Subsystem'), required=True)
+    cmd.set_defaults(func=_member)
+
+    commands.add_parser('serve', help='Run as a daemon serving the commands sent to --socket')
+    return parser
+
+
+# ******************************************************************************
+def _cell(value):
+    if isinstance(value, list):
+        return ';'.join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value)
+    return value
+
+
+def _format(result, fmt: str, compact: bool):
+    '''@return: @result (list of dicts, or dict) as text in format @fmt'''
+    if fmt == 'json':
+        return json.dumps(result, separators=(',', ':')) if compact else json.dumps(result, indent=2)
+
+    rows = result if isinstance(result, list) else [result]
+    columns = {}
+    for row in rows:
+        columns.update((key, None) for key in row if not key.startswith('@odata.'))
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=list(columns), extrasaction='ignore', lineterminator='\n')
+    writer.writeheader()
+    writer.writerows({key: _cell(value) for key, value in row.items()} for row in rows)
+    return out.getvalue().rstrip('\n')
+
+
+def _execute(sfss, parser, argv: list, fmt: str, compact: bool = False):
+    '''
+    Run the command @argv
+    @return: (exit status, output, error message)
+    '''
+    try:
+        args = parser.parse_args(argv)
+    except _UsageError as ex:  # Including --help, whose text is already printed
+        return ex.status, '', str(ex)
+    if args.command == 'serve':
+        return 2, '', 'serve cannot be run from a batch or through --socket'
+    try:
+        return 0, _format(args.func(sfss, args), fmt, compact), ''
+    except _CommandError as ex:
+        return 1, '', str(ex)
+    except Exception as ex:  # pylint: disable=broad-except
+        return 1, '', f'{type(ex).__name__}: {ex}'
+
+
+def _connect(args):
+    import urllib3  # pylint: disable=import-outside-toplevel
+    import sfsslib  # pylint: disable=import-outside-toplevel
+
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    if not args.address:
+        raise _UsageError('sfss.py: error: the SFSS address is required (--address or SFSS_ADDRESS)')
+    return sfsslib.RestApi(args.address, args.username, args.password, scheme=args.scheme)
+
+
+def _commands(args):
+    '''@return: An iterator of the commands to run: the command line's, or those of the --batch file'''
+    if args.batch is None:
+        yield args.command
+        return
+    with sys.stdin if args.batch == '-' else open(args.batch, encoding='utf-8') as file:
+        for line in file:
+            argv = shlex.split(line, comments=True)
+            if argv:
+                yield argv
+
+
+def _report(status: int, output: str, error: str):
+    if output:
+        print(output, flush=True)
+    if error:
+        print(error, file=sys.stderr, flush=True)
+    return status
+
+
+# ******************************************************************************
+def _serve(args, parser):
+    '''Keep one RestApi open and run the commands sent over the Unix socket args.socket'''
+    import signal  # pylint: disable=import-outside-toplevel
+    import socketserver  # pylint: disable=import-outside-toplevel
+
+    sfss = _connect(args)
+
+    class Handler(socketserver.StreamRequestHandler):
+        '''One JSON request per line: {"argv": [...], "format": ..., "compact": ...}, one JSON reply per line'''
+
+        def handle(self):
+            for line in self.rfile:
+                request = json.loads(line)
+                status, output, error = _execute(sfss, parser, request['argv'], request['format'], request['compact'])
+                self.wfile.write(json.dumps({'status': status, 'output': output, 'error': error}).encode() + b'\n')
+                self.wfile.flush()
+
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+    umask = os.umask(0o077)  # The socket gives access to the SFSS with the daemon's credentials
+    try:
+        server = socketserver.ThreadingUnixStreamServer(args.socket, Handler)
+    finally:
+        os.umask(umask)
+    server.daemon_threads = True
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # Remove the socket when stopped
+    print(f'Serving {args.address} on {args.socket} (Ctrl-C to stop)', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
+        sfss.close()
+
+
+def _remote(args):
+    '''Send the commands to the "sfss.py serve" daemon listening on args.socket'''
+    import socket  # pylint: disable=import-outside-toplevel
+
+    failed = 0
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(args.socket)
+        replies = sock.makefile('rb')
+        for argv in _commands(args):
+            sock.sendall(json.dumps({'argv': argv, 'format': args.format, 'compact': args.batch is not None}).encode() + b'\n')
+            reply = json.loads(replies.readline())
+            failed = max(failed, _report(reply['status'], reply['output'], reply['error']))
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Command-line client for the SFSS REST API',
+        epilog='Run "sfss.py COMMAND --help" for the arguments of COMMAND. Commands: instances, hosts, subsystems, '
+        'ddcs, ddc, zone-groups, zone-group, zones, zone, members, member, serve.',
+    )
+    parser.add_argument('--address', default=os.environ.get('SFSS_ADDRESS'), help='SFSS address (default: $SFSS_ADDRESS)')
+    parser.add_argument('--username', default=os.environ.get('SFSS_USERNAME', 'admin'), help='Default: $SFSS_USERNAME or admin')
+    parser.add_argument('--password', default=os.environ.get('SFSS_PASSWORD'), help='Default: $SFSS_PASSWORD')
+    parser.add_argument('--scheme', choices=('https', 'http'), default='https', help='Default: https')
+    parser.add_argument('--format', choices=('json', 'csv'), default='json', help='Output format (default: json)')
+    parser.add_argument('--batch', metavar='FILE', help="Run the commands of FILE ('-' for stdin), one per line, over one connection")
+    parser.add_argument('--socket', metavar='PATH', default=os.environ.get('SFSS_SOCKET'), help='Unix socket of "sfss.py serve" (default: $SFSS_SOCKET)')
+    parser.add_argument('command', nargs=argparse.REMAINDER, metavar='COMMAND [ARGS...]')
+    args = parser.parse_args()
+    if not args.command and args.batch is None:
+        parser.error('a COMMAND or --batch is required')
+
+    commands = _command_parser()
+    try:
+        if args.command[:1] == ['serve']:
+            if not args.socket:
+                parser.error('serve requires --socket or SFSS_SOCKET')
+            _serve(args, commands)
+            return 0
+        if args.socket and args.command[-1:] not in (['-h'], ['--help']):
+            return _remote(args)
+
+        sfss = None
+        failed = 0
+        for argv in _commands(args):
+            if sfss is None and argv[-1] not in ('-h', '--help'):
+                sfss = _connect(args)
+            failed = max(failed, _report(*_execute(sfss, commands, argv, args.format, compact=args.batch is not None)))
+        if sfss is not None:
+            sfss.close()
+        return failed
+    except _UsageError as ex:
+        print(ex, file=sys.stderr)
+        return ex.status
+    except OSError as ex:
+        print(f'sfss.py: {ex}', file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
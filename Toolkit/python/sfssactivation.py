@@ -0,0 +1,232 @@
+"""
+Copyright 2022 Dell Inc. or its subsidiaries. All Rights Reserved.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Staged activation of many zone groups, waiting for the active ZoneDB to
+reflect each one.
+
+activate_zone_group() and deactivate_zone_group() return as soon as the SFSS
+accepts the request. ActivationPipeline (de)activates zone groups, possibly
+on several CDC instances, concurrently and in stages (a stage starts once the
+previous one has converged), then polls the active ZoneDB of every zone group
+until it matches the config ZoneDB (or no longer lists the zone group, for a
+deactivation). The polling interval starts short, grows while the zone
+group shows no change in the active ZoneDB and starts over when it does.
+The result gives the time-to-active of every zone group.
+
+Polls must reach the SFSS: give the pipeline a RestApi without a ZoneCache
+nor a DiskCache with max_age. Concurrent polls of the same active ZoneDB are
+coalesced into one request by the RestApi.
+@example:
+   sfss = sfsslib.RestApi('1.2.3.4', 'admin', 'adminpass')
+   pipeline = sfssactivation.ActivationPipeline(sfss, stage_size=10, timeout=120)
+   result = pipeline.run([(1, 'ZG-VLAN100'), (1, 'ZG-VLAN200'), (2, 'ZG-VLAN300')])
+   for activation in result.activations:
+       print(activation.zone_group, activation.converged, activation.time_to_active)
+   print(result.summary())
+"""
+
+import time
+import dataclasses
+import concurrent.futures
+import sfsslib
+import sfssmetrics
+
+
+@dataclasses.dataclass
+class Activation:
+    '''The (de)activation of one zone group. Times are in seconds since the start of the pipeline.'''
+
+    instance: int
+    zone_group: str  # Name
+    stage: int = 0
+    zone_group_id: str = None
+    accepted: bool = False  # The SFSS accepted the request
+    converged: bool = False  # The active ZoneDB reflects the change
+    submitted: float = None
+    active: float = None  # When the active ZoneDB was first seen to reflect the change
+    polls: int = 0
+    error: str = ''
+
+    @property
+    def time_to_active(self):
+        return None if self.active is None else self.active - self.submitted
+
+
+@dataclasses.dataclass
+class PipelineResult:
+    activations: list = dataclasses.field(default_factory=list)
+    elapsed: float = 0.0
+    halted: bool = False  # A stage failed and the next ones were not run
+
+    @property
+    def ok(self):  # pylint: disable=invalid-name
+        return all(activation.converged for activation in self.activations)
+
+    @property
+    def failures(self):
+        return [activation for activation in self.activations if not activation.converged]
+
+    def summary(self):
+        '''@return: A dict of counts and of the exact p50/p95/p99 time-to-active of the converged zone groups'''
+        times = [activation.time_to_active for activation in self.activations if activation.converged]
+        p50, p95, p99 = sfssmetrics.percentiles(times)
+        return {
+            'zone_groups': len(self.activations),
+            'converged': len(times),
+            'elapsed': self.elapsed,
+            'p50': p50,
+            'p95': p95,
+            'p99': p99,
+            'polls': sum(activation.polls for activation in self.activations),
+            'halted': self.halted,
+        }
+
+
+# ******************************************************************************
+class ActivationPipeline:
+    '''
+    @param stage_size: Zone groups per stage, 0 for a single stage
+    @param timeout: Seconds a zone group may take to show in the active ZoneDB
+    @param min_interval: First polling interval, in seconds
+    @param max_interval: Longest polling interval, in seconds
+    @param backoff: Factor applied to the polling interval after every poll
+    @param halt_on_failure: Do not run the next stages once a zone group failed to converge
+    '''
+
+    def __init__(
+        self,
+        sfss: sfsslib.RestApi,
+        max_workers: int = 16,
+        stage_size: int = 0,
+        timeout: float = 300.0,
+        min_interval: float = 0.1,
+        max_interval: float = 5.0,
+        backoff: float = 1.5,
+        halt_on_failure: bool = True,
+    ):
+        self._sfss = sfss
+        self._max_workers = max_workers
+        self._stage_size = stage_size
+        self._timeout = timeout
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._backoff = backoff
+        self._halt_on_failure = halt_on_failure
+
+    def run(self, zone_groups: list, deactivate: bool = False):
+        '''
+        (De)activate @zone_groups, a list of (instance, zone group name), in
+        stages of @stage_size zone groups.
+        @return: A PipelineResult
+        '''
+        size = self._stage_size or len(zone_groups) or 1
+        return self.run_stages([zone_groups[idx : idx + size] for idx in range(0, len(zone_groups), size)], deactivate)
+
+    def run_stages(self, stages: list, deactivate: bool = False):
+        '''
+        (De)activate the zone groups of each stage of @stages, a list of lists of
+        (instance, zone group name), concurrently, one stage after the other.
+        @return: A PipelineResult
+        '''
+        result = PipelineResult()
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers) as pool:
+            for number, stage in enumerate(stages):
+                activations = [Activation(instance, name, number) for instance, name in stage]
+                result.activations.extend(activations)
+                if result.halted:
+                    for activation in activations:
+                        activation.error = 'not run: a previous stage failed'
+                    continue
+                list(pool.map(lambda activation: self._run(activation, deactivate, start), activations))
+                if self._halt_on_failure and not all(activation.converged for activation in activations):
+                    result.halted = number < len(stages) - 1
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def _run(self, activation: Activation, deactivate: bool, start: float):
+        sfss = self._sfss
+        instance = activation.instance
+        try:
+            activation.zone_group_id = sfss.get_zone_group_id(instance, activation.zone_group)
+            if activation.zone_group_id is None:
+                activation.error = 'zone group not found'
+                return
+            expected = None if deactivate else self._contents(instance, activation.zone_group_id, 'config')
+        except Exception as ex:  # pylint: disable=broad-except
+            activation.error = str(ex) or type(ex).__name__
+            return
+
+        activation.submitted = time.perf_counter() - start
+        change = sfss.deactivate_zone_group if deactivate else sfss.activate_zone_group
+        try:
+            activation.accepted = bool(change(instance, activation.zone_group_id))
+        except Exception as ex:  # pylint: disable=broad-except
+            activation.error = str(ex)
+        if not activation.accepted:
+            activation.error = activation.error or 'rejected'
+            return
+
+        interval = self._min_interval
+        deadline = activation.submitted + self._timeout
+        seen = error = None
+        while True:
+            activation.polls += 1
+            previous = seen
+            try:
+                converged, seen = self._poll(activation, expected)
+                error = None
+            except Exception as ex:  # pylint: disable=broad-except
+                converged, error = False, str(ex) or type(ex).__name__  # Poll again
+            now = time.perf_counter() - start
+            if converged:
+                activation.converged = True
+                activation.active = now
+                return
+            if now + interval > deadline:
+                activation.error = f'not {"deactivated" if deactivate else "active"} after {self._timeout:g} seconds'
+                if error is not None:
+                    activation.error += f' (last poll: {error})'
+                return
+            time.sleep(interval)
+            if previous is not None and seen != previous:
+                interval = self._min_interval  # Things are moving: look again soon
+            else:
+                interval = min(interval * self._backoff, self._max_interval)
+
+    def _poll(self, activation: Activation, expected: frozenset):
+        '''
+        @return: (True if the active ZoneDB reflects the (de)activation, what it shows of the zone group).
+            @expected is None for a deactivation.
+        '''
+        # Zone group IDs are "<zonedb>:<name>:<NQN>"
+        active_ids = tuple(
+            zone_group_id
+            for zone_group_id in self._sfss.get_active_zonedbs(activation.instance).get('ZoneGroups', [])
+            if zone_group_id.split(':')[1] == activation.zone_group
+        )
+        if expected is None:
+            return not active_ids, active_ids
+        # Only read the zones once the zone group is listed
+        contents = tuple(self._contents(activation.instance, zone_group_id, 'active') for zone_group_id in active_ids)
+        return expected in contents, (active_ids, contents)
+
+    def _contents(self, instance: int, zone_group_id: str, zonedb: str):
+        '''@return: The frozenset of (zone name, member) of a zone group of ZoneDB @zonedb'''
+        contents = set()
+        for zone in self._sfss.get_zones(instance, zone_group_id, zonedb=zonedb):
+            zone_id = zone['ZoneId']
+            contents.add((zone['ZoneName'], None))  # Empty zones count too
+            for member in self._sfss.get_zone_members(instance, zone_group_id, zone_id, zonedb=zonedb) or []:
+                # ZoneMemberId is '<zone ID>:<member>'
+                contents.add((zone['ZoneName'], member['ZoneMemberId'].removeprefix(f'{zone_id}:')))
+        return frozenset(contents)
@@ -0,0 +1,154 @@
+"""
+Copyright 2022 Dell Inc. or its subsidiaries. All Rights Reserved.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Bring the DDCs (Direct Discovery Controllers, i.e. the storage arrays
+registered with pull_register_ddc()) of CDC instances to a desired list.
+
+The existing DDCs are indexed by normalized transport tuple (transport type,
+address as parsed by the ipaddress module, port), so that '10.0.0.1' and
+'fd00::1' match however they were written. Only the missing DDCs are
+registered and, unless told otherwise, the DDCs that are not in the list
+(and the duplicates of the same tuple) are deleted. All the requests of all
+the instances run concurrently, with at most @max_workers in flight.
+@example:
+   sfss = sfsslib.RestApi('1.2.3.4', 'admin', 'adminpass')
+   targets = {1: [('TCP', '10.10.10.1', 8009), ('TCP', 'fd00::11', 8009)], 2: [('TCP', '10.10.20.1', 4420)]}
+   plans, result = sfssddc.DdcSync(sfss).sync(targets)
+   print(f'{len(result.registered)} registered, {len(result.deleted)} deleted, {result.unchanged} unchanged')
+"""
+
+import ipaddress
+import dataclasses
+import collections
+import concurrent.futures
+import sfsslib
+import sfsszoning
+
+
+def ddc_key(trtype: str, traddr: str, trsvcid):
+    '''@return: The normalized (transport type, transport address, port) tuple of a DDC'''
+    address = str(traddr).strip().strip('[]')
+    try:
+        address = ipaddress.ip_address(address).compressed
+    except ValueError:
+        address = address.lower()  # A host name
+    try:
+        port = int(trsvcid)
+    except (TypeError, ValueError):
+        port = trsvcid
+    return str(trtype).upper(), address, port
+
+
+def _existing_key(ddc: dict):
+    return ddc_key(ddc.get('TransportType'), ddc.get('TransportAddress'), ddc.get('PortId'))
+
+
+@dataclasses.dataclass
+class SyncPlan:
+    '''The changes needed to bring the DDCs of one CDC instance to the desired list'''
+
+    instance: int
+    register: list = dataclasses.field(default_factory=list)  # Normalized tuples to register
+    delete: list = dataclasses.field(default_factory=list)  # DDC dicts to delete
+    unchanged: int = 0
+
+    def __len__(self):
+        return len(self.register) + len(self.delete)
+
+
+@dataclasses.dataclass
+class SyncResult:
+    registered: list = dataclasses.field(default_factory=list)  # (instance, normalized tuple)
+    deleted: list = dataclasses.field(default_factory=list)  # (instance, DDC Id)
+    unchanged: int = 0
+    failures: list = dataclasses.field(default_factory=list)  # sfsszoning.Failures
+
+    @property
+    def ok(self):  # pylint: disable=invalid-name
+        return not self.failures
+
+
+class DdcSync:
+    '''
+    @param activate: The Activate flag of the DDCs registered
+    @param prune: Delete the DDCs that are not in the desired list, and the duplicates
+    '''
+
+    def __init__(self, sfss: sfsslib.RestApi, max_workers: int = 16, activate: bool = True, prune: bool = True):
+        self._sfss = sfss
+        self._max_workers = max_workers
+        self._activate = activate
+        self._prune = prune
+
+    def sync(self, targets: dict, dry_run: bool = False):
+        '''
+        Plan and, unless @dry_run is True, apply the changes.
+        @param targets: {instance: [(trtype, traddr, trsvcid), ...]}
+        @return: (list of SyncPlans, SyncResult or None when @dry_run is True)
+        '''
+        plans = self.plan(targets)
+        return plans, None if dry_run else self.apply(plans)
+
+    def plan(self, targets: dict):
+        '''
+        Read the DDCs of the instances of @targets (concurrently) and compare them with @targets.
+        @return: List of SyncPlans, one per instance
+        '''
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers) as pool:
+            existing = {instance: pool.submit(self._sfss.get_ddcs, instance) for instance in targets}
+            return [self._plan(instance, wanted, existing[instance].result()) for instance, wanted in targets.items()]
+
+    def _plan(self, instance: int, wanted: list, ddcs: list):
+        index = collections.defaultdict(list)  # Normalized tuple -> existing DDCs
+        for ddc in ddcs:
+            index[_existing_key(ddc)].append(ddc)
+
+        plan = SyncPlan(instance)
+        keys = dict.fromkeys(ddc_key(*target) for target in wanted)  # Deduplicated, in order
+        for key in keys:
+            if key in index:
+                plan.unchanged += 1
+            else:
+                plan.register.append(key)
+        if self._prune:
+            for key, same in index.items():
+                plan.delete.extend(same if key not in keys else same[1:])
+        return plan
+
+    def apply(self, plans: list):
+        '''
+        Register and delete the DDCs of @plans, all instances at once.
+        @return: A SyncResult
+        '''
+        result = SyncResult(unchanged=sum(plan.unchanged for plan in plans))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers) as pool:
+            futures = {}
+            for plan in plans:
+                for trtype, traddr, trsvcid in plan.register:
+                    future = pool.submit(self._sfss.pull_register_ddc, plan.instance, trtype, traddr, trsvcid, self._activate)
+                    futures[future] = ('pull_register_ddc', plan.instance, (trtype, traddr, trsvcid))
+                for ddc in plan.delete:
+                    futures[pool.submit(self._sfss.delete_ddc, plan.instance, ddc['Id'])] = ('delete_ddc', plan.instance, ddc['Id'])
+
+            for future in concurrent.futures.as_completed(futures):
+                operation, instance, target = futures[future]
+                try:
+                    error = '' if future.result() else 'rejected'
+                except Exception as ex:  # pylint: disable=broad-except
+                    error = str(ex)
+                if error:
+                    result.failures.append(sfsszoning.Failure(operation, f'{instance}:{target}', error))
+                elif operation == 'pull_register_ddc':
+                    result.registered.append((instance, target))
+                else:
+                    result.deleted.append((instance, target))
+        return result
@@ -0,0 +1,276 @@
+"""
+Copyright 2022 Dell Inc. or its subsidiaries. All Rights Reserved.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Offline connectivity index of a CDC instance.
+
+take_snapshot() reads the hosts, the subsystems and the zones of the config
+and active ZoneDBs once (concurrently). FabricIndex then answers, without
+any further request, which subsystems a host can reach, which hosts are
+orphaned and which zones overlap. Host and subsystem NQNs are mapped to
+small integers and every zone is stored as the sorted ids of its hosts and
+of its subsystems. The subsystems each host can reach, the hosts each
+subsystem is reachable from and the orphans are updated as the zones are
+added, so that the queries are lookups whatever the size of the fabric.
+@example:
+   sfss = sfsslib.RestApi('1.2.3.4', 'admin', 'adminpass')
+   index = sfssfabric.FabricIndex(sfssfabric.take_snapshot(sfss, 1))
+   print(index.reachable('nqn.2014-08.org.nvmexpress:uuid:83294d56-1ebf-a154-d613-a7cb28c6ef39'))
+   print(index.orphaned_hosts())
+"""
+
+import dataclasses
+import concurrent.futures
+import sfsslib
+
+ZONEDBS = ('active', 'config')
+
+
+# ******************************************************************************
+def take_snapshot(sfss: sfsslib.RestApi, instance: int, max_workers: int = 16):
+    '''
+    Read the hosts, subsystems, DDCs and zones (config and active ZoneDBs) of CDC instance @instance.
+    @return: A dict: {
+            'instance': int,
+            'cdc': CDC instance dict,
+            'hosts': [host dict, ...],
+            'subsystems': [subsystem dict, ...],
+            'ddcs': [DDC dict, ...],
+            'zonedbs': {'active'|'config': {zone group ID: {zone ID: {'ZoneName': str, 'members': {member: role}}}}},
+        }
+        where member is the host/subsystem Id (or NQN) as given to add_zone_member().
+    '''
+    snapshot = {'instance': instance, 'zonedbs': {zonedb: {} for zonedb in ZONEDBS}}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+        hosts = pool.submit(sfss.get_hosts, instance)
+        subsystems = pool.submit(sfss.get_subsystems, instance)
+        ddcs = pool.submit(sfss.get_ddcs, instance)
+        cdc = pool.submit(sfss.get_cdc_instance, instance)
+        zone_group_ids = {
+            'config': pool.submit(sfss.get_zone_group_ids, instance),
+            'active': pool.submit(lambda: sfss.get_active_zonedbs(instance).get('ZoneGroups', [])),
+        }
+
+        zones = []  # (zonedb, zone group ID, future of the zones)
+        for zonedb, future in zone_group_ids.items():
+            for zone_group_id in future.result():
+                snapshot['zonedbs'][zonedb][zone_group_id] = {}
+                zones.append((zonedb, zone_group_id, pool.submit(sfss.get_zones, instance, zone_group_id, zonedb=zonedb)))
+
+        members = []  # (zonedb, zone group ID, zone ID, future of the members)
+        for zonedb, zone_group_id, future in zones:
+            for zone in future.result():
+                zone_id = zone['ZoneId']
+                snapshot['zonedbs'][zonedb][zone_group_id][zone_id] = {'ZoneName': zone['ZoneName'], 'members': {}}
+                future = pool.submit(sfss.get_zone_members, instance, zone_group_id, zone_id, zonedb=zonedb)
+                members.append((zonedb, zone_group_id, zone_id, future))
+
+        for zonedb, zone_group_id, zone_id, future in members:
+            zone = snapshot['zonedbs'][zonedb][zone_group_id][zone_id]
+            for member in future.result():
+                # ZoneMemberId is '<zone ID>:<member>'
+                zone['members'][member['ZoneMemberId'].removeprefix(f'{zone_id}:')] = member.get('Role')
+
+        snapshot['cdc'] = cdc.result()
+        snapshot['hosts'] = hosts.result()
+        snapshot['subsystems'] = subsystems.result()
+        snapshot['ddcs'] = ddcs.result()
+    return snapshot
+
+
+# ******************************************************************************
+def _nqn(member: str):
+    '''@return: The NQN of a host/subsystem Id ("<NQN>@<address>...") or NQN'''
+    return member.split('@', 1)[0]
+
+
+class _Names:
+    '''Bidirectional mapping between names and consecutive integer ids'''
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def add(self, name: str):
+        idx = self.ids.get(name)
+        if idx is None:
+            idx = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return idx
+
+    def decode(self, ids):
+        '''@return: The names of @ids, in id order'''
+        return [self.names[idx] for idx in sorted(ids)]
+
+
+class _ZoneDb:
+    '''
+    The zones of one ZoneDB, as sorted tuples of member ids. Hosts 0 to
+    @hosts - 1 and subsystems 0 to @subsystems - 1 are the registered ones,
+    orphaned until a zone gives them something to reach.
+    '''
+
+    def __init__(self, hosts: int = 0, subsystems: int = 0):
+        self.zones = []  # (zone group ID, zone name)
+        self.zone_hosts = []  # zone id -> host ids
+        self.zone_subsystems = []  # zone id -> subsystem ids
+        self.host_zones = {}  # host id -> zone ids
+        self.subsystem_zones = {}  # subsystem id -> zone ids
+        self.reach = {}  # host id -> frozenset of subsystem ids, one object per distinct set
+        self._sets = {}  # Those frozensets
+        self.reached = {}  # subsystem id -> set of host ids
+        self.orphaned_hosts = set(range(hosts))
+        self.orphaned_subsystems = set(range(subsystems))
+
+    def add_zone(self, zone_group_id: str, zone_name: str, hosts: list, subsystems: list):
+        zone = len(self.zones)
+        self.zones.append((zone_group_id, zone_name))
+        hosts = tuple(sorted(set(hosts)))
+        subsystems = tuple(sorted(set(subsystems)))
+        self.zone_hosts.append(hosts)
+        self.zone_subsystems.append(subsystems)
+        for host in hosts:
+            self.host_zones.setdefault(host, []).append(zone)
+        for subsystem in subsystems:
+            self.subsystem_zones.setdefault(subsystem, []).append(zone)
+        if not hosts or not subsystems:
+            return
+
+        reach = self._shared(frozenset(subsystems))
+        for host in hosts:
+            before = self.reach.get(host)
+            self.reach[host] = reach if before is None or before <= reach else self._shared(before | reach)
+        for subsystem in subsystems:
+            self.reached.setdefault(subsystem, set()).update(hosts)
+        self.orphaned_hosts.difference_update(hosts)
+        self.orphaned_subsystems.difference_update(subsystems)
+
+    def _shared(self, subsystems: frozenset):
+        return self._sets.setdefault(subsystems, subsystems)
+
+
+@dataclasses.dataclass
+class Overlap:
+    '''Two zones sharing at least one host'''
+
+    zone_a: tuple  # (zone group ID, zone name)
+    zone_b: tuple
+    hosts: list  # NQNs of the shared hosts
+    subsystems: list  # NQNs of the shared subsystems
+
+
+class FabricIndex:
+    '''
+    Connectivity index built from a take_snapshot() dict. Hosts and
+    subsystems are identified by NQN; zone members given by Id are reduced
+    to their NQN. The @zonedb parameter of the queries is 'active' (the
+    default: what the hosts can currently reach) or 'config'.
+    '''
+
+    def __init__(self, snapshot: dict):
+        self.hosts = _Names()
+        self.subsystems = _Names()
+        for host in snapshot.get('hosts', []):
+            self.hosts.add(host['NQN'])
+        for subsystem in snapshot.get('subsystems', []):
+            self.subsystems.add(subsystem['NQN'])
+        # Registered hosts/subsystems (the lowest ids), as opposed to those only found in zones
+        self._registered_hosts = len(self.hosts.names)
+        self._registered_subsystems = len(self.subsystems.names)
+
+        self._zonedbs = {}
+        for zonedb, zone_groups in snapshot.get('zonedbs', {}).items():
+            index = self._zonedbs[zonedb] = _ZoneDb(self._registered_hosts, self._registered_subsystems)
+            for zone_group_id, zones in zone_groups.items():
+                for zone in zones.values():
+                    hosts, subsystems = [], []
+                    for member, role in zone['members'].items():
+                        if role == 'Subsystem':
+                            subsystems.append(self.subsystems.add(_nqn(member)))
+                        else:
+                            hosts.append(self.hosts.add(_nqn(member)))
+                    index.add_zone(zone_group_id, zone['ZoneName'], hosts, subsystems)
+
+    def _zonedb(self, zonedb: str):
+        index = self._zonedbs.get(zonedb)
+        if index is None:
+            index = self._zonedbs[zonedb] = _ZoneDb(self._registered_hosts, self._registered_subsystems)
+        return index
+
+    def reachable(self, host_nqn: str, zonedb: str = 'active'):
+        '''@return: The NQNs of the subsystems that host @host_nqn shares a zone with'''
+        host = self.hosts.ids.get(host_nqn)
+        if host is None:
+            return []
+        return self.subsystems.decode(self._zonedb(zonedb).reach.get(host, ()))
+
+    def can_reach(self, host_nqn: str, subsystem_nqn: str, zonedb: str = 'active'):
+        host = self.hosts.ids.get(host_nqn)
+        subsystem = self.subsystems.ids.get(subsystem_nqn)
+        if host is None or subsystem is None:
+            return False
+        return subsystem in self._zonedb(zonedb).reach.get(host, ())
+
+    def reaching(self, subsystem_nqn: str, zonedb: str = 'active'):
+        '''@return: The NQNs of the hosts that share a zone with subsystem @subsystem_nqn'''
+        subsystem = self.subsystems.ids.get(subsystem_nqn)
+        if subsystem is None:
+            return []
+        return self.hosts.decode(self._zonedb(zonedb).reached.get(subsystem, ()))
+
+    def orphaned_hosts(self, zonedb: str = 'active'):
+        '''@return: The NQNs of the registered hosts that cannot reach any subsystem'''
+        return self.hosts.decode(self._zonedb(zonedb).orphaned_hosts)
+
+    def orphaned_subsystems(self, zonedb: str = 'active'):
+        '''@return: The NQNs of the registered subsystems that no host can reach'''
+        return self.subsystems.decode(self._zonedb(zonedb).orphaned_subsystems)
+
+    def unregistered_members(self, zonedb: str = 'active'):
+        '''@return: (host NQNs, subsystem NQNs) found in zones but not registered with the CDC'''
+        index = self._zonedb(zonedb)
+        hosts = [self.hosts.names[host] for host in index.host_zones if host >= self._registered_hosts]
+        subsystems = [
+            self.subsystems.names[subsystem] for subsystem in index.subsystem_zones if subsystem >= self._registered_subsystems
+        ]
+        return hosts, subsystems
+
+    def overlaps(self, zonedb: str = 'active'):
+        '''@return: The list of Overlaps, i.e. pairs of zones sharing one or more hosts'''
+        index = self._zonedb(zonedb)
+        pairs = set()
+        for zones in index.host_zones.values():
+            if len(zones) > 1:
+                pairs.update((a, b) for i, a in enumerate(zones) for b in zones[i + 1 :])
+        return [
+            Overlap(
+                index.zones[a],
+                index.zones[b],
+                self.hosts.decode(set(index.zone_hosts[a]).intersection(index.zone_hosts[b])),
+                self.subsystems.decode(set(index.zone_subsystems[a]).intersection(index.zone_subsystems[b])),
+            )
+            for a, b in sorted(pairs)
+        ]
+
+    def pending(self):
+        '''
+        Reachability changes that activating every zone group of the config ZoneDB would make.
+        @return: dict of host NQN -> (subsystem NQNs gained, subsystem NQNs lost)
+        '''
+        active = self._zonedb('active')
+        config = self._zonedb('config')
+        changes = {}
+        for host in set(active.host_zones) | set(config.host_zones):
+            before = active.reach.get(host, frozenset())
+            after = config.reach.get(host, frozenset())
+            if before != after:
+                changes[self.hosts.names[host]] = (self.subsystems.decode(after - before), self.subsystems.decode(before - after))
+        return changes
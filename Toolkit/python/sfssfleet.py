@@ -0,0 +1,182 @@
+"""
+Copyright 2022 Dell Inc. or its subsidiaries. All Rights Reserved.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Run the same query or operation across several SFSS deployments and all
+their CDC instances in parallel. The Fleet holds one sfsslib.RestApi per
+endpoint and bounds the number of tasks running against each endpoint, so
+a fleet-wide inventory takes about as long as the slowest endpoint.
+@example:
+   fleet = sfssfleet.Fleet([
+       sfssfleet.Endpoint('1.2.3.4', 'admin', 'adminpass'),
+       sfssfleet.Endpoint('5.6.7.8', 'admin', 'adminpass', instances=(1, 2)),
+   ])
+   results = fleet.call('get_hosts')
+   for endpoint, instance, host in sfssfleet.items(results):
+       print(endpoint, instance, host['NQN'])
+"""
+
+import time
+import dataclasses
+import concurrent.futures
+import sfsslib
+
+
+@dataclasses.dataclass
+class Endpoint:
+    '''An SFSS deployment. When @instances is None, the CDC instances are discovered with get_cdc_instances().'''
+
+    address: str
+    username: str
+    password: str
+    instances: tuple = None
+
+
+@dataclasses.dataclass
+class Result:
+    '''The outcome of one task, tagged by endpoint and CDC instance (None for endpoint-wide tasks)'''
+
+    endpoint: str
+    instance: int = None
+    value: object = None
+    error: str = ''
+    elapsed: float = 0.0
+
+    @property
+    def ok(self):  # pylint: disable=invalid-name
+        return not self.error
+
+
+def items(results: list):
+    '''
+    Merge list results into a single sequence.
+    @return: An iterator of (endpoint, instance, item) for every item of every successful result
+    '''
+    for result in results:
+        if result.ok and result.value:
+            for item in result.value:
+                yield result.endpoint, result.instance, item
+
+
+class Fleet:
+    '''
+    One sfsslib.RestApi per Endpoint, with at most @max_per_endpoint tasks
+    running against each endpoint at any time. Extra keyword arguments are
+    passed to every RestApi (e.g. hooks, retry); pool_size defaults to
+    @max_per_endpoint. A ZoneCache or an AdaptiveLimiter must not be shared
+    between endpoints: @make_cache and @make_limiter, when given, are called
+    once per endpoint to create them.
+    '''
+
+    def __init__(self, endpoints: list, max_per_endpoint: int = 4, make_cache=None, make_limiter=None, **kwargs):
+        kwargs.setdefault('pool_size', max_per_endpoint)
+        self._endpoints = {endpoint.address: endpoint for endpoint in endpoints}
+        self._apis = {}
+        for endpoint in endpoints:
+            if make_cache is not None:
+                kwargs['cache'] = make_cache()
+            if make_limiter is not None:
+                kwargs['limiter'] = make_limiter()
+            self._apis[endpoint.address] = sfsslib.RestApi(endpoint.address, endpoint.username, endpoint.password, **kwargs)
+        # One pool per endpoint, so that a busy endpoint cannot hold up the others
+        self._pools = {
+            endpoint.address: concurrent.futures.ThreadPoolExecutor(max_workers=max_per_endpoint) for endpoint in endpoints
+        }
+        self._instances = {}  # address -> list of discovered instances
+        self._discovery_errors = {}  # address -> why its instances could not be discovered
+
+    def close(self):
+        for pool in self._pools.values():
+            pool.shutdown()
+        for sfss in self._apis.values():
+            sfss.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def api(self, address: str):
+        '''@return: The RestApi object of endpoint @address'''
+        return self._apis[address]
+
+    def instances(self, refresh: bool = False):
+        '''
+        @return: dict of endpoint address -> list of CDC instance numbers. Instances that
+            were not given in the Endpoint are discovered (in parallel) and remembered.
+            The endpoints whose discovery failed (see discovery_errors()) have none.
+        '''
+        missing = [
+            address
+            for address, endpoint in self._endpoints.items()
+            if endpoint.instances is None and (refresh or address not in self._instances)
+        ]
+        for result in self._map(lambda sfss: sfss.get_cdc_instances(), [(address, None) for address in missing]):
+            if result.ok and result.value:
+                self._instances[result.endpoint] = [int(cdc['InstanceIdentifier']) for cdc in result.value]
+                self._discovery_errors.pop(result.endpoint, None)
+            else:
+                self._instances.pop(result.endpoint, None)
+                self._discovery_errors[result.endpoint] = result.error or 'no CDC instance found'
+
+        return {
+            address: list(endpoint.instances) if endpoint.instances is not None else self._instances.get(address, [])
+            for address, endpoint in self._endpoints.items()
+        }
+
+    def discovery_errors(self):
+        '''@return: dict of endpoint address -> error, for the endpoints whose CDC instances could not be discovered'''
+        return dict(self._discovery_errors)
+
+    def run(self, func, per_instance: bool = True):
+        '''
+        Run @func(sfss, instance) for every CDC instance of every endpoint, or
+        @func(sfss) once per endpoint if @per_instance is False.
+        Exceptions are reported in the Results instead of being raised, and an
+        endpoint whose CDC instances could not be discovered gets one failed
+        Result (with instance None).
+        @return: The list of Results, in endpoint then instance order
+        '''
+        if per_instance:
+            instances = self.instances()
+            targets = [(address, instance) for address, numbers in instances.items() for instance in numbers]
+            done = iter(self._map(func, targets))
+            results = []
+            for address, numbers in instances.items():
+                if address in self._discovery_errors:
+                    results.append(Result(address, error=f'CDC instance discovery failed: {self._discovery_errors[address]}'))
+                results.extend(next(done) for _ in numbers)
+            return results
+        return self._map(func, [(address, None) for address in self._endpoints])
+
+    def call(self, method: str, *args, **kwargs):
+        '''
+        Call the sfsslib.RestApi method @method for every CDC instance of every endpoint,
+        with the instance number as first argument followed by @args and @kwargs.
+        @return: The list of Results
+        @example:
+           results = fleet.call('get_zone_group_id', 'ZG-VLAN100')
+        '''
+        return self.run(lambda sfss, instance: getattr(sfss, method)(instance, *args, **kwargs))
+
+    def _map(self, func, targets: list):
+        futures = [self._pools[address].submit(self._task, func, address, instance) for address, instance in targets]
+        return [future.result() for future in futures]
+
+    def _task(self, func, address: str, instance: int):
+        sfss = self._apis[address]
+        start = time.perf_counter()
+        try:
+            value = func(sfss) if instance is None else func(sfss, instance)
+            return Result(address, instance, value, elapsed=time.perf_counter() - start)
+        except Exception as ex:  # pylint: disable=broad-except
+            return Result(address, instance, error=str(ex) or type(ex).__name__, elapsed=time.perf_counter() - start)
@@ -12,94 +12,932 @@ limitations under the License.
 """
 # Authors: Martin Belanger <Martin.Belanger@dell.com>
 
+import os
+import re
+import sys
 import json
+import time
+import random
+import codecs
+import functools
+import threading
+import dataclasses
+import collections
 import ipaddress
+import concurrent.futures
 import requests
 
+# asyncio and sqlite3 are only imported when AsyncRestApi, AdaptiveLimiter.acquire_async()
+# or DiskCache are used, to keep "import sfsslib" (e.g. for a command-line tool) fast.
 
-class RestApi:
-    def __init__(self, ip_addr: str, username: str, password: str):
-        self._url = f'https://{ip_addr}/redfish/v1'
+JSON_LIBRARIES = ('orjson', 'ujson', 'json')
+
+_ACCEPT_JSON = {'Accept': 'application/json'}
+
+# Annotations that sfsslib never uses, dropped from the replies with strip_odata=True
+_ODATA_ANNOTATIONS = ('@odata.type', '@odata.context', '@odata.etag')
+
+
+@dataclasses.dataclass(frozen=True)
+class JsonCodec:
+    '''The JSON encoder and decoder of request and reply bodies: dumps() returns bytes, loads() accepts bytes'''
+
+    name: str
+    dumps: object
+    loads: object
+
+
+def _strip_odata(value):
+    '''Remove the _ODATA_ANNOTATIONS of decoded reply @value and of the items of its collections, in place'''
+    if isinstance(value, dict):
+        for key in _ODATA_ANNOTATIONS:
+            value.pop(key, None)
+        for items in value.values():
+            if isinstance(items, list):
+                for item in items:
+                    if isinstance(item, dict):
+                        for key in _ODATA_ANNOTATIONS:
+                            item.pop(key, None)
+    return value
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+@functools.lru_cache(maxsize=None)
+def json_codec(library: str = None):
+    '''
+    @param library: 'orjson', 'ujson' or 'json'. By default, the first of them that is installed.
+    @return: A JsonCodec
+    @raise ImportError: @library is not installed
+    '''
+    for name in (library,) if library else JSON_LIBRARIES:
+        try:
+            if name == 'orjson':
+                import orjson  # pylint: disable=import-outside-toplevel
+
+                return JsonCodec(name, orjson.dumps, orjson.loads)
+            if name == 'ujson':
+                import ujson  # pylint: disable=import-outside-toplevel
+
+                return JsonCodec(name, lambda obj: ujson.dumps(obj, escape_forward_slashes=False).encode(), ujson.loads)
+        except ImportError:
+            if library:
+                raise
+            continue
+        if name == 'json':
+            return JsonCodec(name, _json_dumps, json.loads)
+    raise ValueError(f'Unknown JSON library {library}')
+
+
+def _dict_reply(reply):
+    '''@return: The reply's JSON body as a dict on success, empty dict otherwise.'''
+    return reply.json() if reply.ok else {}
+
+
+def _eid_reply(reply):
+    '''@return: The 'EId' of the created entity on success, None otherwise.'''
+    return reply.json().get('EId') if reply.ok else None
+
+
+def _ok_reply(reply):
+    '''@return: True on success, False otherwise.'''
+    return reply.ok
+
+
+def _list_reply(key: str):
+    '''@return: A reply handler returning the list found under @key on success, empty list otherwise.'''
+
+    def handler(reply):
+        return reply.json().get(key, []) if reply.ok else []
+
+    return handler
+
+
+def _zonedb_ids(items: list):
+    return [item['@odata.id'] for item in items]
+
+
+def _zone_id(zone: dict):
+    return None if zone is None else zone.get('ZoneId')
+
+
+def _items(listing):
+    return list(listing.items)
+
+
+def _zone_group_name(zone_group_id: str):
+    return zone_group_id.split(':')[1]
+
+
+def _zone_name(zone: dict):
+    return zone.get('ZoneName')
+
+
+def _zone_member_id(member: dict):
+    return member.get('ZoneMemberId')
+
+
+def _source(zonedb: str):
+    '''@return: The $source query option, followed by "&", to read from the @zonedb ZoneDB'''
+    return '$source=config&' if zonedb == 'config' else ''
+
+
+def _oid_path(oid: str):
+    '''@return: The OID without its query string, leading slash and quotes (e.g. "ZoneGroups('x')" -> "ZoneGroups(x)")'''
+    return oid.split('?', 1)[0].strip('/').replace("'", '')
+
+
+_ROUTE_KEY = re.compile(r"\((?!'?(?:config|active|pending)'?\))[^)]*\)")
+_ROUTE_INSTANCE = re.compile(r'^/?SFSS/\d+/')
+
+
+@functools.lru_cache(maxsize=4096)
+def _oid_route(oid: str):
+    '''
+    @return: The OID with its query string, instance number and entity keys replaced
+    (e.g. "SFSS/1/DDCs(x)?a=b" -> "SFSS/{instance}/DDCs({id})"). Used to aggregate
+    measurements by route rather than by entity.'''
+    route = _ROUTE_INSTANCE.sub('SFSS/{instance}/', oid.split('?', 1)[0])
+    return _ROUTE_KEY.sub('({id})', route)
+
+
+def _oid_collection(path: str):
+    '''@return: The collection holding the entity at @path (e.g. "Zones(x)" -> "Zones")'''
+    return path[: path.rindex('(')] if path.endswith(')') else path
+
+
+def _oid_affected(path: str, written: str):
+    '''
+    @return: True if a write to OID path @written may change the data at OID
+    path @path: the written entity, its children, the collection holding it,
+    its parent entity and the collection holding the parent. (De)activating
+    or deleting a zone group also changes the active ZoneDB.'''
+    if path == written or path.startswith(written + '/'):
+        return True
+    if written.endswith(')') and _oid_collection(written).endswith('/ZoneGroups') and '/ZoneDBs(active)' in path:
+        return True
+    parent = written.rpartition('/')[0]
+    return path in (_oid_collection(written), parent, _oid_collection(parent))
+
+
+@dataclasses.dataclass
+class RequestEvent:
+    '''
+    Measurements of one request, passed to the hooks of a RestApi/AsyncRestApi
+    object. @elapsed covers the whole request, including the wait for a pooled
+    connection and the transfer of the reply body; @server is the time until
+    the reply headers were received. The difference is spent in the client and
+    on the network. For streamed replies (iter_*()), the body is not included
+    and @response_bytes is the Content-Length, if any.
+    '''
+
+    endpoint: str
+    method: str
+    oid: str
+    route: str  # See _oid_route()
+    status: int = None  # None when no reply was received
+    elapsed: float = 0.0
+    server: float = 0.0
+    request_bytes: int = 0
+    response_bytes: int = 0
+    error: str = None  # Exception class name, e.g. 'ConnectTimeout'
+    attempt: int = 1  # > 1 for a retry
+
+
+class _Listing:
+    '''A collection returned by the SFSS together with an index of its items by name'''
+
+    def __init__(self, items: list, name_of):
+        self.items = items
+        self.index = {}
+        for item in items:
+            self.index.setdefault(name_of(item), item)
+
+
+class ZoneCache:
+    '''
+    Opt-in read-through cache for the zone group, zone and zone member
+    listings. Each listing is kept with a dict index by name so that name
+    lookups (e.g. get_zone_group_id(), get_zone()) cost O(1) and no network
+    call while the entry is fresh. Entries expire after @ttl seconds and the
+    least recently used ones are evicted beyond @max_entries. Any write made
+    through the RestApi object invalidates the listings it may have changed.
+    Changes made by other clients are only seen once the entry expires.
+    @example:
+       sfss = sfsslib.RestApi('1.2.3.4', 'admin', 'adminpass', cache=sfsslib.ZoneCache(ttl=60))
+    '''
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 1024):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._entries = collections.OrderedDict()  # OID -> (expiry, _Listing)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, oid: str):
+        '''@return: The cached _Listing for @oid, None if absent or expired'''
+        with self._lock:
+            entry = self._entries.get(oid)
+            if entry is not None:
+                expiry, listing = entry
+                if expiry > time.monotonic():
+                    self._entries.move_to_end(oid)
+                    self.hits += 1
+                    return listing
+                del self._entries[oid]
+            self.misses += 1
+            return None
+
+    def store(self, oid: str, listing: _Listing):
+        with self._lock:
+            self._entries[oid] = (time.monotonic() + self._ttl, listing)
+            self._entries.move_to_end(oid)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, oid: str):
+        '''Drop the entries that a write to @oid may have changed'''
+        written = _oid_path(oid)
+        with self._lock:
+            for key in [key for key in self._entries if _oid_affected(_oid_path(key), written)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _user_cache_dir():
+    '''@return: The per-user cache directory of the platform'''
+    if os.name == 'nt':
+        return os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+    if sys.platform == 'darwin':
+        return os.path.expanduser('~/Library/Caches')
+    return os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+
+
+@dataclasses.dataclass
+class _StoredReply:
+    etag: str
+    last_modified: str
+    stored: float  # time.time() of the last (re)validation
+    body: bytes
+
+    def conditional(self, headers: dict):
+        '''@return: @headers plus the validators making a GET conditional'''
+        headers = dict(headers or {})
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class DiskCache:
+    '''
+    Opt-in persistent cache of the GET replies, kept in an SQLite database
+    (by default under the user's cache directory) keyed by endpoint + OID,
+    so that it survives across runs and is shared by concurrent processes.
+    Replies carrying an ETag or Last-Modified validator are stored; the
+    next GET of the same OID is sent with If-None-Match/If-Modified-Since
+    and a "304 Not Modified" reply is answered from the cache. Entries
+    revalidated less than @max_age seconds ago are used without any request.
+    Any write made through the RestApi object drops the entries it may have
+    changed.
+    @example:
+       sfss = sfsslib.RestApi('1.2.3.4', 'admin', 'adminpass', disk_cache=sfsslib.DiskCache())
+    '''
+
+    def __init__(self, path: str = None, max_age: float = 0.0):
+        if path is None:
+            path = os.path.join(_user_cache_dir(), 'sfsslib', 'replies.sqlite')
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        import sqlite3  # pylint: disable=import-outside-toplevel
+        self._db = sqlite3.connect(path, timeout=10.0, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS replies ('
+            'endpoint TEXT, oid TEXT, etag TEXT, last_modified TEXT, stored REAL, body BLOB, PRIMARY KEY (endpoint, oid))'
+        )
+        self.hits = 0  # Used without a request
+        self.revalidated = 0  # Used after a 304 reply
+        self.misses = 0
+
+    def lookup(self, endpoint: str, oid: str):
+        '''@return: (_StoredReply, fresh) for @oid, or (None, False) if absent'''
+        with self._lock:
+            row = self._db.execute(
+                'SELECT etag, last_modified, stored, body FROM replies WHERE endpoint = ? AND oid = ?', (endpoint, oid)
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None, False
+        entry = _StoredReply(*row)
+        fresh = time.time() - entry.stored < self._max_age
+        if fresh:
+            self.hits += 1
+        return entry, fresh
+
+    def store(self, endpoint: str, oid: str, headers, body: bytes):
+        '''Keep the reply @body if its @headers hold a validator'''
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if etag is None and last_modified is None:
+            return
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO replies VALUES (?, ?, ?, ?, ?, ?)',
+                (endpoint, oid, etag, last_modified, time.time(), body),
+            )
+
+    def touch(self, endpoint: str, oid: str):
+        '''Record that the entry for @oid was just revalidated'''
+        self.revalidated += 1
+        with self._lock:
+            self._db.execute('UPDATE replies SET stored = ? WHERE endpoint = ? AND oid = ?', (time.time(), endpoint, oid))
+
+    def invalidate(self, endpoint: str, oid: str):
+        '''Drop the entries that a write to @oid may have changed'''
+        written = _oid_path(oid)
+        with self._lock:
+            oids = [row[0] for row in self._db.execute('SELECT oid FROM replies WHERE endpoint = ?', (endpoint,))]
+            stale = [(endpoint, key) for key in oids if _oid_affected(_oid_path(key), written)]
+            if stale:
+                self._db.executemany('DELETE FROM replies WHERE endpoint = ? AND oid = ?', stale)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM replies')
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class RetryPolicy:
+    '''
+    When, and after how long, a failed request is issued again. Idempotent
+    methods (@methods) are retried on the @statuses and on transport errors
+    (timeouts, reset connections). Other methods (i.e. POST) are only
+    retried when the SFSS did not process the request: 429, 503 or a
+    connection that could not be established. The delay before attempt n+1
+    is drawn uniformly from [0, min(@max_delay, @base_delay * 2**(n-1))]
+    ("full jitter") so that concurrent clients do not retry in lockstep. A
+    Retry-After header, when present, is used instead (capped at @max_delay).
+    @example:
+       sfss = sfsslib.RestApi('1.2.3.4', 'admin', 'adminpass', retry=sfsslib.RetryPolicy(attempts=5))
+    '''
+
+    # Exception class names (requests, aiohttp) raised when the connection could not be established
+    NOT_SENT = ('ConnectTimeout', 'ClientConnectorError')
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        base_delay: float = 0.1,
+        max_delay: float = 5.0,
+        statuses: tuple = (429, 500, 502, 503, 504),
+        methods: tuple = ('GET', 'PUT', 'DELETE'),
+    ):
+        '''@param attempts: Maximum number of attempts per request, 1 to disable retries'''
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.statuses = statuses
+        self.methods = methods
+
+    def delay(self, method: str, attempt: int, status: int = None, error: str = None, retry_after: str = None):
+        '''
+        @param attempt: The number of the attempt that just failed (1 for the first one)
+        @param status: The HTTP status of the reply, None if there was no reply
+        @param error: The exception class name when there was no reply
+        @return: Seconds to wait before the next attempt, None if the request must not be retried
+        '''
+        if attempt >= self.attempts:
+            return None
+        if status is not None:
+            if status not in self.statuses or (method not in self.methods and status not in (429, 503)):
+                return None
+        elif method not in self.methods and error not in self.NOT_SENT:
+            return None
+
+        if retry_after is not None:
+            try:
+                return min(self.max_delay, max(0.0, float(retry_after)))
+            except ValueError:
+                pass  # An HTTP date: use the exponential backoff
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class AdaptiveLimiter:
+    '''
+    Client-side flow control for one SFSS endpoint, combining:
+    - A token bucket: on average at most @rate requests/s (no limit if None)
+      with bursts of up to @burst requests.
+    - An AIMD concurrency limit: the number of requests in flight starts at
+      @limit and grows by 1 for every @limit successful replies (about +1 per
+      round trip). It is multiplied by @decrease when the SFSS answers 429 or
+      5xx, when a request fails with a transport error, or when the smoothed
+      latency climbs above @tolerance times its baseline (the lowest smoothed
+      latency seen recently). At most one decrease happens per round trip.
+    Safe to share between threads, and between the requests of an
+    AsyncRestApi, but each endpoint should have its own limiter.
+    @example:
+       limiter = sfsslib.AdaptiveLimiter(limit=8, max_limit=32, rate=200)
+       sfss = sfsslib.RestApi('1.2.3.4', 'admin', 'adminpass', pool_size=32, limiter=limiter)
+    '''
+
+    _POLL = 0.005  # Seconds between checks while waiting for a free slot (asyncio)
+
+    def __init__(
+        self,
+        limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        rate: float = None,
+        burst: int = None,
+        tolerance: float = 2.5,
+        decrease: float = 0.5,
+    ):
+        self.limit = float(limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate or 1))
+        self.tolerance = tolerance
+        self.decrease = decrease
+        self.inflight = 0
+        self.decreases = 0
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._latency = None  # Exponentially weighted moving average
+        self._baseline = None
+        self._decreased = 0.0
+        self._cond = threading.Condition()
+
+    def _try_acquire(self):
+        '''@return: 0 when a slot was taken, otherwise the number of seconds to wait before trying again'''
+        if self.inflight >= int(self.limit):
+            return self._POLL
+        if self.rate is not None:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+            self._refilled = now
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+        self.inflight += 1
+        return 0
+
+    def acquire(self):
+        '''Wait for a slot (blocking)'''
+        with self._cond:
+            while True:
+                wait = self._try_acquire()
+                if wait == 0:
+                    return
+                self._cond.wait(wait)
+
+    async def acquire_async(self):
+        '''Wait for a slot (asyncio)'''
+        import asyncio  # pylint: disable=import-outside-toplevel
+        while True:
+            with self._cond:
+                wait = self._try_acquire()
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
+
+    def release(self, latency: float, overloaded: bool):
+        '''
+        Free the slot taken by a request and adjust the concurrency limit
+        @param latency: Duration of the request in seconds
+        @param overloaded: True if the SFSS answered 429/5xx or the request failed
+        '''
+        with self._cond:
+            self.inflight -= 1
+            if self._latency is None:
+                self._latency = self._baseline = latency
+            else:
+                self._latency += 0.2 * (latency - self._latency)
+                # The baseline follows drops immediately and rises slowly
+                self._baseline = min(self._latency, self._baseline + 0.01 * (self._latency - self._baseline))
+
+            now = time.monotonic()
+            if overloaded or self._latency > self.tolerance * self._baseline:
+                if now - self._decreased > self._latency:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self._decreased = now
+                    self.decreases += 1
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+def _overloaded(status: int):
+    return status is None or status == 429 or status >= 500
+
+
+def _selected(oid: str, select: list):
+    '''@return: @oid with the OData $select query option for the @select fields, if any'''
+    if not select:
+        return oid
+    return f'{oid}{"&" if "?" in oid else "?"}$select={",".join(select)}'
+
+
+def _paged_oid(oid: str, top: int, skip: int):
+    '''@return: @oid with the OData $top/$skip query options appended'''
+    return f'{oid}{"&" if "?" in oid else "?"}$top={top}&$skip={skip}'
+
+
+def _next_link_oid(link: str):
+    '''@return: The OID of an @odata.nextLink (which may be an absolute path or URL)'''
+    idx = link.find('/redfish/v1/')
+    return link[idx + len('/redfish/v1/') :] if idx >= 0 else link
+
+
+def _next_page(oid: str, link: str, page_size: int, skip: int, count: int, total: int = None):
+    '''
+    @return: The OID of the page following the one read from @oid at @skip, None if it
+    was the last one, i.e. it held fewer than @page_size items (or more: the server ignored
+    $top) or the @total items of the collection (its @odata.count) have been read.'''
+    if link:
+        return _next_link_oid(link)
+    if count == page_size and (total is None or skip + count < total):
+        return _paged_oid(oid, page_size, skip + page_size)
+    return None
+
+
+class _Pager:
+    '''
+    Paging through a collection, one _ArrayStream per page. A page starting with
+    the same item (@odata.id) as the previous one is not yielded and ends the
+    paging: the server ignores $skip (or $top and $skip) and would otherwise
+    return the same page forever.
+    '''
+
+    def __init__(self, oid: str, key: str, page_size: int):
+        self._oid = oid
+        self._key = key
+        self._page_size = page_size
+        self._skip = 0
+        self._stream = None
+        self._first = None  # @odata.id of the first item of the page being read
+        self._previous = None  # Same, for the previous page
+        self.count = 0
+        self.repeated = False
+        self.page = _paged_oid(oid, page_size, 0)  # OID of the page to read, None once done
+
+    def start(self):
+        '''Start reading the page at OID self.page'''
+        self._stream = _ArrayStream(self._key)
+        self._previous, self._first = self._first, None
+        self.count = 0
+
+    def feed(self, chunk: bytes, final: bool = False):
+        '''@return: The items of the page completed by @chunk (none once the page turned out to be a repeat)'''
+        items = self._stream.feed(chunk, final)
+        if items and not self.count and not self.repeated:
+            first = items[0].get('@odata.id') if isinstance(items[0], dict) else None
+            if first is not None and first == self._previous:
+                self.repeated = True
+            self._first = first
+        if self.repeated:
+            return []
+        self.count += len(items)
+        return items
+
+    def advance(self):
+        '''Move self.page to the next page, None after the last one'''
+        if self.repeated:
+            self.page = None
+        else:
+            self.page = _next_page(self._oid, self._stream.next_link(), self._page_size, self._skip, self.count, self._stream.total())
+        self._skip += self._page_size
+
+
+class _ArrayStream:
+    '''
+    Incremental parser returning, as the body of a reply is received, the
+    items of the JSON array stored under @key. Only the item being received
+    is buffered, so memory use does not depend on the size of the array.
+    The text around the array is kept to look for an @odata.nextLink.
+    '''
+
+    _NEXT_LINK = re.compile(r'"[^"]*@odata\.nextLink"\s*:\s*"([^"]*)"')
+    _COUNT = re.compile(r'"[^"]*@odata\.count"\s*:\s*(\d+)')
+
+    def __init__(self, key: str):
+        self._start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._state = 'before'  # -> 'array' -> 'after'
+        self._outside = []  # Text before and after the array
+
+    def feed(self, chunk: bytes, final: bool = False):
+        '''@return: The list of array items completed by @chunk'''
+        self._buffer += self._utf8.decode(chunk, final)
+        items = []
+        if self._state == 'before':
+            match = self._start.search(self._buffer)
+            if match is None:
+                return items
+            self._outside.append(self._buffer[: match.start()])
+            self._buffer = self._buffer[match.end() :]
+            self._state = 'array'
+
+        if self._state == 'array':
+            pos = 0
+            while True:
+                while pos < len(self._buffer) and self._buffer[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos == len(self._buffer):
+                    break
+                if self._buffer[pos] == ']':
+                    self._state = 'after'
+                    pos += 1
+                    break
+                try:
+                    item, end = self._decoder.raw_decode(self._buffer, pos)
+                except json.JSONDecodeError:
+                    break  # Incomplete item
+                if end == len(self._buffer) and not final:
+                    break  # A number could still be incomplete
+                items.append(item)
+                pos = end
+            self._buffer = self._buffer[pos:]
+
+        if self._state == 'after':
+            self._outside.append(self._buffer)
+            self._buffer = ''
+        return items
+
+    def next_link(self):
+        '''@return: The @odata.nextLink found in the reply, None if there is none'''
+        match = self._NEXT_LINK.search(''.join(self._outside) + self._buffer)
+        return match.group(1) if match else None
+
+    def total(self):
+        '''@return: The @odata.count found in the reply (the size of the whole collection), None if there is none'''
+        match = self._COUNT.search(''.join(self._outside) + self._buffer)
+        return int(match.group(1)) if match else None
+
+
+class _RestApiBase:
+    '''
+    The SFSS REST API surface, independent of the transport used to issue
+    the requests. Every method builds its URI and interprets the reply the
+    same way for RestApi (blocking) and AsyncRestApi (asyncio). Subclasses
+    provide _request(), _then() and _resolved().
+    '''
+
+    def __init__(
+        self,
+        ip_addr: str,
+        username: str,
+        password: str,
+        pool_size: int = 10,
+        keep_alive: bool = True,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        scheme: str = 'https',
+        cache: ZoneCache = None,
+        hooks: list = None,
+        retry: RetryPolicy = None,
+        limiter: AdaptiveLimiter = None,
+        disk_cache: DiskCache = None,
+        coalesce: bool = True,
+        codec: JsonCodec = None,
+        strip_odata: bool = False,
+    ):
+        '''
+        @param pool_size: Maximum number of connections kept open to the SFSS app-rest service.
+            Requests issued beyond that number wait for a free connection.
+        @param keep_alive: When True, connections (and their TLS sessions) are reused across
+            requests. When False, every request opens a new connection.
+        @param connect_timeout: Seconds to wait for the TCP/TLS connection to be established.
+        @param read_timeout: Seconds to wait for the server to send a reply.
+        @param scheme: 'https' (default) or 'http' (e.g. for a local stand-in server).
+        @param cache: Optional ZoneCache used for zone group, zone and zone member lookups.
+        @param hooks: Optional list of callables, each called with a RequestEvent once a
+            request completes or fails (see sfssmetrics.Metrics and sfssmetrics.TraceLog).
+        @param retry: Optional RetryPolicy telling when to retry failed requests, e.g.
+            RetryPolicy() for up to 3 attempts. By default requests are not retried.
+        @param limiter: Optional AdaptiveLimiter throttling the requests sent to the SFSS.
+        @param disk_cache: Optional DiskCache revalidating the GET replies across runs.
+        @param coalesce: When True, concurrent identical GET requests (and collection lookups)
+            share a single request and result ("single-flight").
+        @param codec: JsonCodec of the request and reply bodies. Defaults to json_codec(), i.e.
+            orjson or ujson when installed.
+        @param strip_odata: When True, the @odata.type, @odata.context and @odata.etag annotations
+            are removed from the replies (and the entities of the collections they hold) once
+            decoded, for smaller dicts. @odata.id is kept.
+        '''
+        self._endpoint = ip_addr
+        self._url = f'{scheme}://{ip_addr}/redfish/v1'
+        self._url_slash = self._url + '/'
         self._creds = (username, password)
-        # self._creds = requests.auth.HTTPDigestAuth(username, password)
-        # self._creds = requests.auth.HTTPBasicAuth(username, password)
+        self._pool_size = pool_size
+        self._keep_alive = keep_alive
+        self._timeout = (connect_timeout, read_timeout)
+        self._cache = cache
+        self._hooks = list(hooks or [])
+        self._retry = retry if retry is not None else RetryPolicy(attempts=1)
+        self._limiter = limiter
+        self._disk_cache = disk_cache
+        self._coalesce = coalesce
+        self._flights = {}  # (kind, OID, headers) -> in-flight request shared by the callers
+        self._flights_lock = threading.Lock()
+        self.coalesced = 0  # Requests that were served by joining an identical one in flight
+        self._codec = codec or json_codec()
+        if strip_odata:
+            loads = self._codec.loads
+            self._decode = lambda content: _strip_odata(loads(content))
+        else:
+            self._decode = self._codec.loads
 
         # Define minimum headers contents (headers parameter will contain this data as a minimum)
         self._headers = {
             'Content-Type': 'application/json',
         }
+        if not keep_alive:
+            self._headers['Connection'] = 'close'
+        self._merged_headers = {}  # Items of the headers given by the caller -> headers to send
 
     def __uri__(self, oid: str):
         '''Combine the URL and OID to form the URI needed to access the SFSS REST API'''
-        return f'{self._url}{"" if oid[0] == "/" else "/"}{oid}'
+        return self._url + oid if oid[0] == '/' else self._url_slash + oid
 
     def __hdrs__(self, headers: dict):
-        '''Build the 'headers' parameter needed to make REST API requests'''
-        if headers is not None:
-            headers.update(self._headers)
-        else:
-            headers = self._headers
-        return headers
+        '''
+        Build the 'headers' parameter needed to make REST API requests, without
+        modifying @headers. The result is shared and must not be modified.'''
+        if not headers:
+            return self._headers
+        key = tuple(headers.items())
+        merged = self._merged_headers.get(key)
+        if merged is None:
+            merged = dict(headers, **self._headers)
+            if len(self._merged_headers) < 64:  # Conditional GET headers differ for every OID
+                self._merged_headers[key] = merged
+        return merged
+
+    def add_hook(self, hook):
+        '''Call @hook with a RequestEvent after every request'''
+        self._hooks.append(hook)
+
+    def _notify(self, method: str, oid: str, start: float, **kwargs):
+        '''Pass the measurements of a request started at @start (time.perf_counter()) to the hooks'''
+        event = RequestEvent(self._endpoint, method, oid, _oid_route(oid), elapsed=time.perf_counter() - start, **kwargs)
+        for hook in self._hooks:
+            hook(event)
+
+    def _request(self, method: str, oid: str, json_data=None, headers=None):
+        raise NotImplementedError()
+
+    def _then(self, reply, handler):
+        '''Apply @handler to the result of a request (or of another API method)'''
+        raise NotImplementedError()
+
+    def _resolved(self, value):
+        '''Return @value the same way a request result would be returned'''
+        raise NotImplementedError()
+
+    def _iter_list(self, oid: str, key: str, page_size: int):
+        '''
+        Iterate over a collection one page ($top=@page_size) at a time, parsing
+        each reply incrementally. Stops silently on error, like _get_list().
+        @return: An iterator (an async iterator with AsyncRestApi)'''
+        raise NotImplementedError()
+
+    def _coalesced(self, key: tuple, fetch):
+        '''
+        Single-flight: return the result of @fetch(), or of the identical
+        request (same @key) already in flight, if any.'''
+        raise NotImplementedError()
+
+    def _join(self, key: tuple, create):
+        '''@return: (the flight registered under @key, True if it was just created by calling @create())'''
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = self._flights[key] = create()
+            return flight, True
+
+    def _land(self, key: tuple, flight):
+        with self._flights_lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
 
     def _get(self, oid: str, headers=None):
         '''
-        Issue a REST API GET requests
-        @return: A requests.Response object'''
-        reply = requests.get(
-            self.__uri__(oid),
-            auth=self._creds,
-            headers=self.__hdrs__(headers),
-            verify=False,
-        )
+        Issue a REST API GET requests, shared with the identical ones in flight
+        @return: A _Reply object (an awaitable of one with AsyncRestApi)'''
+        if not self._coalesce:
+            return self._fetch(oid, headers)
+        key = ('GET', oid, tuple(sorted(headers.items())) if headers else None)
+        return self._coalesced(key, lambda: self._fetch(oid, headers))
+
+    def _fetch(self, oid: str, headers=None):
+        '''Issue a REST API GET requests, going through the DiskCache if enabled'''
+        if self._disk_cache is None:
+            return self._request('GET', oid, headers=headers)
+        entry, fresh = self._disk_cache.lookup(self._endpoint, oid)
+        if fresh:
+            return self._resolved(_Reply(200, entry.body, decode=self._decode))
+        if entry is not None:
+            headers = entry.conditional(headers)
+        return self._then(self._request('GET', oid, headers=headers), lambda reply: self._revalidated(oid, entry, reply))
+
+    def _revalidated(self, oid: str, entry: _StoredReply, reply):
+        if reply.status_code == 304 and entry is not None:
+            self._disk_cache.touch(self._endpoint, oid)
+            return _Reply(200, entry.body, decode=self._decode)
+        if reply.status_code == 200:
+            self._disk_cache.store(self._endpoint, oid, reply.headers, reply.content)
         return reply
 
     def _put(self, oid: str, json_data: dict, headers=None):
         '''
         Issue a REST API PUT requests
-        @return: A requests.Response object'''
-        reply = requests.put(
-            self.__uri__(oid),
-            auth=self._creds,
-            headers=self.__hdrs__(headers),
-            data=json.dumps(json_data),
-            verify=False,
-        )
-        return reply
+        @return: A requests.Response object (an awaitable of one with AsyncRestApi)'''
+        return self._write('PUT', oid, json_data, headers)
 
     def _post(self, oid: str, json_data: dict, headers=None):
         '''
         Issue a REST API POST requests
-        @return: A requests.Response object'''
-        reply = requests.post(
-            self.__uri__(oid),
-            auth=self._creds,
-            headers=self.__hdrs__(headers),
-            data=json.dumps(json_data),
-            verify=False,
-        )
-        return reply
+        @return: A requests.Response object (an awaitable of one with AsyncRestApi)'''
+        return self._write('POST', oid, json_data, headers)
 
     def _delete(self, oid: str, headers=None):
         '''
         Issue a REST API DELETE requests
-        @return: A requests.Response object'''
-        reply = requests.delete(
-            self.__uri__(oid),
-            auth=self._creds,
-            headers=self.__hdrs__(headers),
-            verify=False,
-        )
-        return reply
+        @return: A requests.Response object (an awaitable of one with AsyncRestApi)'''
+        return self._write('DELETE', oid, None, headers)
 
     def _get_list(self, oid: str, key: str):
         '''
         Issue a REST API GET requests expecting a list as the returned data.
         @return: Requested list on success, empty list otherwise.'''
-        reply = self._get(oid)
-        if not reply.ok:
-            return []
+        return self._then(self._get(oid), _list_reply(key))
+
+    def _write(self, method: str, oid: str, json_data, headers):
+        '''Issue a write request, invalidating the cached listings it may modify'''
+        if self._cache is None and self._disk_cache is None and not self._coalesce:
+            return self._request(method, oid, json_data, headers)
+
+        # Invalidate before and after, in case a concurrent GET refills the cache in between
+        self._invalidate(oid)
+        return self._then(self._request(method, oid, json_data, headers), lambda reply: self._invalidated(oid, reply))
+
+    def _invalidate(self, oid: str):
+        written = _oid_path(oid)
+        with self._flights_lock:
+            # Callers arriving from now on must not get a result read before the write
+            for key in [key for key in self._flights if _oid_affected(_oid_path(key[1]), written)]:
+                del self._flights[key]
+        if self._cache is not None:
+            self._cache.invalidate(oid)
+        if self._disk_cache is not None:
+            self._disk_cache.invalidate(self._endpoint, oid)
+
+    def _invalidated(self, oid: str, reply):
+        self._invalidate(oid)
+        return reply
+
+    def _get_listing(self, oid: str, key: str, name_of):
+        '''
+        Issue a REST API GET requests for a collection, going through the cache if enabled.
+        @return: A _Listing (empty on failure).'''
+        if self._cache is not None:
+            listing = self._cache.lookup(oid)
+            if listing is not None:
+                return self._resolved(listing)
 
-        return reply.json().get(key, [])
+        def fetch():
+            return self._then(self._get(oid), lambda reply: self._listing_reply(reply, oid, key, name_of))
+
+        if not self._coalesce:
+            return fetch()
+        return self._coalesced(('listing', oid, None), fetch)
+
+    def _listing_reply(self, reply, oid: str, key: str, name_of):
+        if not reply.ok:
+            return _Listing([], name_of)
+        listing = _Listing(reply.json().get(key, []), name_of)
+        if self._cache is not None:
+            self._cache.store(oid, listing)
+        return listing
 
     # **************************************************************************
     def get_ip_address_management(self):
@@ -117,8 +955,7 @@ class RestApi:
             'MTU': mtu,
         }
         oid = f'SFSSApp/IpAddressManagements({iface})'
-        reply = self._put(oid, json_data)
-        return reply.json() if reply.ok else {}
+        return self._then(self._put(oid, json_data), _dict_reply)
 
     def get_foundational_configs(self):
         '''@return: List of Foundational Configs on success, empty list otherwise'''
@@ -161,8 +998,7 @@ class RestApi:
                 '@odata.context': '/redfish/v1/SFSSApp/$metadata#CDCInstanceManagers/CDCInstanceManagers/$entity'}
         '''
         oid = f"SFSSApp/CDCInstanceManagers('{instance}')"
-        reply = self._get(oid)
-        return reply.json() if reply.ok else {}
+        return self._then(self._get(oid), _dict_reply)
 
     def create_cdc_instance(self, instance: int, interfaces: str):
         '''@return:'''
@@ -173,8 +1009,7 @@ class RestApi:
             'DiscoverySvcAdminState': 'Enable',
         }
         oid = f"SFSSApp/CDCInstanceManagers('{instance}')"
-        reply = self._put(oid, json_data)
-        return reply.json() if reply.ok else {}
+        return self._then(self._put(oid, json_data), _dict_reply)
 
     def pull_register_ddc(self, instance: int, trtype: str, traddr: str, trsvcid: int, activate: bool):
         '''@return:'''
@@ -187,12 +1022,13 @@ class RestApi:
             'Activate': activate,
         }
         oid = f'SFSS/{instance}/DDCs'
-        reply = self._post(oid, json_data, {'Accept': 'application/json'})
-        return reply.json() if reply.ok else {}
+        return self._then(self._post(oid, json_data, _ACCEPT_JSON), _dict_reply)
 
-    def get_hosts(self, instance: int):
+    def get_hosts(self, instance: int, select: list = None):
         '''
         Get the list of hosts
+        @param select: Optional list of the fields the server should return (OData $select).
+            This applies to all the get_*() and iter_*() methods that accept it.
         @return: List of hosts dicts on success, Empty list otherwise.
         @example:
            sfss = sfsslib.RestApi('1.2.3.4', 'admin', 'adminpass')
@@ -218,23 +1054,22 @@ class RestApi:
                  '@odata.context': '/redfish/v1/SFSS/1/$metadata#Hosts/Hosts/$entity'},
            ]
         '''
-        oid = f'SFSS/{instance}/Hosts?$expand=Hosts'
+        oid = _selected(f'SFSS/{instance}/Hosts?$expand=Hosts', select)
         return self._get_list(oid, 'Hosts')
 
-    def get_ddcs(self, instance: int):
+    def get_ddcs(self, instance: int, select: list = None):
         '''@return: List of DDCs on success, empty list otherwise.'''
-        oid = f'SFSS/{instance}/DDCs'
+        oid = _selected(f'SFSS/{instance}/DDCs', select)
         return self._get_list(oid, 'DDCs')
 
     def delete_ddc(self, instance: int, ddc_id: str):
         '''@return:'''
         oid = f'SFSS/{instance}/DDCs({ddc_id})'
-        reply = self._delete(oid, {'Accept': 'application/json'})
-        return reply.ok
+        return self._then(self._delete(oid, _ACCEPT_JSON), _ok_reply)
 
-    def get_subsystems(self, instance: int):
+    def get_subsystems(self, instance: int, select: list = None):
         '''@return: List of subsystems on success, empty list otherwise.'''
-        oid = f'SFSS/{instance}/Subsystems?$expand=Subsystems'
+        oid = _selected(f'SFSS/{instance}/Subsystems?$expand=Subsystems', select)
         return self._get_list(oid, 'Subsystems')
 
     # **************************************************************************
@@ -250,8 +1085,7 @@ class RestApi:
                 "/redfish/v1/SFSS/1/ZoneDBs('active')"]
         '''
         oid = f'SFSS/{instance}/ZoneDBs'
-        items = self._get_list(oid, 'ZoneDBs')
-        return [item['@odata.id'] for item in items]
+        return self._then(self._get_list(oid, 'ZoneDBs'), _zonedb_ids)
 
     def get_config_zonedbs(self, instance: int):
         '''
@@ -269,8 +1103,7 @@ class RestApi:
                 '@odata.context': '/redfish/v1/SFSS/1/$metadata#ZoneDBs/ZoneDBs/$entity'}
         '''
         oid = f"SFSS/{instance}/ZoneDBs('config')?$source=config"
-        reply = self._get(oid)
-        return reply.json() if reply.ok else {}
+        return self._then(self._get(oid), _dict_reply)
 
     def get_active_zonedbs(self, instance: int):
         '''
@@ -287,8 +1120,7 @@ class RestApi:
                 '@odata.context': '/redfish/v1/SFSS/1/$metadata#ZoneDBs/ZoneDBs/$entity'}
         '''
         oid = f"SFSS/{instance}/ZoneDBs('active')?"
-        reply = self._get(oid)
-        return reply.json() if reply.ok else {}
+        return self._then(self._get(oid), _dict_reply)
 
     # **************************************************************************
     def get_zone_group_ids(self, instance: int):
@@ -303,7 +1135,7 @@ class RestApi:
                 'config:Starfleet:nqn.1988-11.com.dell:SFSS:1:20220523215843e8']
         '''
         oid = f"SFSS/{instance}/ZoneDBs('config')?$source=config"
-        return self._get_list(oid, 'ZoneGroups')
+        return self._then(self._get_listing(oid, 'ZoneGroups', _zone_group_name), _items)
 
     def get_zone_group_id(self, instance: int, zone_group_name: str):
         '''
@@ -315,10 +1147,9 @@ class RestApi:
            print(f'>>> {r}')
            >>> config:Starfleet:nqn.1988-11.com.dell:SFSS:1:20220523215843e8
         '''
-        for zone_group_id in self.get_zone_group_ids(instance):
-            if zone_group_name == zone_group_id.split(':')[1]:
-                return zone_group_id
-        return None
+        oid = f"SFSS/{instance}/ZoneDBs('config')?$source=config"
+        listing = self._get_listing(oid, 'ZoneGroups', _zone_group_name)
+        return self._then(listing, lambda listing: listing.index.get(zone_group_name))
 
     def create_zone_group(self, instance: int, zone_group_name: str):
         '''
@@ -335,8 +1166,7 @@ class RestApi:
             'ZoneGroupName': zone_group_name,
         }
         oid = f"SFSS/{instance}/ZoneDBs('config')/ZoneGroups"
-        reply = self._post(oid, json_data, {'Accept': 'application/json'})
-        return reply.json().get('EId') if reply.ok else None
+        return self._then(self._post(oid, json_data, _ACCEPT_JSON), _eid_reply)
 
     def delete_zone_group(self, instance: int, zone_group_id: str):
         '''
@@ -349,8 +1179,7 @@ class RestApi:
            >>> True
         '''
         oid = f"SFSS/{instance}/ZoneDBs('config')/ZoneGroups({zone_group_id})?$source=config&$expand=ZoneGroups"
-        reply = self._delete(oid)
-        return reply.ok
+        return self._then(self._delete(oid), _ok_reply)
 
     def activate_zone_group(self, instance: int, zone_group_id: str):
         '''
@@ -366,8 +1195,7 @@ class RestApi:
             'ActivateStatus': 'Activate',
         }
         oid = f"SFSS/{instance}/ZoneDBs('config')/ZoneGroups('{zone_group_id}')"
-        reply = self._put(oid, json_data)
-        return reply.ok
+        return self._then(self._put(oid, json_data), _ok_reply)
 
     def deactivate_zone_group(self, instance: int, zone_group_id: str):
         '''
@@ -383,13 +1211,13 @@ class RestApi:
             'ActivateStatus': 'DeActivate',
         }
         oid = f"SFSS/{instance}/ZoneDBs('active')/ZoneGroups('{zone_group_id}')"
-        reply = self._put(oid, json_data)
-        return reply.ok
+        return self._then(self._put(oid, json_data), _ok_reply)
 
     # **************************************************************************
-    def get_zones(self, instance: int, zone_group_id: str):
+    def get_zones(self, instance: int, zone_group_id: str, select: list = None, zonedb: str = 'config'):
         '''
         Get all the zones in specified zone group.
+        @param zonedb: 'config' (default), or 'active' to get the zones of an active zone group.
 
         @return: List of zone dicts on success, Empty list otherwise.
 
@@ -404,9 +1232,9 @@ class RestApi:
         }
         '''
         if zone_group_id is None:
-            return []
-        oid = f"SFSS/{instance}/ZoneDBs('config')/ZoneGroups({zone_group_id})/Zones?$source=config&$expand=Zones"
-        return self._get_list(oid, 'Zones')
+            return self._resolved([])
+        oid = f"SFSS/{instance}/ZoneDBs('{zonedb}')/ZoneGroups({zone_group_id})/Zones?{_source(zonedb)}$expand=Zones"
+        return self._then(self._get_listing(_selected(oid, select), 'Zones', _zone_name), _items)
 
     def get_zone(self, instance: int, zone_group_id: str, zone_name: str):
         '''
@@ -423,11 +1251,11 @@ class RestApi:
                 '@odata.type': '#Zones.Zones',
                 '@odata.context': "/redfish/v1/SFSS/1/ZoneDBs('config')/ZoneGroups(config:Starfleet:nqn.1988-11.com.dell:SFSS:1:20220523215843e8)/$metadata#Zones/Zones/$entity"}
         '''
-        for zone in self.get_zones(instance, zone_group_id):
-            if zone.get('ZoneName') == zone_name:
-                return zone
-
-        return None
+        if zone_group_id is None:
+            return self._resolved(None)
+        oid = f"SFSS/{instance}/ZoneDBs('config')/ZoneGroups({zone_group_id})/Zones?$source=config&$expand=Zones"
+        listing = self._get_listing(oid, 'Zones', _zone_name)
+        return self._then(listing, lambda listing: listing.index.get(zone_name))
 
     def get_zone_id(self, instance: int, zone_group_id: str, zone_name: str):
         '''
@@ -440,10 +1268,7 @@ class RestApi:
            >>> config:Starfleet:nqn.1988-11.com.dell:SFSS:1:20220523215843e8:enterprise
         '''
         zone = self.get_zone(instance, zone_group_id, zone_name)
-        if zone is None:
-            return None
-
-        return zone.get('ZoneId')
+        return self._then(zone, _zone_id)
 
     def create_zone(self, instance: int, zone_group_id: str, zone_name: str):
         '''
@@ -459,8 +1284,7 @@ class RestApi:
             'ZoneName': zone_name,
         }
         oid = f"SFSS/{instance}/ZoneDBs('config')/ZoneGroups({zone_group_id})/Zones"
-        reply = self._post(oid, json_data, {'Accept': 'application/json'})
-        return reply.json().get('EId') if reply.ok else None
+        return self._then(self._post(oid, json_data, _ACCEPT_JSON), _eid_reply)
 
     def delete_zone(self, instance: int, zone_group_id: str, zone_id: str):
         '''
@@ -475,8 +1299,7 @@ class RestApi:
            >>> True
         '''
         oid = f"SFSS/{instance}/ZoneDBs('config')/ZoneGroups({zone_group_id})/Zones({zone_id})"
-        reply = self._delete(oid)
-        return reply.ok
+        return self._then(self._delete(oid), _ok_reply)
 
     def add_zone_member(self, instance: int, zone_group_id: str, zone_id: str, member: str, role: str):
         '''
@@ -498,12 +1321,12 @@ class RestApi:
             'Role': role,
         }
         oid = f"SFSS/{instance}/ZoneDBs('config')/ZoneGroups({zone_group_id})/Zones({zone_id})/ZoneMembers"
-        reply = self._post(oid, json_data, {'Accept': 'application/json'})
-        return reply.json().get('EId') if reply.ok else None
+        return self._then(self._post(oid, json_data, _ACCEPT_JSON), _eid_reply)
 
-    def get_zone_members(self, instance: int, zone_group_id: str, zone_id: str):
+    def get_zone_members(self, instance: int, zone_group_id: str, zone_id: str, select: list = None, zonedb: str = 'config'):
         '''
         Get the list of members in a zone.
+        @param zonedb: 'config' (default), or 'active' to get the members of an active zone.
         @return: The list of member dicts on success, None otherwise.
         @example:
            sfss = sfsslib.RestApi('1.2.3.4', 'admin', 'adminpass')
@@ -519,5 +1342,635 @@ class RestApi:
                  '@odata.type': '#ZoneMembers.ZoneMembers',
                  '@odata.context': "/redfish/v1/SFSS/1/ZoneDBs('config')/ZoneGroups(config:Starfleet:nqn.1988-11.com.dell:SFSS:1:20220523215843e8)/Zones(config:Starfleet:nqn.1988-11.com.dell:SFSS:1:20220523215843e8:enterprise)/$metadata#ZoneMembers/ZoneMembers/$entity"}]
         '''
+        oid = (
+            f"SFSS/{instance}/ZoneDBs('{zonedb}')/ZoneGroups({zone_group_id})/Zones({zone_id})/ZoneMembers"
+            f"?{_source(zonedb)}$expand=ZoneMembers"
+        )
+        return self._then(self._get_listing(_selected(oid, select), 'ZoneMembers', _zone_member_id), _items)
+
+    # **************************************************************************
+    def get_resource(self, odata_id: str):
+        '''
+        Get any resource by its @odata.id (e.g. the OriginOfCondition of an event).
+        @return: The resource as a dict on success, empty dict otherwise.
+        @example:
+           sfss = sfsslib.RestApi('1.2.3.4', 'admin', 'adminpass')
+           r = sfss.get_resource("/redfish/v1/SFSS/1/Hosts('nqn.2014-08.org.nvmexpress:uuid:83294d56-1ebf-a154-d613-a7cb28c6ef39@100.94.69.50:V4::0:0:TCP')")
+        '''
+        return self._then(self._get(_next_link_oid(odata_id)), _dict_reply)
+
+    def get_event_service(self):
+        '''
+        Get the Redfish EventService.
+        @return: The EventService as a dict if the SFSS supports it, empty dict otherwise.
+        @example:
+           sfss = sfsslib.RestApi('1.2.3.4', 'admin', 'adminpass')
+           r = sfss.get_event_service()
+           print(f'>>> {r}')
+           >>> {'Id': 'EventService',
+                'ServiceEnabled': True,
+                'ServerSentEventUri': '/redfish/v1/EventService/SSE',
+                '@odata.id': '/redfish/v1/EventService'}
+        '''
+        return self._then(self._get('EventService'), _dict_reply)
+
+    # **************************************************************************
+    def iter_hosts(self, instance: int, page_size: int = 500, select: list = None):
+        '''
+        Iterate over the hosts without loading the whole list in memory.
+        Items are the same dicts as returned by get_hosts().
+        @example:
+           sfss = sfsslib.RestApi('1.2.3.4', 'admin', 'adminpass')
+           for host in sfss.iter_hosts(1):
+               print(host['NQN'])
+        '''
+        return self._iter_list(_selected(f'SFSS/{instance}/Hosts?$expand=Hosts', select), 'Hosts', page_size)
+
+    def iter_subsystems(self, instance: int, page_size: int = 500, select: list = None):
+        '''Iterate over the subsystems. Items are the same dicts as returned by get_subsystems().'''
+        return self._iter_list(_selected(f'SFSS/{instance}/Subsystems?$expand=Subsystems', select), 'Subsystems', page_size)
+
+    def iter_ddcs(self, instance: int, page_size: int = 500, select: list = None):
+        '''Iterate over the DDCs. Items are the same dicts as returned by get_ddcs().'''
+        return self._iter_list(_selected(f'SFSS/{instance}/DDCs', select), 'DDCs', page_size)
+
+    def iter_zones(self, instance: int, zone_group_id: str, page_size: int = 500, select: list = None):
+        '''Iterate over the zones of a zone group. Items are the same dicts as returned by get_zones().'''
+        oid = f"SFSS/{instance}/ZoneDBs('config')/ZoneGroups({zone_group_id})/Zones?$source=config&$expand=Zones"
+        return self._iter_list(_selected(oid, select), 'Zones', page_size)
+
+    def iter_zone_members(self, instance: int, zone_group_id: str, zone_id: str, page_size: int = 500, select: list = None):
+        '''Iterate over the members of a zone. Items are the same dicts as returned by get_zone_members().'''
         oid = f"SFSS/{instance}/ZoneDBs('config')/ZoneGroups({zone_group_id})/Zones({zone_id})/ZoneMembers?$source=config&$expand=ZoneMembers"
-        return self._get_list(oid, 'ZoneMembers')
+        return self._iter_list(_selected(oid, select), 'ZoneMembers', page_size)
+
+class RestApi(_RestApiBase):
+    '''Blocking client for the SFSS REST API. Safe to share between threads.'''
+
+    def __init__(self, ip_addr: str, username: str, password: str, **kwargs):
+        super().__init__(ip_addr, username, password, **kwargs)
+        # self._creds = requests.auth.HTTPDigestAuth(username, password)
+        # self._creds = requests.auth.HTTPBasicAuth(username, password)
+
+        # A single Session keeps a pool of persistent connections so that
+        # consecutive requests skip the TCP connect and TLS handshake.
+        self._session = requests.Session()
+        self._session.auth = self._creds
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size, pool_block=True)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        self._batch_unsupported = False  # Set once the server rejected a $batch request
+
+    def close(self):
+        '''Close all the pooled connections'''
+        self._session.close()
+
+    def batch(self, max_size: int = 100):
+        '''
+        @return: A Batch collecting write calls to send them with a few OData $batch requests
+        @example:
+           with sfss.batch() as batch:
+               members = [batch.add_zone_member(1, zone_group_id, zone_id, member, 'Host') for member in hosts]
+           print([member.result() for member in members])
+        '''
+        return Batch(self, max_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _request(self, method: str, oid: str, json_data=None, headers=None, stream: bool = False):
+        '''
+        Issue a REST API request over the pooled session, retrying it as per the RetryPolicy
+        @param stream: When True, the body is read on demand (see requests.Response.iter_content())
+        @return: A _Reply object, or the requests.Response object when @stream is True'''
+        data = None if json_data is None else self._codec.dumps(json_data)
+        attempt = 1
+        while True:
+            try:
+                reply = self._send(method, oid, data, headers, stream, attempt)
+            except requests.RequestException as ex:
+                delay = self._retry.delay(method, attempt, error=type(ex).__name__)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry.delay(method, attempt, reply.status_code, retry_after=reply.headers.get('Retry-After'))
+                if delay is None:
+                    return reply if stream else _Reply(reply.status_code, reply.content, reply.headers, self._decode)
+                reply.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def _send(self, method: str, oid: str, data: bytes, headers, stream: bool, attempt: int):
+        '''Issue a single attempt of a request'''
+        if self._limiter is not None:
+            self._limiter.acquire()
+        start = time.perf_counter()
+        try:
+            reply = self._session.request(
+                method,
+                self.__uri__(oid),
+                headers=self.__hdrs__(headers),
+                data=data,
+                timeout=self._timeout,
+                verify=False,
+                stream=stream,
+            )
+        except requests.RequestException as ex:
+            if self._limiter is not None:
+                self._limiter.release(time.perf_counter() - start, True)
+            if self._hooks:
+                self._notify(method, oid, start, request_bytes=len(data or b''), error=type(ex).__name__, attempt=attempt)
+            raise
+
+        if self._limiter is not None:
+            self._limiter.release(time.perf_counter() - start, _overloaded(reply.status_code))
+        if self._hooks:
+            if stream:
+                response_bytes = int(reply.headers.get('Content-Length', 0))
+            else:
+                response_bytes = len(reply.content)
+            self._notify(
+                method,
+                oid,
+                start,
+                status=reply.status_code,
+                server=reply.elapsed.total_seconds(),
+                request_bytes=len(data or b''),
+                response_bytes=response_bytes,
+                attempt=attempt,
+            )
+        return reply
+
+    def _iter_list(self, oid: str, key: str, page_size: int):
+        pager = _Pager(oid, key, page_size)
+        while pager.page is not None:
+            reply = self._request('GET', pager.page, stream=True)
+            try:
+                if not reply.ok:
+                    return
+                pager.start()
+                for chunk in reply.iter_content(chunk_size=65536):
+                    yield from pager.feed(chunk)
+                    if pager.repeated:
+                        return
+                yield from pager.feed(b'', final=True)
+            finally:
+                reply.close()
+            pager.advance()
+
+    def iter_events(self, uri: str):
+        '''
+        Subscribe to the Redfish Server-Sent Events stream at @uri (the
+        ServerSentEventUri of get_event_service()). The subscription is made
+        when this method is called; the returned generator then yields the
+        Event payloads as dicts, as they arrive, blocking in between. Closing
+        the generator ends the subscription. Keep-alive comments sent by the
+        server are yielded as None, so that the caller can regularly check
+        whether to stop.
+        @raise requests.RequestException: The stream could not be opened or, while
+            iterating, broke (e.g. requests.ReadTimeout when nothing, not even a
+            keep-alive comment, was received for read_timeout seconds).
+        '''
+        reply = self._request('GET', _next_link_oid(uri), headers={'Accept': 'text/event-stream'}, stream=True)
+        try:
+            reply.raise_for_status()
+        except requests.RequestException:
+            reply.close()
+            raise
+        return self._events(reply)
+
+    @staticmethod
+    def _events(reply):
+        try:
+            reply.encoding = 'utf-8'
+            data = []
+            comment = False
+            # A larger chunk_size would hold back an event until more data arrives
+            for line in reply.iter_lines(chunk_size=1, decode_unicode=True):
+                if line.startswith('data:'):
+                    data.append(line[5:].lstrip())
+                elif line.startswith(':'):
+                    comment = True
+                elif not line:  # A blank line ends the event
+                    if data:
+                        yield json.loads('\n'.join(data))
+                    elif comment:
+                        yield None
+                    data = []
+                    comment = False
+        finally:
+            reply.close()
+
+    def _coalesced(self, key: tuple, fetch):
+        flight, leader = self._join(key, _Flight)
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = fetch()
+            return flight.value
+        except BaseException as ex:
+            flight.error = ex
+            raise
+        finally:
+            self._land(key, flight)
+            flight.done.set()
+
+    def _then(self, reply, handler):
+        return handler(reply)
+
+    def _resolved(self, value):
+        return value
+
+
+class _Flight:
+    '''A request in flight, whose outcome is shared by the threads that issued it concurrently'''
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class _SubReply:
+    '''One response of an OData $batch reply, with the members of requests.Response used by the reply handlers'''
+
+    def __init__(self, status_code: int, body):
+        self.status_code = status_code
+        self._body = body
+
+    @property
+    def ok(self):  # pylint: disable=invalid-name
+        return self.status_code < 400
+
+    def json(self):
+        return self._body if self._body is not None else {}
+
+
+class BatchResult:
+    '''The result of a call made through a Batch, available once the batch is sent'''
+
+    def __init__(self):
+        self._done = False
+        self._value = None
+        self._error = None
+        self._callbacks = []
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        '''
+        @return: What the same call made on the RestApi object would have returned
+        @raise: The exception that the call would have raised (e.g. requests.ConnectionError)'''
+        if not self._done:
+            raise RuntimeError('The batch has not been sent')
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    def _set(self, value, error: Exception = None):
+        self._done = True
+        self._value = value
+        self._error = error
+        for callback in self._callbacks:
+            callback(self)
+
+    def _then(self, handler):
+        chained = BatchResult()
+
+        def resolve(result):
+            if result._error is not None:
+                chained._set(None, result._error)
+                return
+            try:
+                chained._set(handler(result._value))
+            except Exception as ex:  # pylint: disable=broad-except
+                chained._set(None, ex)
+
+        if self._done:
+            resolve(self)
+        else:
+            self._callbacks.append(resolve)
+        return chained
+
+
+class Batch(_RestApiBase):
+    '''
+    Collects the write calls (e.g. create_zone(), add_zone_member(), delete_zone())
+    made on it and sends them, when send() is called or the "with" block exits,
+    as OData JSON batch requests ($batch) of up to @max_size operations each.
+    Every call returns a BatchResult. Read calls cannot be batched.
+    When the server does not support $batch (it answers 400, 404, 405 or 501),
+    the operations are sent instead as concurrent single requests over the
+    pooled connections of the RestApi. A successful reply that cannot be
+    parsed fails all its operations, which are not sent again.
+    The operations of a batch must not depend on each other (e.g. a zone and
+    its members must be added in two batches).
+    '''
+
+    # Replies of a server that does not implement $batch
+    _UNSUPPORTED = (400, 404, 405, 501)
+
+    def __init__(self, sfss: RestApi, max_size: int = 100):  # pylint: disable=super-init-not-called
+        self._sfss = sfss
+        self._max_size = max_size
+        self._cache = self._disk_cache = None  # The RestApi caches are invalidated once the batch is sent
+        self._coalesce = False
+        self._operations = []  # (method, oid, json_data, BatchResult)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.send()
+
+    def __len__(self):
+        return len(self._operations)
+
+    def _request(self, method: str, oid: str, json_data=None, headers=None):
+        if method == 'GET':
+            raise ValueError('Only write requests can be batched')
+        pending = BatchResult()
+        self._operations.append((method, oid, json_data, pending))
+        return pending
+
+    def _then(self, reply, handler):
+        return reply._then(handler)  # pylint: disable=protected-access
+
+    def _resolved(self, value):
+        result = BatchResult()
+        result._set(value)  # pylint: disable=protected-access
+        return result
+
+    def send(self):
+        '''Send the operations collected so far, then set their BatchResults'''
+        operations, self._operations = self._operations, []
+        chunks = [operations[start : start + self._max_size] for start in range(0, len(operations), self._max_size)]
+        # The first chunk tells whether the server supports $batch, the others are sent concurrently
+        if chunks and not self._sfss._batch_unsupported and self._send_batch(chunks[0]):
+            chunks.pop(0)
+        if self._sfss._batch_unsupported:
+            self._send_singles([operation for chunk in chunks for operation in chunk])
+        elif chunks:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self._sfss._pool_size) as pool:
+                unsent = [chunk for chunk, sent in zip(chunks, pool.map(self._send_batch, chunks)) if not sent]
+            self._send_singles([operation for chunk in unsent for operation in chunk])
+
+        for _, oid, _, _ in operations:
+            self._sfss._invalidate(oid)
+
+    def _send_batch(self, chunk: list):
+        '''@return: False if the server does not support $batch'''
+        requests_data = []
+        for idx, (method, oid, json_data, _) in enumerate(chunk):
+            request = {'id': str(idx), 'method': method, 'url': oid, 'headers': dict(self._sfss._headers)}
+            if json_data is not None:
+                request['body'] = json_data
+            requests_data.append(request)
+
+        try:
+            reply = self._sfss._request('POST', '$batch', {'requests': requests_data}, _ACCEPT_JSON)
+        except requests.RequestException as ex:
+            for _, _, _, pending in chunk:
+                pending._set(None, ex)
+            return True
+        if reply.status_code in self._UNSUPPORTED:
+            self._sfss._batch_unsupported = True
+            return False
+        if not reply.ok:
+            for _, _, _, pending in chunk:  # The whole batch failed (e.g. 503 after the retries)
+                pending._set(_SubReply(reply.status_code, None))
+            return True
+        try:
+            body = reply.json()
+            responses = body.get('responses') if isinstance(body, dict) else None
+        except ValueError:
+            responses = None
+        if not isinstance(responses, list):
+            # The server may have processed the batch: its operations must not be sent again
+            error = requests.RequestException(f'Invalid $batch reply (HTTP {reply.status_code})')
+            for _, _, _, pending in chunk:
+                pending._set(None, error)
+            return True
+
+        by_id = {response.get('id'): response for response in responses}
+        for idx, (_, _, _, pending) in enumerate(chunk):
+            response = by_id.get(str(idx))
+            if response is None:
+                pending._set(_SubReply(500, None))
+            else:
+                pending._set(_SubReply(response.get('status', 500), response.get('body')))
+        return True
+
+    def _send_singles(self, chunk: list):
+        if not chunk:
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._sfss._pool_size) as pool:
+            futures = [
+                pool.submit(self._sfss._request, method, oid, json_data, _ACCEPT_JSON)
+                for method, oid, json_data, _ in chunk
+            ]
+            for future, (_, _, _, pending) in zip(futures, chunk):
+                try:
+                    pending._set(future.result())
+                except requests.RequestException as ex:
+                    pending._set(None, ex)
+
+
+class _Reply:
+    '''The subset of requests.Response used by the reply handlers, with the body decoded by @decode'''
+
+    def __init__(self, status_code: int, content: bytes, headers=None, decode=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers if headers is not None else {}
+        self._decode = decode or json_codec().loads
+
+    @property
+    def ok(self):  # pylint: disable=invalid-name
+        return self.status_code < 400
+
+    def json(self):
+        return self._decode(self.content)
+
+
+class AsyncRestApi(_RestApiBase):
+    '''
+    asyncio client for the SFSS REST API. It exposes the same methods as
+    RestApi, each returning an awaitable. At most @pool_size requests are in
+    flight to the endpoint at any time; the others wait on a semaphore.
+    Requires aiohttp.
+    @example:
+       async with sfsslib.AsyncRestApi('1.2.3.4', 'admin', 'adminpass') as sfss:
+           hosts, subsystems = await asyncio.gather(sfss.get_hosts(1), sfss.get_subsystems(1))
+    '''
+
+    def __init__(self, ip_addr: str, username: str, password: str, **kwargs):
+        import asyncio  # pylint: disable=import-outside-toplevel
+        super().__init__(ip_addr, username, password, **kwargs)
+        self._session = None
+        self._semaphore = asyncio.Semaphore(self._pool_size)
+
+    def _client(self):
+        if self._session is None:
+            import aiohttp  # pylint: disable=import-outside-toplevel
+
+            connector = aiohttp.TCPConnector(limit=self._pool_size, force_close=not self._keep_alive, ssl=False)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                auth=aiohttp.BasicAuth(*self._creds),
+                timeout=aiohttp.ClientTimeout(sock_connect=self._timeout[0], sock_read=self._timeout[1]),
+            )
+        return self._session
+
+    async def close(self):
+        '''Close all the pooled connections'''
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _request(self, method: str, oid: str, json_data=None, headers=None):
+        '''
+        Issue a REST API request, retrying it as per the RetryPolicy
+        @return: An object with the ok, status_code, content and json() members of a requests.Response'''
+        import asyncio  # pylint: disable=import-outside-toplevel
+        data = None if json_data is None else self._codec.dumps(json_data)
+        attempt = 1
+        while True:
+            try:
+                reply, retry_after = await self._send(method, oid, data, headers, attempt)
+            except Exception as ex:  # pylint: disable=broad-except
+                delay = self._retry.delay(method, attempt, error=type(ex).__name__)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry.delay(method, attempt, reply.status_code, retry_after=retry_after)
+                if delay is None:
+                    return reply
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _send(self, method: str, oid: str, data: bytes, headers, attempt: int):
+        '''
+        Issue a single attempt of a request
+        @return: (_Reply, Retry-After header)'''
+        session = self._client()
+        if self._limiter is not None:
+            await self._limiter.acquire_async()
+        start = time.perf_counter()
+        try:
+            async with self._semaphore:
+                async with session.request(method, self.__uri__(oid), headers=self.__hdrs__(headers), data=data) as reply:
+                    server = time.perf_counter() - start
+                    content = await reply.read()
+        except Exception as ex:
+            if self._limiter is not None:
+                self._limiter.release(time.perf_counter() - start, True)
+            if self._hooks:
+                self._notify(method, oid, start, request_bytes=len(data or b''), error=type(ex).__name__, attempt=attempt)
+            raise
+
+        if self._limiter is not None:
+            self._limiter.release(time.perf_counter() - start, _overloaded(reply.status))
+        if self._hooks:
+            self._notify(
+                method,
+                oid,
+                start,
+                status=reply.status,
+                server=server,
+                request_bytes=len(data or b''),
+                response_bytes=len(content),
+                attempt=attempt,
+            )
+        return _Reply(reply.status, content, reply.headers, self._decode), reply.headers.get('Retry-After')
+
+    async def _open(self, oid: str):
+        '''
+        Issue a GET request whose body is read by the caller, retrying it as per the
+        RetryPolicy. The semaphore is held until the caller calls _close() with the reply.
+        @return: The aiohttp.ClientResponse'''
+        import asyncio  # pylint: disable=import-outside-toplevel
+        session = self._client()
+        attempt = 1
+        while True:
+            if self._limiter is not None:
+                await self._limiter.acquire_async()
+            await self._semaphore.acquire()
+            start = time.perf_counter()
+            try:
+                reply = await session.get(self.__uri__(oid), headers=self.__hdrs__(None))
+            except Exception as ex:  # pylint: disable=broad-except
+                self._semaphore.release()
+                if self._limiter is not None:
+                    self._limiter.release(time.perf_counter() - start, True)
+                if self._hooks:
+                    self._notify('GET', oid, start, error=type(ex).__name__, attempt=attempt)
+                delay = self._retry.delay('GET', attempt, error=type(ex).__name__)
+                if delay is None:
+                    raise
+            else:
+                server = time.perf_counter() - start
+                if self._limiter is not None:
+                    self._limiter.release(server, _overloaded(reply.status))
+                if self._hooks:
+                    self._notify(
+                        'GET', oid, start, status=reply.status, server=server, response_bytes=reply.content_length or 0, attempt=attempt
+                    )
+                delay = self._retry.delay('GET', attempt, reply.status, retry_after=reply.headers.get('Retry-After'))
+                if delay is None:
+                    return reply
+                self._close(reply)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _close(self, reply):
+        '''Release a reply returned by _open() and its slot of the semaphore'''
+        reply.release()
+        self._semaphore.release()
+
+    async def _iter_list(self, oid: str, key: str, page_size: int):
+        pager = _Pager(oid, key, page_size)
+        while pager.page is not None:
+            reply = await self._open(pager.page)
+            try:
+                if reply.status >= 400:
+                    return
+                pager.start()
+                async for chunk in reply.content.iter_chunked(65536):
+                    for item in pager.feed(chunk):
+                        yield item
+                    if pager.repeated:
+                        return
+                for item in pager.feed(b'', final=True):
+                    yield item
+            finally:
+                self._close(reply)
+            pager.advance()
+
+    async def _coalesced(self, key: tuple, fetch):
+        import asyncio  # pylint: disable=import-outside-toplevel
+        task, leader = self._join(key, lambda: asyncio.ensure_future(fetch()))
+        if leader:
+            task.add_done_callback(lambda _: self._land(key, task))
+        # A cancelled caller must not cancel the request the others are waiting for
+        return await asyncio.shield(task)
+
+    async def _then(self, reply, handler):
+        return handler(await reply)
+
+    async def _resolved(self, value):
+        return value
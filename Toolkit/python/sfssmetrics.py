@@ -0,0 +1,250 @@
+"""
+Copyright 2022 Dell Inc. or its subsidiaries. All Rights Reserved.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Request instrumentation for sfsslib. The classes below are hooks, i.e.
+callables receiving the sfsslib.RequestEvent of every request issued by a
+RestApi/AsyncRestApi object:
+
+    Metrics   Per endpoint and route (OID with the keys removed) latency
+              histograms with p50/p95/p99 estimates, status, error and retry
+              counters, request/response sizes. Exported in the Prometheus
+              text format.
+    TraceLog  One JSON line per request, written to a file.
+
+@example:
+   metrics = sfssmetrics.Metrics()
+   sfss = sfsslib.RestApi('1.2.3.4', 'admin', 'adminpass', hooks=[metrics, sfssmetrics.TraceLog('/tmp/sfss.trace')])
+   ...
+   print(metrics.report())
+   open('/var/lib/node_exporter/sfss.prom', 'w').write(metrics.prometheus())
+"""
+
+import json
+import time
+import bisect
+import threading
+import statistics
+import collections
+
+# Upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    '''Fixed-bucket histogram, as used by Prometheus. Memory use does not depend on the number of samples.'''
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float):
+        '''
+        @return: An estimate of the @q quantile (0 <= q <= 1), interpolating linearly
+        within the bucket holding it (like Prometheus' histogram_quantile()).
+        None if there are no samples.'''
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for idx, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                if idx == len(self.buckets):
+                    return self.buckets[-1]  # In the +Inf bucket
+                lower = self.buckets[idx - 1] if idx > 0 else 0.0
+                return lower + (self.buckets[idx] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+def percentiles(values: list, percents: tuple = (50, 95, 99)):
+    '''
+    @return: The exact @percents percentiles (integers from 1 to 99) of the samples
+    @values, interpolating linearly between the closest ranks. None for each when
+    @values is empty.'''
+    if len(values) < 2:
+        return [values[0] if values else None for _ in percents]
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return [cuts[percent - 1] for percent in percents]
+
+
+class _RouteStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.server = Histogram()
+        self.statuses = collections.Counter()
+        self.errors = collections.Counter()
+        self.retries = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+
+class Metrics:
+    '''
+    Hook aggregating the RequestEvents per (endpoint, method, route).
+    Thread-safe, so a single object can be shared by several RestApi objects.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = collections.defaultdict(_RouteStats)  # (endpoint, method, route) -> _RouteStats
+
+    def __call__(self, event):
+        with self._lock:
+            stats = self._stats[(event.endpoint, event.method, event.route)]
+            stats.latency.observe(event.elapsed)
+            if event.status is not None:
+                stats.server.observe(event.server)
+                stats.statuses[event.status] += 1
+            if event.error is not None:
+                stats.errors[event.error] += 1
+            if event.attempt > 1:
+                stats.retries += 1
+            stats.request_bytes += event.request_bytes
+            stats.response_bytes += event.response_bytes
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def summary(self):
+        '''
+        @return: A list of dicts, one per (endpoint, method, route), slowest p99 first.
+            Latencies are in seconds. 'client' is the mean time spent between the
+            reply headers and the end of the request (body transfer and client overhead).
+        '''
+        rows = []
+        with self._lock:
+            for (endpoint, method, route), stats in self._stats.items():
+                latency = stats.latency
+                rows.append(
+                    {
+                        'endpoint': endpoint,
+                        'method': method,
+                        'route': route,
+                        'count': latency.count,
+                        'p50': latency.quantile(0.50),
+                        'p95': latency.quantile(0.95),
+                        'p99': latency.quantile(0.99),
+                        'mean': latency.sum / latency.count,
+                        'server': stats.server.sum / stats.server.count if stats.server.count else None,
+                        'client': (latency.sum - stats.server.sum) / stats.server.count if stats.server.count else None,
+                        'statuses': dict(stats.statuses),
+                        'errors': dict(stats.errors),
+                        'retries': stats.retries,
+                        'request_bytes': stats.request_bytes,
+                        'response_bytes': stats.response_bytes,
+                    }
+                )
+        rows.sort(key=lambda row: row['p99'], reverse=True)
+        return rows
+
+    def report(self):
+        '''@return: The summary() as a human-readable table'''
+        lines = [
+            f'{"endpoint":<21} {"method":<7} {"route":<70} {"count":>7} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"server ms":>10} {"client ms":>10} {"errors":>7}'
+        ]
+        for row in self.summary():
+            server = '' if row['server'] is None else f'{row["server"] * 1000:.2f}'
+            client = '' if row['client'] is None else f'{row["client"] * 1000:.2f}'
+            errors = sum(row['errors'].values()) + sum(count for status, count in row['statuses'].items() if status >= 400)
+            lines.append(
+                f'{row["endpoint"]:<21} {row["method"]:<7} {row["route"]:<70} {row["count"]:>7} {row["p50"] * 1000:>9.2f} {row["p95"] * 1000:>9.2f} '
+                f'{row["p99"] * 1000:>9.2f} {server:>10} {client:>10} {errors:>7}'
+            )
+        return '\n'.join(lines)
+
+    def prometheus(self, prefix: str = 'sfss'):
+        '''@return: The metrics in the Prometheus text exposition format (version 0.0.4)'''
+        families = {
+            'request_duration_seconds': ('histogram', 'Duration of the SFSS REST API requests'),
+            'server_duration_seconds': ('histogram', 'Time until the SFSS REST API reply headers were received'),
+            'requests_total': ('counter', 'SFSS REST API replies by HTTP status'),
+            'request_errors_total': ('counter', 'SFSS REST API requests that failed without a reply'),
+            'request_retries_total': ('counter', 'SFSS REST API requests that were retries'),
+            'request_bytes_total': ('counter', 'Size of the SFSS REST API request bodies'),
+            'response_bytes_total': ('counter', 'Size of the SFSS REST API reply bodies'),
+        }
+        samples = {name: [] for name in families}
+        with self._lock:
+            for (endpoint, method, route), stats in sorted(self._stats.items()):
+                labels = _labels(endpoint=endpoint, method=method, route=route)
+                for name, histogram in (('request_duration_seconds', stats.latency), ('server_duration_seconds', stats.server)):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        samples[name].append(f'{prefix}_{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    samples[name].append(f'{prefix}_{name}_sum{{{labels}}} {histogram.sum}')
+                    samples[name].append(f'{prefix}_{name}_count{{{labels}}} {histogram.count}')
+                for status, count in sorted(stats.statuses.items()):
+                    samples['requests_total'].append(f'{prefix}_requests_total{{{labels},status="{status}"}} {count}')
+                for error, count in sorted(stats.errors.items()):
+                    samples['request_errors_total'].append(f'{prefix}_request_errors_total{{{labels},{_labels(error=error)}}} {count}')
+                samples['request_retries_total'].append(f'{prefix}_request_retries_total{{{labels}}} {stats.retries}')
+                samples['request_bytes_total'].append(f'{prefix}_request_bytes_total{{{labels}}} {stats.request_bytes}')
+                samples['response_bytes_total'].append(f'{prefix}_response_bytes_total{{{labels}}} {stats.response_bytes}')
+
+        lines = []
+        for name, (kind, description) in families.items():
+            lines.append(f'# HELP {prefix}_{name} {description}')
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+            lines.extend(samples[name])
+        return '\n'.join(lines) + '\n'
+
+
+class TraceLog:
+    '''
+    Hook writing one JSON object per request to @path (or to an open text file).
+    Times are in milliseconds.
+    '''
+
+    def __init__(self, path_or_file):
+        self._file = open(path_or_file, 'a', encoding='utf-8') if isinstance(path_or_file, str) else path_or_file  # pylint: disable=consider-using-with
+        self._owned = isinstance(path_or_file, str)
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        record = {
+            'time': time.time(),
+            'endpoint': event.endpoint,
+            'method': event.method,
+            'oid': event.oid,
+            'status': event.status,
+            'elapsed_ms': round(event.elapsed * 1000, 3),
+            'server_ms': round(event.server * 1000, 3),
+            'request_bytes': event.request_bytes,
+            'response_bytes': event.response_bytes,
+            'attempt': event.attempt,
+        }
+        if event.error is not None:
+            record['error'] = event.error
+        line = json.dumps(record) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        if self._owned:
+            self._file.close()
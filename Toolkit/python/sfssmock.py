@@ -0,0 +1,706 @@
+#!/usr/bin/env python3
+"""
+Copyright 2022 Dell Inc. or its subsidiaries. All Rights Reserved.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+In-process stand-in for the SFSS app-rest service. It implements the
+Redfish/OData routes used by sfsslib.RestApi on top of an in-memory data
+set so that the library can be exercised and benchmarked without the SFSS
+containers. It is not a model of the SFSS: only the behavior sfsslib relies
+on is reproduced.
+
+Usage:
+    ./sfssmock.py [--port N] [--hosts N] [--subsystems N] [--latency SECONDS] [--tls]
+                  [--capacity N] [--error-rate FRACTION] [--events] [--batch]
+                  [--activation-delay SECONDS]
+"""
+
+import os
+import re
+import ssl
+import json
+import time
+import queue
+import random
+import hashlib
+import argparse
+import tempfile
+import threading
+import subprocess
+import collections
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+NQN_SUFFIX = 'nqn.1988-11.com.dell:SFSS:1:20220523215843e8'
+
+_ROUTES = [
+    # (method, regex, handler name)
+    ('GET', r'SFSSApp/IpAddressManagements', '_get_ip_address_managements'),
+    ('PUT', r'SFSSApp/IpAddressManagements\((?P<iface>[^)]+)\)', '_put_ip_address_management'),
+    ('GET', r'SFSSApp/FoundationalConfigs', '_get_foundational_configs'),
+    ('GET', r'SFSSApp/CDCInstanceManagers', '_get_instances'),
+    ('GET', r'SFSSApp/CDCInstanceManagers\((?P<instance>[^)]+)\)', '_get_instance'),
+    ('PUT', r'SFSSApp/CDCInstanceManagers\((?P<instance>[^)]+)\)', '_put_instance'),
+    ('GET', r'EventService', '_get_event_service'),
+    ('GET', r'SFSS/(?P<instance>\d+)/Hosts', '_get_hosts'),
+    ('GET', r'SFSS/(?P<instance>\d+)/Hosts\((?P<entity>[^)]+)\)', '_get_host'),
+    ('GET', r'SFSS/(?P<instance>\d+)/Subsystems', '_get_subsystems'),
+    ('GET', r'SFSS/(?P<instance>\d+)/Subsystems\((?P<entity>[^)]+)\)', '_get_subsystem'),
+    ('GET', r'SFSS/(?P<instance>\d+)/DDCs', '_get_ddcs'),
+    ('POST', r'SFSS/(?P<instance>\d+)/DDCs', '_post_ddc'),
+    ('DELETE', r'SFSS/(?P<instance>\d+)/DDCs\((?P<ddc>[^)]+)\)', '_delete_ddc'),
+    ('GET', r'SFSS/(?P<instance>\d+)/ZoneDBs', '_get_zonedbs'),
+    ('GET', r'SFSS/(?P<instance>\d+)/ZoneDBs\((?P<db>config|active)\)', '_get_zonedb'),
+    ('POST', r'SFSS/(?P<instance>\d+)/ZoneDBs\(config\)/ZoneGroups', '_post_zone_group'),
+    ('DELETE', r'SFSS/(?P<instance>\d+)/ZoneDBs\(config\)/ZoneGroups\((?P<zg>[^)]+)\)', '_delete_zone_group'),
+    ('PUT', r'SFSS/(?P<instance>\d+)/ZoneDBs\((?P<db>config|active)\)/ZoneGroups\((?P<zg>[^)]+)\)', '_put_zone_group'),
+    ('GET', r'SFSS/(?P<instance>\d+)/ZoneDBs\((?P<db>config|active)\)/ZoneGroups\((?P<zg>[^)]+)\)/Zones', '_get_zones'),
+    ('POST', r'SFSS/(?P<instance>\d+)/ZoneDBs\(config\)/ZoneGroups\((?P<zg>[^)]+)\)/Zones', '_post_zone'),
+    ('DELETE', r'SFSS/(?P<instance>\d+)/ZoneDBs\(config\)/ZoneGroups\((?P<zg>[^)]+)\)/Zones\((?P<zone>[^)]+)\)', '_delete_zone'),
+    (
+        'GET',
+        r'SFSS/(?P<instance>\d+)/ZoneDBs\((?P<db>config|active)\)/ZoneGroups\((?P<zg>[^)]+)\)/Zones\((?P<zone>[^)]+)\)/ZoneMembers',
+        '_get_zone_members',
+    ),
+    (
+        'POST',
+        r'SFSS/(?P<instance>\d+)/ZoneDBs\(config\)/ZoneGroups\((?P<zg>[^)]+)\)/Zones\((?P<zone>[^)]+)\)/ZoneMembers',
+        '_post_zone_member',
+    ),
+]
+_ROUTES = [(method, re.compile(pattern + '$'), handler) for method, pattern, handler in _ROUTES]
+
+
+class NotFound(Exception):
+    pass
+
+
+def make_host(instance: int, index: int):
+    '''@return: A host dict shaped like the ones returned by the SFSS'''
+    uuid = f'{index:032x}'
+    nqn = f'nqn.2014-08.org.nvmexpress:uuid:{uuid[:8]}-{uuid[8:12]}-{uuid[12:16]}-{uuid[16:20]}-{uuid[20:]}'
+    addr = f'10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}'
+    host_id = f'{nqn}@{addr}:V4::0:0:TCP'
+    return {
+        'TransportType': 'TCP',
+        'HostInterface': f'{nqn}@{addr}:V4::0:{40000 + index % 20000}:TCP',
+        'NQN': nqn,
+        'TransportAddress': addr,
+        'TREQ': 'Secure channel Not specified',
+        'EKType': 'TRADDR',
+        'ConnectionStatus': 'Online',
+        'NodeName': f'stfs-cdcproxy-deployment-{instance}-0',
+        'RegistrationType': 'Explicit',
+        'EVersion': 'Linux 5.17.0 SLES 15.4',
+        'TSAS': 'No Security',
+        'HostIdentifier': uuid,
+        'TransportAddressFamily': 'IPV4',
+        'Id': host_id,
+        'EName': f'host{index}',
+        '@odata.id': f"/redfish/v1/SFSS/{instance}/Hosts('{host_id}')",
+        '@odata.type': '#Hosts.Hosts',
+        '@odata.context': f'/redfish/v1/SFSS/{instance}/$metadata#Hosts/Hosts/$entity',
+    }
+
+
+def make_subsystem(instance: int, index: int):
+    '''@return: A subsystem dict shaped like the ones returned by the SFSS'''
+    nqn = f'nqn.1988-11.com.dell:powerstore:00:{index:020x}'
+    addr = f'172.16.{index >> 8 & 255}.{index & 255}'
+    subsystem_id = f'{nqn}@{addr}:V4::0:4420:TCP'
+    return {
+        'TransportType': 'TCP',
+        'NQN': nqn,
+        'TransportAddress': addr,
+        'PortId': 4420,
+        'ConnectionStatus': 'Online',
+        'TransportAddressFamily': 'IPV4',
+        'Id': subsystem_id,
+        'EName': f'array{index}',
+        '@odata.id': f"/redfish/v1/SFSS/{instance}/Subsystems('{subsystem_id}')",
+        '@odata.type': '#Subsystems.Subsystems',
+        '@odata.context': f'/redfish/v1/SFSS/{instance}/$metadata#Subsystems/Subsystems/$entity',
+    }
+
+
+class MockSfss:
+    '''
+    The in-memory state of a stand-in SFSS: CDC instances, each with hosts,
+    subsystems, DDCs and config/active ZoneDBs. All methods are thread-safe.
+    '''
+
+    def __init__(
+        self, hosts: int = 10, subsystems: int = 4, instances: int = 1, events: bool = False, activation_delay: float = 0.0
+    ):
+        '''
+        @param events: Advertise a Redfish EventService with Server-Sent Events (SSE)
+        @param activation_delay: Seconds before a (de)activation shows in the active ZoneDB
+        '''
+        self.events = events
+        self.activation_delay = activation_delay
+        self._pending = []  # (due time, function applying a (de)activation to the active ZoneDB)
+        self._subscribers = []  # One queue.Queue per SSE client
+        self._lock = threading.Lock()
+        self._oid = None  # OID of the request being handled
+        self.requests = collections.Counter()  # (method, handler name) -> count
+        self.instances = {}
+        for instance in range(1, instances + 1):
+            self.instances[str(instance)] = {
+                'cdc': {
+                    'CDCAdminState': 'Enable',
+                    'DiscoverySvcAdminState': 'Enable',
+                    'InstanceIdentifier': str(instance),
+                    'Interfaces': ['ens160'],
+                },
+                'hosts': [make_host(instance, i) for i in range(hosts)],
+                'subsystems': [make_subsystem(instance, i) for i in range(subsystems)],
+                'ddcs': {},
+                'config': {},  # zone group ID -> {zone ID: {'ZoneName': str, 'members': {member ID: role}}}
+                'active': {},
+                'next': {'hosts': hosts, 'subsystems': subsystems},  # Index of the next entity created
+            }
+
+    def dispatch(self, method: str, oid: str, query: dict, body):
+        '''
+        Handle one request. @oid is the path below /redfish/v1 with quotes removed.
+        @return: (HTTP status, JSON-serializable object or None)
+        '''
+        for route_method, pattern, handler in _ROUTES:
+            if route_method != method:
+                continue
+            match = pattern.match(oid)
+            if match is None:
+                continue
+            try:
+                with self._lock:
+                    self._settle()
+                    self.requests[(method, handler)] += 1
+                    self._oid = oid
+                    return getattr(self, handler)(query, body, **match.groupdict())
+            except (KeyError, NotFound):
+                return 404, {'error': {'message': f'{oid} not found'}}
+        return 404, {'error': {'message': f'No route for {method} {oid}'}}
+
+    # **************************************************************************
+    # Changes made by the CDC itself (i.e. not through the REST API), notified
+    # to the SSE clients as Redfish ResourceEvent messages
+    def add_host(self, instance: int):
+        '''Register a new host. @return: The host dict'''
+        return self._add(instance, 'hosts', make_host)
+
+    def add_subsystem(self, instance: int):
+        '''Register a new subsystem. @return: The subsystem dict'''
+        return self._add(instance, 'subsystems', make_subsystem)
+
+    def remove_entity(self, instance: int, collection: str, entity_id: str):
+        '''Remove host/subsystem @entity_id from @collection ('Hosts' or 'Subsystems')'''
+        with self._lock:
+            items = self._instance(str(instance))[collection.lower()]
+            entity = self._find(items, entity_id)
+            items.remove(entity)
+        self._publish('ResourceRemoved', entity['@odata.id'])
+
+    def update_entity(self, instance: int, collection: str, entity_id: str, **fields):
+        '''Change fields of host/subsystem @entity_id (e.g. ConnectionStatus='Offline')'''
+        with self._lock:
+            entity = self._find(self._instance(str(instance))[collection.lower()], entity_id)
+            entity.update(fields)
+        self._publish('ResourceChanged', entity['@odata.id'])
+
+    def _add(self, instance: int, key: str, make):
+        with self._lock:
+            data = self._instance(str(instance))
+            entity = make(instance, data['next'][key])
+            data['next'][key] += 1
+            data[key].append(entity)
+        self._publish('ResourceCreated', entity['@odata.id'])
+        return entity
+
+    def subscribe(self):
+        '''@return: A queue receiving the Redfish Event payloads'''
+        subscriber = queue.Queue()
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.remove(subscriber)
+
+    def _publish(self, message: str, odata_id: str):
+        event = {
+            '@odata.type': '#Event.v1_7_0.Event',
+            'Id': str(time.monotonic_ns()),
+            'Events': [
+                {
+                    'EventType': 'Other',
+                    'MessageId': f'ResourceEvent.1.0.{message}',
+                    'OriginOfCondition': {'@odata.id': odata_id},
+                }
+            ],
+        }
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put(event)
+
+    # **************************************************************************
+    @staticmethod
+    def _find(items: list, entity_id: str):
+        for item in items:
+            if item['Id'] == entity_id:
+                return item
+        raise NotFound()
+
+    def dispatch_batch(self, body: dict):
+        '''
+        Handle an OData JSON batch request: the operations are applied in order.
+        @return: (HTTP status, JSON-serializable object)
+        '''
+        with self._lock:
+            self.requests[('POST', '$batch')] += 1
+        responses = []
+        for request in body.get('requests', []):
+            url = urllib.parse.urlsplit(request['url'])
+            oid = urllib.parse.unquote(url.path).strip('/').replace("'", '')
+            oid = oid.removeprefix('redfish/v1/')
+            query = dict(urllib.parse.parse_qsl(url.query, keep_blank_values=True))
+            status, reply = self.dispatch(request['method'], oid, query, request.get('body'))
+            responses.append({'id': request['id'], 'status': status, 'body': reply})
+        return 200, {'responses': responses}
+
+    def _settle(self):
+        '''Apply the (de)activations that are due'''
+        now = time.monotonic()
+        while self._pending and self._pending[0][0] <= now:
+            self._pending.pop(0)[1]()
+
+    def _instance(self, instance: str):
+        data = self.instances.get(instance)
+        if data is None:
+            raise NotFound()
+        return data
+
+    def _collection(self, query: dict, key: str, items: list, expand_always: bool = False):
+        '''Reply with a collection, applying the $expand, $select, $top and $skip query options'''
+        count = len(items)
+        skip = int(query.get('$skip', 0))
+        top = int(query.get('$top', count))
+        items = items[skip : skip + top]
+        if not expand_always and key not in query.get('$expand', ''):
+            items = [{'@odata.id': item['@odata.id']} for item in items]
+        elif '$select' in query:
+            fields = query['$select'].split(',') + ['@odata.id']
+            items = [{field: item[field] for field in fields if field in item} for item in items]
+        reply = {key: items, f'{key}@odata.count': count}
+        if skip + top < count:
+            next_query = dict(query, **{'$skip': str(skip + top)})
+            reply['@odata.nextLink'] = f'/redfish/v1/{self._oid}?{urllib.parse.urlencode(next_query, safe="$")}'
+        return 200, reply
+
+    # **************************************************************************
+    def _get_ip_address_managements(self, query, body):
+        return self._collection(query, 'IpAddressManagements', [], True)
+
+    def _put_ip_address_management(self, query, body, iface):
+        return 200, dict(body, Id=iface)
+
+    def _get_foundational_configs(self, query, body):
+        return self._collection(query, 'FoundationalConfigs', [], True)
+
+    def _get_instances(self, query, body):
+        items = [self._cdc(instance) for instance in self.instances]
+        return self._collection(query, 'CDCInstanceManagers', items)
+
+    def _cdc(self, instance):
+        return dict(
+            self.instances[instance]['cdc'],
+            **{'@odata.id': f"/redfish/v1/SFSSApp/CDCInstanceManagers('{instance}')"},
+        )
+
+    def _get_instance(self, query, body, instance):
+        self._instance(instance)
+        return 200, self._cdc(instance)
+
+    def _put_instance(self, query, body, instance):
+        if instance not in self.instances:
+            self.instances[instance] = {
+                'hosts': [],
+                'subsystems': [],
+                'ddcs': {},
+                'config': {},
+                'active': {},
+            }
+        self.instances[instance]['cdc'] = dict(body, InstanceIdentifier=instance)
+        return 200, self._cdc(instance)
+
+    def _get_hosts(self, query, body, instance):
+        return self._collection(query, 'Hosts', self._instance(instance)['hosts'])
+
+    def _get_host(self, query, body, instance, entity):
+        return 200, self._find(self._instance(instance)['hosts'], entity)
+
+    def _get_subsystems(self, query, body, instance):
+        return self._collection(query, 'Subsystems', self._instance(instance)['subsystems'])
+
+    def _get_subsystem(self, query, body, instance, entity):
+        return 200, self._find(self._instance(instance)['subsystems'], entity)
+
+    def _get_event_service(self, query, body):
+        if not self.events:
+            raise NotFound()
+        return 200, {
+            'Id': 'EventService',
+            'ServiceEnabled': True,
+            'ServerSentEventUri': '/redfish/v1/EventService/SSE',
+            '@odata.id': '/redfish/v1/EventService',
+        }
+
+    def _get_ddcs(self, query, body, instance):
+        return self._collection(query, 'DDCs', list(self._instance(instance)['ddcs'].values()), True)
+
+    def _post_ddc(self, query, body, instance):
+        ddcs = self._instance(instance)['ddcs']
+        ddc_id = f"{body['TransportAddress']}:{body['PortId']}:{body['TransportType']}"
+        if ddc_id in ddcs:
+            return 409, {'error': {'message': f'DDC {ddc_id} already exists'}}
+        ddcs[ddc_id] = dict(body, Id=ddc_id, **{'@odata.id': f"/redfish/v1/SFSS/{instance}/DDCs('{ddc_id}')"})
+        return 201, dict(ddcs[ddc_id], EId=ddc_id)
+
+    def _delete_ddc(self, query, body, instance, ddc):
+        del self._instance(instance)['ddcs'][ddc]
+        return 200, None
+
+    # **************************************************************************
+    def _get_zonedbs(self, query, body, instance):
+        self._instance(instance)
+        items = [{'@odata.id': f"/redfish/v1/SFSS/{instance}/ZoneDBs('{db}')"} for db in ('config', 'active')]
+        return 200, {'ZoneDBs': items}
+
+    def _get_zonedb(self, query, body, instance, db):
+        zone_groups = list(self._instance(instance)[db])
+        return 200, {
+            'NumberZoneGroups': len(zone_groups),
+            'ZoneGroups': zone_groups,
+            '@odata.id': f"/redfish/v1/SFSS/{instance}/ZoneDBs('{db}')",
+        }
+
+    def _post_zone_group(self, query, body, instance):
+        config = self._instance(instance)['config']
+        zone_group_id = f"config:{body['ZoneGroupName']}:{NQN_SUFFIX}"
+        if zone_group_id in config:
+            return 409, {'error': {'message': f'Zone group {zone_group_id} already exists'}}
+        config[zone_group_id] = {}
+        return 201, {'EId': zone_group_id}
+
+    def _delete_zone_group(self, query, body, instance, zg):
+        del self._instance(instance)['config'][zg]
+        return 200, None
+
+    def _put_zone_group(self, query, body, instance, db, zg):
+        data = self._instance(instance)
+        active_id = 'active:' + zg.split(':', 1)[1]
+        status = body.get('ActivateStatus')
+        if status == 'Activate':
+            zones = {
+                zone_id.replace(zg, active_id, 1): {'ZoneName': zone['ZoneName'], 'members': dict(zone['members'])}
+                for zone_id, zone in data['config'][zg].items()
+            }
+
+            def change():
+                data['active'][active_id] = zones
+
+        elif status == 'DeActivate':
+
+            def change():
+                data['active'].pop(active_id, None)
+                data['active'].pop(zg, None)
+
+        else:
+            return 400, {'error': {'message': f'Unsupported ActivateStatus {status}'}}
+        if self.activation_delay:
+            self._pending.append((time.monotonic() + self.activation_delay, change))
+        else:
+            change()
+        return 200, None
+
+    def _get_zones(self, query, body, instance, db, zg):
+        zones = self._instance(instance)[db][zg]
+        items = [
+            {
+                'ZoneName': zone['ZoneName'],
+                'ZoneId': zone_id,
+                'numberZoneMembers': str(len(zone['members'])),
+                '@odata.id': f"/redfish/v1/SFSS/{instance}/ZoneDBs('{db}')/ZoneGroups({zg})/Zones('{zone_id}')",
+            }
+            for zone_id, zone in zones.items()
+        ]
+        return self._collection(query, 'Zones', items)
+
+    def _post_zone(self, query, body, instance, zg):
+        zones = self._instance(instance)['config'][zg]
+        zone_id = f"{zg}:{body['ZoneName']}"
+        if zone_id in zones:
+            return 409, {'error': {'message': f'Zone {zone_id} already exists'}}
+        zones[zone_id] = {'ZoneName': body['ZoneName'], 'members': {}}
+        return 201, {'EId': zone_id}
+
+    def _delete_zone(self, query, body, instance, zg, zone):
+        del self._instance(instance)['config'][zg][zone]
+        return 200, None
+
+    def _get_zone_members(self, query, body, instance, db, zg, zone):
+        members = self._instance(instance)[db][zg][zone]['members']
+        items = [
+            {
+                'ZoneMemberType': 'FullQualifiedName',
+                'ZoneMemberId': f'{zone}:{member}',
+                'Role': role,
+                '@odata.id': f"/redfish/v1/SFSS/{instance}/ZoneDBs('{db}')/ZoneGroups({zg})/Zones({zone})/ZoneMembers('{zone}:{member}')",
+            }
+            for member, role in members.items()
+        ]
+        return self._collection(query, 'ZoneMembers', items)
+
+    def _post_zone_member(self, query, body, instance, zg, zone):
+        members = self._instance(instance)['config'][zg][zone]['members']
+        member = body['ZoneMemberId']
+        if member in members:
+            return 409, {'error': {'message': f'Member {member} already exists'}}
+        members[member] = body['Role']
+        return 201, {'EId': f'{zone}:{member}'}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _handle(self):
+        url = urllib.parse.urlsplit(self.path)
+        prefix = '/redfish/v1/'
+        if url.path == prefix + 'EventService/SSE' and self.server.sfss.events:
+            self._stream_events()
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+
+        server = self.server
+        with server.lock:
+            server.active += 1
+            overloaded = server.capacity and server.active > server.capacity
+        try:
+            if server.latency or server.jitter:
+                time.sleep(server.latency + random.uniform(0, server.jitter))
+            status, reply = self._reply(url, prefix, body, overloaded)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+        content = b'' if reply is None else json.dumps(reply).encode()
+        etag = None
+        if self.command == 'GET' and status == 200:
+            etag = f'"{hashlib.blake2b(content, digest_size=8).hexdigest()}"'
+            if self.headers.get('If-None-Match') == etag:
+                status, content = 304, b''
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+        if status != 304:
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _reply(self, url, prefix: str, body, overloaded: bool):
+        server = self.server
+        if overloaded:
+            status, reply = 429, {'error': {'message': 'Too many requests'}}
+        elif server.error_rate and random.random() < server.error_rate:
+            status, reply = 503, {'error': {'message': 'Service unavailable'}}
+        elif not url.path.startswith(prefix):
+            status, reply = 404, None
+        elif url.path == prefix + '$batch' and self.command == 'POST' and server.batch:
+            status, reply = server.sfss.dispatch_batch(body)
+        else:
+            oid = urllib.parse.unquote(url.path[len(prefix) :]).replace("'", '')
+            query = dict(urllib.parse.parse_qsl(url.query, keep_blank_values=True))
+            status, reply = server.sfss.dispatch(self.command, oid, query, body)
+        return status, reply
+
+    def _stream_events(self):
+        '''Send the events as they are published, as an endless text/event-stream reply'''
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        sfss = self.server.sfss
+        subscriber = sfss.subscribe()
+        try:
+            while not self.server.closing:
+                try:
+                    event = subscriber.get(timeout=1.0)
+                    self.wfile.write(f'id: {event["Id"]}\ndata: {json.dumps(event)}\n\n'.encode())
+                except queue.Empty:
+                    self.wfile.write(b': keep-alive\n\n')
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            sfss.unsubscribe(subscriber)
+
+    do_GET = do_PUT = do_POST = do_DELETE = _handle  # pylint: disable=invalid-name
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def _self_signed_context():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cert = os.path.join(tmpdir, 'cert.pem')
+        key = os.path.join(tmpdir, 'key.pem')
+        subprocess.run(
+            [
+                'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                '-subj', '/CN=localhost', '-keyout', key, '-out', cert,
+            ],
+            check=True,
+            capture_output=True,
+        )
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(cert, key)
+    return ctx
+
+
+class MockServer:
+    '''
+    Serve a MockSfss over HTTP (or HTTPS with a self-signed certificate,
+    generated with the openssl command) from a background thread.
+    @param latency: Seconds added to every request
+    @param jitter: Up to that many more seconds, picked at random, added to every request
+    @param capacity: When > 0, requests beyond that many in progress are answered with 429
+    @param error_rate: Fraction of the requests answered with 503 (without being processed)
+    @param events: Advertise a Redfish EventService with Server-Sent Events
+    @param batch: Accept OData JSON batch requests ($batch)
+    @param activation_delay: Seconds before a (de)activation shows in the active ZoneDB
+    @example:
+       with sfssmock.MockServer(hosts=1000) as server:
+           sfss = sfsslib.RestApi(server.address, 'admin', 'adminpass', scheme=server.scheme)
+           hosts = sfss.get_hosts(1)
+    '''
+
+    def __init__(
+        self,
+        hosts: int = 10,
+        subsystems: int = 4,
+        instances: int = 1,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        tls: bool = False,
+        port: int = 0,
+        capacity: int = 0,
+        error_rate: float = 0.0,
+        events: bool = False,
+        batch: bool = False,
+        activation_delay: float = 0.0,
+    ):
+        self.sfss = MockSfss(hosts, subsystems, instances, events, activation_delay)
+        self.scheme = 'https' if tls else 'http'
+        self._server = _Server(('127.0.0.1', port), _Handler)
+        self._server.sfss = self.sfss
+        self._server.latency = latency
+        self._server.jitter = jitter
+        self._server.capacity = capacity
+        self._server.error_rate = error_rate
+        self._server.active = 0
+        self._server.closing = False
+        self._server.batch = batch
+        self._server.lock = threading.Lock()
+        if tls:
+            self._server.socket = _self_signed_context().wrap_socket(self._server.socket, server_side=True)
+        self._thread = None
+
+    @property
+    def address(self):
+        '''@return: "ip:port", the ip_addr parameter to give to sfsslib.RestApi'''
+        return f'127.0.0.1:{self._server.server_address[1]}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        '''Serve from the calling thread until interrupted'''
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.closing = True
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in SFSS REST API server')
+    parser.add_argument('--port', type=int, default=8080, help='TCP port (default: 8080)')
+    parser.add_argument('--hosts', type=int, default=10, help='Hosts per CDC instance (default: 10)')
+    parser.add_argument('--subsystems', type=int, default=4, help='Subsystems per CDC instance (default: 4)')
+    parser.add_argument('--instances', type=int, default=1, help='Number of CDC instances (default: 1)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every request (default: 0)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random extra latency, in seconds (default: 0)')
+    parser.add_argument('--tls', action='store_true', help='Serve HTTPS with a self-signed certificate')
+    parser.add_argument('--capacity', type=int, default=0, help='Answer 429 beyond that many concurrent requests (default: no limit)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of the requests answered with 503 (default: 0)')
+    parser.add_argument('--events', action='store_true', help='Advertise a Redfish EventService with Server-Sent Events')
+    parser.add_argument('--batch', action='store_true', help='Accept OData JSON batch requests ($batch)')
+    parser.add_argument(
+        '--activation-delay', type=float, default=0.0, help='Seconds before a (de)activation shows in the active ZoneDB (default: 0)'
+    )
+    args = parser.parse_args()
+
+    server = MockServer(
+        args.hosts,
+        args.subsystems,
+        args.instances,
+        args.latency,
+        args.jitter,
+        args.tls,
+        args.port,
+        args.capacity,
+        args.error_rate,
+        args.events,
+        args.batch,
+        args.activation_delay,
+    )
+    print(f'Serving {server.scheme}://{server.address}/redfish/v1 (Ctrl-C to stop)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
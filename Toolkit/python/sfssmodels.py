@@ -0,0 +1,255 @@
+"""
+Copyright 2022 Dell Inc. or its subsidiaries. All Rights Reserved.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Compact, immutable records for the entities returned by sfsslib.RestApi.
+
+The dicts returned by sfsslib carry three @odata.* strings per entity and
+repeat the same enumeration values ('TCP', 'IPV4', 'Online', ...) in every
+item. The records below use __slots__, share a single copy of each
+enumeration string (sys.intern), keep only @odata.id (and only when asked
+to), and parse the Id/HostInterface strings once.
+
+The get_*()/iter_*() functions also ask the server, with OData $select, to
+send only the fields used by the records.
+@example:
+   sfss = sfsslib.RestApi('1.2.3.4', 'admin', 'adminpass')
+   for host in sfssmodels.iter_hosts(sfss, 1):
+       print(host.nqn, host.traddr, host.trsvcid)
+"""
+
+import sys
+import dataclasses
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_interface(interface: str):
+    '''
+    Split a host/subsystem Id or HostInterface string.
+    @return: (nqn, traddr, adrfam, trsvcid, trtype), or None if @interface is not in that format
+    @example:
+       parse_interface('nqn.2014-08.org.nvmexpress:uuid:83294d56-1ebf-a154-d613-a7cb28c6ef39@100.94.69.50:V4::0:39770:TCP')
+       >>> ('nqn.2014-08.org.nvmexpress:uuid:83294d56-1ebf-a154-d613-a7cb28c6ef39', '100.94.69.50', 'V4', 39770, 'TCP')
+    '''
+    nqn, sep, rest = (interface or '').rpartition('@')
+    if not sep:
+        return None
+    # Split from the right since IPv6 addresses contain ':'
+    fields = rest.rsplit(':', 5)
+    if len(fields) != 6:
+        return None
+    traddr, adrfam, _, _, trsvcid, trtype = fields
+    return nqn, traddr, _intern(adrfam), _int(trsvcid), _intern(trtype)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Host:
+    id: str  # pylint: disable=invalid-name
+    nqn: str
+    traddr: str
+    trtype: str
+    adrfam: str
+    trsvcid: int  # Port, from HostInterface
+    status: str
+    name: str  # EName
+    node_name: str
+    host_identifier: str
+    registration_type: str
+    version: str  # EVersion
+    tsas: str
+    treq: str
+    ektype: str
+    odata_id: str = None
+
+    # The fields requested with $select
+    FIELDS = (
+        'Id', 'NQN', 'TransportAddress', 'TransportType', 'TransportAddressFamily', 'HostInterface',
+        'ConnectionStatus', 'EName', 'NodeName', 'HostIdentifier', 'RegistrationType', 'EVersion',
+        'TSAS', 'TREQ', 'EKType',
+    )
+
+    @classmethod
+    def from_dict(cls, host: dict, keep_odata: bool = False):
+        interface = parse_interface(host.get('HostInterface'))
+        return cls(
+            host.get('Id'),
+            host.get('NQN'),
+            host.get('TransportAddress'),
+            _intern(host.get('TransportType')),
+            _intern(host.get('TransportAddressFamily')),
+            interface[3] if interface else None,
+            _intern(host.get('ConnectionStatus')),
+            host.get('EName'),
+            _intern(host.get('NodeName')),
+            host.get('HostIdentifier'),
+            _intern(host.get('RegistrationType')),
+            _intern(host.get('EVersion')),
+            _intern(host.get('TSAS')),
+            _intern(host.get('TREQ')),
+            _intern(host.get('EKType')),
+            host.get('@odata.id') if keep_odata else None,
+        )
+
+    @property
+    def host_interface(self):
+        '''@return: The HostInterface string, rebuilt from Id and trsvcid'''
+        if self.trsvcid is None or self.id is None:
+            return None
+        prefix, _, _ = self.id.rsplit(':', 2)
+        return f'{prefix}:{self.trsvcid}:{self.trtype}'
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Subsystem:
+    id: str  # pylint: disable=invalid-name
+    nqn: str
+    traddr: str
+    trtype: str
+    adrfam: str
+    trsvcid: int  # PortId
+    status: str
+    name: str  # EName
+    odata_id: str = None
+
+    FIELDS = ('Id', 'NQN', 'TransportAddress', 'TransportType', 'TransportAddressFamily', 'PortId', 'ConnectionStatus', 'EName')
+
+    @classmethod
+    def from_dict(cls, subsystem: dict, keep_odata: bool = False):
+        return cls(
+            subsystem.get('Id'),
+            subsystem.get('NQN'),
+            subsystem.get('TransportAddress'),
+            _intern(subsystem.get('TransportType')),
+            _intern(subsystem.get('TransportAddressFamily')),
+            _int(subsystem.get('PortId')),
+            _intern(subsystem.get('ConnectionStatus')),
+            subsystem.get('EName'),
+            subsystem.get('@odata.id') if keep_odata else None,
+        )
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class DDC:
+    id: str  # pylint: disable=invalid-name
+    traddr: str
+    trtype: str
+    adrfam: str
+    trsvcid: int  # PortId
+    nqn: str
+    odata_id: str = None
+
+    FIELDS = ('Id', 'TransportAddress', 'TransportType', 'TransportAddressFamily', 'PortId', 'NQN')
+
+    @classmethod
+    def from_dict(cls, ddc: dict, keep_odata: bool = False):
+        return cls(
+            ddc.get('Id'),
+            ddc.get('TransportAddress'),
+            _intern(ddc.get('TransportType')),
+            _intern(ddc.get('TransportAddressFamily')),
+            _int(ddc.get('PortId')),
+            ddc.get('NQN'),
+            ddc.get('@odata.id') if keep_odata else None,
+        )
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Zone:
+    id: str  # pylint: disable=invalid-name
+    name: str
+    member_count: int
+    odata_id: str = None
+
+    FIELDS = ('ZoneId', 'ZoneName', 'numberZoneMembers')
+
+    @classmethod
+    def from_dict(cls, zone: dict, keep_odata: bool = False):
+        return cls(
+            zone.get('ZoneId'),
+            zone.get('ZoneName'),
+            _int(zone.get('numberZoneMembers')),
+            zone.get('@odata.id') if keep_odata else None,
+        )
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ZoneMember:
+    id: str  # pylint: disable=invalid-name
+    # id is '<zone ID>:<member>', as reported by the SFSS
+    role: str
+    type: str
+    odata_id: str = None
+
+    FIELDS = ('ZoneMemberId', 'Role', 'ZoneMemberType')
+
+    @classmethod
+    def from_dict(cls, member: dict, keep_odata: bool = False):
+        return cls(
+            member.get('ZoneMemberId'),
+            _intern(member.get('Role')),
+            _intern(member.get('ZoneMemberType')),
+            member.get('@odata.id') if keep_odata else None,
+        )
+
+    def member(self, zone_id: str):
+        '''@return: The host/subsystem Id, i.e. the ZoneMemberId without the "<zone_id>:" prefix'''
+        return self.id.removeprefix(f'{zone_id}:')
+
+
+# ******************************************************************************
+def get_hosts(sfss, instance: int, keep_odata: bool = False):
+    '''@return: List of Host records on success, empty list otherwise.'''
+    return [Host.from_dict(host, keep_odata) for host in sfss.get_hosts(instance, select=list(Host.FIELDS))]
+
+
+def iter_hosts(sfss, instance: int, keep_odata: bool = False, page_size: int = 500):
+    '''Iterate over the hosts as Host records (see sfsslib.RestApi.iter_hosts())'''
+    for host in sfss.iter_hosts(instance, page_size, select=list(Host.FIELDS)):
+        yield Host.from_dict(host, keep_odata)
+
+
+def get_subsystems(sfss, instance: int, keep_odata: bool = False):
+    '''@return: List of Subsystem records on success, empty list otherwise.'''
+    subsystems = sfss.get_subsystems(instance, select=list(Subsystem.FIELDS))
+    return [Subsystem.from_dict(subsystem, keep_odata) for subsystem in subsystems]
+
+
+def iter_subsystems(sfss, instance: int, keep_odata: bool = False, page_size: int = 500):
+    '''Iterate over the subsystems as Subsystem records'''
+    for subsystem in sfss.iter_subsystems(instance, page_size, select=list(Subsystem.FIELDS)):
+        yield Subsystem.from_dict(subsystem, keep_odata)
+
+
+def get_ddcs(sfss, instance: int, keep_odata: bool = False):
+    '''@return: List of DDC records on success, empty list otherwise.'''
+    return [DDC.from_dict(ddc, keep_odata) for ddc in sfss.get_ddcs(instance, select=list(DDC.FIELDS))]
+
+
+def get_zones(sfss, instance: int, zone_group_id: str, keep_odata: bool = False):
+    '''@return: List of Zone records on success, empty list otherwise.'''
+    zones = sfss.get_zones(instance, zone_group_id, select=list(Zone.FIELDS))
+    return [Zone.from_dict(zone, keep_odata) for zone in zones]
+
+
+def get_zone_members(sfss, instance: int, zone_group_id: str, zone_id: str, keep_odata: bool = False):
+    '''@return: List of ZoneMember records on success, empty list otherwise.'''
+    members = sfss.get_zone_members(instance, zone_group_id, zone_id, select=list(ZoneMember.FIELDS))
+    return [ZoneMember.from_dict(member, keep_odata) for member in members]
@@ -0,0 +1,315 @@
+"""
+Copyright 2022 Dell Inc. or its subsidiaries. All Rights Reserved.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Attribute-driven zoning. Rules select hosts by subnet of their
+TransportAddress, NQN prefix, EName/NodeName pattern and TransportType and
+map them to a set of subsystems. The PolicyEngine places the hosts in the
+zones of the rules they match and, as hosts come and go, returns only the
+zoning operations needed for the zones they affect.
+
+Subnets are looked up in a binary prefix trie, NQN prefixes by hashing the
+prefixes of the NQN, and the result of the EName/NodeName patterns is kept
+per distinct name, so that placing a host costs about the same whatever the
+number of rules.
+@example:
+   rules = [
+       sfsspolicy.Rule('rack1', subsystems=['nqn.1988-11.com.dell:powerstore:00:a1'], subnet='10.10.1.0/24'),
+       sfsspolicy.Rule('linux', subsystems=['nqn.1988-11.com.dell:powerstore:00:a2'], ename='sles*', per='address'),
+   ]
+   engine = sfsspolicy.PolicyEngine('ZG-VLAN100', rules, sfss.get_subsystems(1))
+   # First run: bring the whole zone group to the state given by the rules
+   engine.place(sfss.get_hosts(1))
+   sfsszoning.Reconciler(sfss).reconcile(1, engine.spec)
+   # Then, only apply the changes
+   for event in sfsswatch.Watcher(sfss, 1, collections=('Hosts',)).watch():
+       operations = engine.update(added=[event.item]) if event.item else engine.update(removed=[event.id])
+       sfsspolicy.apply(sfss, 1, operations)
+"""
+
+import re
+import fnmatch
+import ipaddress
+import dataclasses
+import collections
+import sfsslib
+import sfsszoning
+
+# Criteria of a Rule, and the host attribute each one applies to
+CRITERIA = {
+    'subnet': 'TransportAddress',
+    'nqn_prefix': 'NQN',
+    'ename': 'EName',
+    'node_name': 'NodeName',
+    'transport': 'TransportType',
+}
+
+
+@dataclasses.dataclass
+class Rule:
+    '''
+    Zone the hosts matching all the given criteria with @subsystems (NQNs or
+    Ids). A rule without criteria matches every host. @per is 'rule' for one
+    zone named @name holding all the matching hosts, or 'address' for one zone
+    per TransportAddress, named "<name>-<address>".
+    '''
+
+    name: str
+    subsystems: list
+    subnet: str = None  # e.g. '10.10.0.0/16' or 'fd00::/64'
+    nqn_prefix: str = None
+    ename: str = None  # fnmatch pattern, e.g. 'sles*'
+    node_name: str = None  # fnmatch pattern
+    transport: str = None  # e.g. 'TCP'
+    per: str = 'rule'
+
+    def criteria(self):
+        return [criterion for criterion in CRITERIA if getattr(self, criterion) is not None]
+
+
+class SubnetTrie:
+    '''Binary trie of IP networks, returning the values of all the networks containing an address'''
+
+    def __init__(self):
+        self._roots = {4: [None, None, []], 6: [None, None, []]}  # node: [child 0, child 1, values]
+
+    def add(self, network: str, value):
+        net = ipaddress.ip_network(network, strict=False)
+        node = self._roots[net.version]
+        bits = int(net.network_address)
+        for shift in range(net.max_prefixlen - 1, net.max_prefixlen - 1 - net.prefixlen, -1):
+            bit = bits >> shift & 1
+            if node[bit] is None:
+                node[bit] = [None, None, []]
+            node = node[bit]
+        node[2].append(value)
+
+    def match(self, address: str):
+        '''@return: The values of the networks containing @address (empty list for an invalid address)'''
+        try:
+            addr = ipaddress.ip_address(address)
+        except ValueError:
+            return []
+        node = self._roots[addr.version]
+        bits = int(addr)
+        values = list(node[2])
+        for shift in range(addr.max_prefixlen - 1, -1, -1):
+            node = node[bits >> shift & 1]
+            if node is None:
+                break
+            values.extend(node[2])
+        return values
+
+
+class _PrefixIndex:
+    '''Values keyed by string prefixes, looked up with one hash per distinct prefix length'''
+
+    def __init__(self):
+        self._prefixes = collections.defaultdict(list)
+        self._lengths = set()
+
+    def add(self, prefix: str, value):
+        self._prefixes[prefix].append(value)
+        self._lengths.add(len(prefix))
+
+    def match(self, text: str):
+        values = []
+        for length in self._lengths:
+            if length <= len(text):
+                values.extend(self._prefixes.get(text[:length], ()))
+        return values
+
+
+class _PatternIndex:
+    '''Values keyed by fnmatch patterns, with the matches of every distinct name remembered'''
+
+    def __init__(self):
+        self._exact = collections.defaultdict(list)
+        self._patterns = []  # (compiled pattern, value)
+        self._memo = {}
+
+    def add(self, pattern: str, value):
+        if any(char in pattern for char in '*?['):
+            self._patterns.append((re.compile(fnmatch.translate(pattern)), value))
+        else:
+            self._exact[pattern].append(value)
+        self._memo.clear()
+
+    def match(self, name: str):
+        values = self._memo.get(name)
+        if values is None:
+            values = self._memo[name] = self._exact.get(name, []) + [
+                value for pattern, value in self._patterns if pattern.match(name)
+            ]
+        return values
+
+
+# ******************************************************************************
+class PolicyEngine:
+    '''
+    Place hosts (dicts as returned by get_hosts()) in the zones of zone
+    group @zone_group according to @rules. @subsystems (as returned by
+    get_subsystems()) resolves the subsystems of the rules to their Ids.
+    '''
+
+    def __init__(self, zone_group: str, rules: list, subsystems: list):
+        self.zone_group = zone_group
+        self._rules = list(rules)
+        self._indexes = {
+            'subnet': SubnetTrie(),
+            'nqn_prefix': _PrefixIndex(),
+            'ename': _PatternIndex(),
+            'node_name': _PatternIndex(),
+            'transport': _PatternIndex(),
+        }
+        self._required = []  # rule index -> number of criteria
+        self._catch_all = []
+        for idx, rule in enumerate(self._rules):
+            criteria = rule.criteria()
+            self._required.append(len(criteria))
+            if not criteria:
+                self._catch_all.append(idx)
+            for criterion in criteria:
+                self._indexes[criterion].add(getattr(rule, criterion), idx)
+
+        by_name = {}
+        for subsystem in subsystems:
+            by_name[subsystem.get('NQN')] = by_name[subsystem.get('Id')] = subsystem.get('Id')
+        self._subsystems = [{by_name.get(name, name): 'Subsystem' for name in rule.subsystems} for rule in self._rules]
+
+        self._host_zones = {}  # host Id -> zone names
+        self._zones = {}  # zone name -> {member: role}
+
+    @property
+    def spec(self):
+        '''@return: The zone group as a sfsszoning.Reconciler spec'''
+        return {self.zone_group: {zone: dict(members) for zone, members in self._zones.items()}}
+
+    def _matches(self, host: dict):
+        '''@return: The indexes of the rules matched by @host'''
+        hits = collections.Counter(self._catch_all)
+        for criterion, attribute in CRITERIA.items():
+            value = host.get(attribute)
+            if value is not None:
+                hits.update(self._indexes[criterion].match(value))
+        return [idx for idx, count in sorted(hits.items()) if count >= self._required[idx]]
+
+    def _placement(self, host: dict):
+        '''@return: {zone name: rule index} of the zones @host belongs in'''
+        placement = {}
+        for idx in self._matches(host):
+            rule = self._rules[idx]
+            if rule.per == 'rule':
+                placement[rule.name] = idx
+            elif host.get('TransportAddress'):
+                placement[f'{rule.name}-{host["TransportAddress"]}'] = idx
+        return placement
+
+    def rules(self, host: dict):
+        '''@return: The Rules matched by @host'''
+        return [self._rules[idx] for idx in self._matches(host)]
+
+    def zones(self, host: dict):
+        '''@return: The names of the zones @host belongs in'''
+        return list(self._placement(host))
+
+    def place(self, hosts: list):
+        '''Same as update(added=@hosts)'''
+        return self.update(added=hosts)
+
+    def update(self, added: list = (), removed: list = ()):
+        '''
+        Place the @added hosts (new ones, or changed ones that may have to move
+        to other zones) and remove the @removed hosts (Ids or dicts).
+        The SFSS API cannot remove a member from a zone: a zone losing a host
+        is deleted and re-created with its remaining members.
+        @return: The list of sfsszoning.Operations that bring the zone group from the
+            previous to the new placement, for just the zones that changed
+        '''
+        rule_of_zone = {}
+        changes = []  # (host Id, zones before, zones after)
+        for host in removed:
+            host_id = host if isinstance(host, str) else host['Id']
+            changes.append((host_id, self._host_zones.pop(host_id, []), []))
+        for host in added:
+            placement = self._placement(host)
+            rule_of_zone.update(placement)
+            changes.append((host['Id'], self._host_zones.get(host['Id'], []), list(placement)))
+            self._host_zones[host['Id']] = list(placement)
+
+        created, rebuilt, new_members = set(), set(), collections.defaultdict(dict)
+        for host_id, before, after in changes:
+            for zone in set(before) - set(after):
+                members = self._zones.get(zone)
+                if members is not None and members.pop(host_id, None) is not None:
+                    rebuilt.add(zone)
+            for zone in set(after) - set(before):
+                members = self._zones.get(zone)
+                if members is None:
+                    members = self._zones[zone] = dict(self._subsystems[rule_of_zone[zone]])
+                    created.add(zone)
+                    new_members[zone].update(members)
+                members[host_id] = 'Host'
+                new_members[zone][host_id] = 'Host'
+
+        operations = []
+        for zone in sorted(rebuilt - created):
+            operations.append(sfsszoning.Operation('delete_zone', self.zone_group, zone))
+            if any(role == 'Host' for role in self._zones[zone].values()):
+                created.add(zone)
+                new_members[zone] = dict(self._zones[zone])
+            else:
+                del self._zones[zone]  # Only subsystems left
+        for zone in sorted(created):
+            operations.append(sfsszoning.Operation('create_zone', self.zone_group, zone))
+        for zone, members in sorted(new_members.items()):
+            if zone in self._zones:
+                operations.extend(
+                    sfsszoning.Operation('add_zone_member', self.zone_group, zone, member, role) for member, role in members.items()
+                )
+        return operations
+
+
+def apply(sfss: sfsslib.RestApi, instance: int, operations: list, max_workers: int = 16):
+    '''
+    Apply the @operations returned by PolicyEngine.update() to CDC instance
+    @instance with a sfsszoning.Reconciler, after looking up the IDs of the
+    existing zone group and zones (the zone group is created if needed).
+    The members of a zone that no longer exists (deleted out of band) are
+    reported as failures: sfsszoning.Reconciler().reconcile() of the
+    engine's spec re-creates the zone with all its members.
+    @return: A sfsszoning.ZoningResult
+    '''
+    if not operations:
+        return sfsszoning.ZoningResult()
+    zone_group = operations[0].zone_group
+    zone_group_id = sfss.get_zone_group_id(instance, zone_group)
+    zone_ids = {}
+    if zone_group_id is None:
+        operations = [sfsszoning.Operation('create_zone_group', zone_group)] + operations
+    else:
+        zone_ids = {zone['ZoneName']: zone['ZoneId'] for zone in sfss.get_zones(instance, zone_group_id, select=['ZoneName', 'ZoneId'])}
+
+    created = {op.zone for op in operations if op.operation == 'create_zone'}
+    for op in operations:
+        op.zone_group_id = zone_group_id
+        if op.operation == 'delete_zone' or (op.operation == 'add_zone_member' and op.zone not in created):
+            op.zone_id = zone_ids.get(op.zone)
+    kept, missing = [], []
+    for op in operations:
+        if op.zone_id is not None or op.operation not in ('delete_zone', 'add_zone_member') or op.zone in created:
+            kept.append(op)
+        elif op.operation == 'add_zone_member':
+            missing.append(op)  # The zone was deleted out of band: its members cannot be added
+        # else: the zone to delete is already gone
+    result = sfsszoning.Reconciler(sfss, max_workers).apply(sfsszoning.ReconcilePlan(instance, kept))
+    result.failures.extend(sfsszoning.Failure(op.operation, str(op), 'zone not found, reconcile engine.spec') for op in missing)
+    return result
@@ -0,0 +1,271 @@
+"""
+Copyright 2022 Dell Inc. or its subsidiaries. All Rights Reserved.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Save the full state of a CDC instance (as read by sfssfabric.take_snapshot())
+to a single file, load it back and restore its zoning on an SFSS.
+
+File layout (little-endian):
+    b'SFSSSNAP'                   magic
+    uint16                        format version
+    uint32                        length of the table of contents
+    table of contents             JSON: {'meta': {...}, 'sections': {name: [offset, length]}}
+    sections                      zlib-compressed JSON, one per top-level key of the snapshot
+
+Lists of dicts sharing the same keys (hosts, subsystems, ...) are stored
+column-wise, i.e. the keys once followed by rows of values. The file is
+memory-mapped when loaded and a section is only decompressed when used.
+@example:
+   sfss = sfsslib.RestApi('1.2.3.4', 'admin', 'adminpass')
+   sfsssnapshot.save('/tmp/cdc1.snap', sfssfabric.take_snapshot(sfss, 1), endpoint='1.2.3.4')
+
+   with sfsssnapshot.load('/tmp/cdc1.snap') as snapshot:
+       print(len(snapshot['hosts']), 'hosts')
+       index = sfssfabric.FabricIndex(snapshot.to_dict())
+
+   # Re-create the zoning on a rebuilt SFSS
+   with sfsssnapshot.load('/tmp/cdc1.snap') as snapshot:
+       plan, result = sfsssnapshot.restore(sfsslib.RestApi('5.6.7.8', 'admin', 'adminpass'), snapshot)
+"""
+
+import os
+import mmap
+import json
+import time
+import zlib
+import struct
+import concurrent.futures
+import sfsslib
+import sfssddc
+import sfsszoning
+
+MAGIC = b'SFSSSNAP'
+VERSION = 1
+
+_HEADER = struct.Struct('<8sHI')
+
+# Sections that may be stored column-wise
+_COLUMNAR = ('hosts', 'subsystems', 'ddcs')
+
+
+# ******************************************************************************
+def _columnar(value):
+    '''@return: @value, with a list of dicts having the same keys stored as {'columns': [...], 'rows': [[...], ...]}'''
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        columns = list(value[0])
+        if all(item.keys() == value[0].keys() for item in value):
+            return {'columns': columns, 'rows': [[item[column] for column in columns] for item in value]}
+    return value
+
+
+def _rows(section: str, value):
+    '''Inverse of _columnar()'''
+    if section in _COLUMNAR and isinstance(value, dict):
+        columns = value['columns']
+        return [dict(zip(columns, row)) for row in value['rows']]
+    return value
+
+
+def save(path: str, snapshot: dict, endpoint: str = None, level: int = 6):
+    '''
+    Write @snapshot (see sfssfabric.take_snapshot()) to @path. The file is
+    written under a temporary name and renamed, so a reader never sees a
+    partial file.
+    @param endpoint: Address of the SFSS the snapshot was taken from, kept in the meta data
+    @param level: zlib compression level
+    @return: The size of the file
+    '''
+    meta = {'instance': snapshot.get('instance'), 'endpoint': endpoint, 'time': time.time()}
+    payloads = {}
+    for name, value in snapshot.items():
+        if name == 'instance':
+            continue
+        if name in _COLUMNAR:
+            value = _columnar(value)
+        payloads[name] = zlib.compress(json.dumps(value, separators=(',', ':')).encode(), level)
+
+    # The offsets depend on the size of the table of contents, which depends on the offsets
+    sections = {name: [0, len(payload)] for name, payload in payloads.items()}
+    while True:
+        toc = json.dumps({'meta': meta, 'sections': sections}, separators=(',', ':')).encode()
+        offset = _HEADER.size + len(toc)
+        changed = False
+        for name, payload in payloads.items():
+            if sections[name][0] != offset:
+                sections[name][0] = offset
+                changed = True
+            offset += len(payload)
+        if not changed:
+            break
+
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, len(toc)))
+        file.write(toc)
+        for payload in payloads.values():
+            file.write(payload)
+    os.replace(tmp, path)
+    return offset
+
+
+class Snapshot:
+    '''
+    A snapshot file, memory-mapped. snapshot[name] returns the decoded
+    section @name ('cdc', 'hosts', 'subsystems', 'ddcs', 'zonedbs'),
+    decompressing it on first use.
+    '''
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, toc_length = _HEADER.unpack_from(self._map)
+            if magic != MAGIC or version > VERSION:
+                raise ValueError(f'{path}: not a snapshot file, or an unsupported version')
+            toc = json.loads(self._map[_HEADER.size : _HEADER.size + toc_length])
+        except (struct.error, ValueError):
+            self._map.close()
+            raise
+        self.meta = toc['meta']
+        self._sections = toc['sections']
+        self._decoded = {}
+
+    @property
+    def instance(self):
+        return self.meta.get('instance')
+
+    @property
+    def sections(self):
+        return list(self._sections)
+
+    def __contains__(self, name: str):
+        return name in self._sections
+
+    def __getitem__(self, name: str):
+        value = self._decoded.get(name)
+        if value is None:
+            offset, length = self._sections[name]
+            value = self._decoded[name] = _rows(name, json.loads(zlib.decompress(self._map[offset : offset + length])))
+        return value
+
+    def get(self, name: str, default=None):
+        return self[name] if name in self._sections else default
+
+    def to_dict(self):
+        '''@return: The snapshot as returned by sfssfabric.take_snapshot()'''
+        return dict({name: self[name] for name in self._sections}, instance=self.instance)
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def load(path: str):
+    '''@return: A Snapshot'''
+    return Snapshot(path)
+
+
+# ******************************************************************************
+def zoning_spec(snapshot, zonedb: str = 'config'):
+    '''
+    @param snapshot: A Snapshot, or a dict as returned by sfssfabric.take_snapshot()
+    @return: The zones of ZoneDB @zonedb as a sfsszoning.Reconciler spec
+    '''
+    spec = {}
+    for zone_group_id, zones in snapshot['zonedbs'].get(zonedb, {}).items():
+        # Zone group IDs are "<zonedb>:<name>:<NQN>"
+        spec[zone_group_id.split(':')[1]] = {zone['ZoneName']: dict(zone['members']) for zone in zones.values()}
+    return spec
+
+
+def _ddc_key(ddc: dict):
+    return sfssddc.ddc_key(ddc.get('TransportType'), ddc.get('TransportAddress'), ddc.get('PortId'))
+
+
+def restore(
+    sfss: sfsslib.RestApi,
+    snapshot,
+    instance: int = None,
+    activate: bool = True,
+    ddcs: bool = True,
+    prune: bool = False,
+    max_workers: int = 16,
+):
+    '''
+    Re-create the DDCs and the config ZoneDB of @snapshot on CDC instance
+    @instance (by default the instance the snapshot was taken from), then
+    activate the zone groups that were active. Only the missing DDCs, zones
+    and members are created (see sfsszoning.Reconciler). Hosts and
+    subsystems register themselves and are not restored.
+    @param snapshot: A Snapshot, or a dict as returned by sfssfabric.take_snapshot()
+    @param prune: Delete the zone groups that are not in the snapshot
+    @return: (sfsszoning.ReconcilePlan, sfsszoning.ZoningResult)
+    '''
+    if instance is None:
+        instance = snapshot.instance if isinstance(snapshot, Snapshot) else snapshot['instance']
+
+    failures = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+        if ddcs:
+            existing = {_ddc_key(ddc) for ddc in sfss.get_ddcs(instance)}
+            missing = {}  # Normalized tuple -> DDC, the first one of each tuple
+            for ddc in snapshot.get('ddcs') or []:
+                key = _ddc_key(ddc)
+                if key not in existing:
+                    missing.setdefault(key, ddc)
+            futures = {
+                pool.submit(
+                    sfss.pull_register_ddc,
+                    instance,
+                    ddc['TransportType'],
+                    ddc['TransportAddress'],
+                    ddc['PortId'],
+                    ddc.get('Activate', False),  # Left inactive when the snapshot does not tell
+                ): ddc
+                for ddc in missing.values()
+            }
+            for future, ddc in futures.items():
+                try:
+                    error = '' if future.result() else 'rejected'
+                except Exception as ex:  # pylint: disable=broad-except
+                    error = str(ex)
+                if error:
+                    failures.append(sfsszoning.Failure('pull_register_ddc', ddc.get('Id', ''), error))
+
+    plan, result = sfsszoning.Reconciler(sfss, max_workers).reconcile(instance, zoning_spec(snapshot), prune)
+    result.failures[:0] = failures
+
+    if activate:
+        names = list(zoning_spec(snapshot, 'active'))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            errors = list(pool.map(lambda name: _activate(sfss, instance, name), names))
+        for name, error in zip(names, errors):
+            if error:
+                result.failures.append(sfsszoning.Failure('activate_zone_group', name, error))
+        result.activated = bool(names) and not any(errors)
+
+    return plan, result
+
+
+def _activate(sfss: sfsslib.RestApi, instance: int, zone_group_name: str):
+    '''@return: The reason why the zone group could not be activated, '' if it was'''
+    try:
+        zone_group_id = sfss.get_zone_group_id(instance, zone_group_name)
+        if zone_group_id is None:
+            return 'zone group not found'
+        return '' if sfss.activate_zone_group(instance, zone_group_id) else 'rejected'
+    except Exception as ex:  # pylint: disable=broad-except
+        return str(ex) or type(ex).__name__
@@ -0,0 +1,202 @@
+"""
+Copyright 2022 Dell Inc. or its subsidiaries. All Rights Reserved.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Change feed for the hosts and subsystems of a CDC instance.
+
+When the SFSS has an enabled Redfish EventService with a ServerSentEventUri,
+the Watcher subscribes to it and only fetches the resources named by the
+events (OriginOfCondition). Otherwise it polls the collections and diffs
+them against the previous poll. Only a 64-bit hash of the content of each
+item is kept between polls, not the items themselves.
+@example:
+   sfss = sfsslib.RestApi('1.2.3.4', 'admin', 'adminpass')
+   for event in sfsswatch.Watcher(sfss, 1).watch():
+       if event.kind == 'added' and event.collection == 'Hosts':
+           print(f'New host {event.item["NQN"]} at {event.item["TransportAddress"]}')
+"""
+
+import re
+import json
+import hashlib
+import threading
+import dataclasses
+import requests
+import sfsslib
+
+COLLECTIONS = ('Hosts', 'Subsystems')
+
+_ORIGIN = re.compile(r"SFSS/(?P<instance>\d+)/(?P<collection>\w+)(?:\('?(?P<id>[^)]*?)'?\))?$")
+
+# Redfish ResourceEvent registry MessageIds, and the deprecated Event.EventType values
+_KINDS = {
+    'ResourceCreated': 'added',
+    'ResourceAdded': 'added',
+    'ResourceRemoved': 'removed',
+    'ResourceChanged': 'changed',
+    'ResourceUpdated': 'changed',
+}
+
+
+@dataclasses.dataclass
+class Event:
+    '''A change to a host or subsystem'''
+
+    kind: str  # 'added', 'removed' or 'changed'
+    collection: str  # 'Hosts' or 'Subsystems'
+    id: str  # pylint: disable=invalid-name
+    item: dict = None  # The current host/subsystem dict, None when removed
+
+
+def _digest(item: dict):
+    '''@return: A hash of the content of @item, ignoring the @odata.* annotations'''
+    content = {key: value for key, value in item.items() if not key.startswith('@odata.')}
+    return hashlib.blake2b(json.dumps(content, sort_keys=True).encode(), digest_size=8).digest()
+
+
+class Watcher:
+    '''
+    Yield an Event for every host/subsystem added to, removed from or
+    changed in CDC instance @instance.
+    @param collections: The collections to watch, among COLLECTIONS
+    @param interval: Seconds between polls when the EventService is not used,
+        and before reconnecting to the event stream after a failure
+    @param use_events: Set to False to always poll
+    '''
+
+    def __init__(
+        self,
+        sfss: sfsslib.RestApi,
+        instance: int,
+        collections: tuple = COLLECTIONS,
+        interval: float = 5.0,
+        use_events: bool = True,
+    ):
+        self._sfss = sfss
+        self._instance = instance
+        self._interval = interval
+        self._use_events = use_events
+        self._state = {collection: None for collection in collections}  # collection -> {Id: digest}, None until read
+        self._stop = threading.Event()
+        self.mode = None  # 'events' or 'polling', once watch() started
+        self.errors = 0  # Polls that failed
+
+    def stop(self):
+        '''
+        Make watch() return. While subscribed to the event stream, this
+        happens when the next event or keep-alive comment is received.
+        '''
+        self._stop.set()
+
+    def poll(self):
+        '''
+        Read the watched collections and diff them against the previous call.
+        A collection that cannot be read is skipped (and compared again on the next call).
+        @return: The list of Events. The first call reports every item as 'added'.
+        '''
+        events = []
+        for collection, known in self._state.items():
+            oid = f'SFSS/{self._instance}/{collection}?$expand={collection}'
+            items = self._sfss.get_resource(oid).get(collection)
+            if items is None:
+                self.errors += 1
+                continue
+
+            known = known or {}
+            current = {}
+            for item in items:
+                item_id = item.get('Id')
+                digest = current[item_id] = _digest(item)
+                previous = known.get(item_id)
+                if previous is None:
+                    events.append(Event('added', collection, item_id, item))
+                elif previous != digest:
+                    events.append(Event('changed', collection, item_id, item))
+            events.extend(Event('removed', collection, item_id) for item_id in known.keys() - current.keys())
+            self._state[collection] = current
+        return events
+
+    def watch(self, initial: bool = False):
+        '''
+        Generator yielding Events until stop() is called.
+        @param initial: When True, start with an 'added' Event for every existing item
+        '''
+        self._stop.clear()
+        uri = None
+        if self._use_events:
+            service = self._sfss.get_event_service()
+            if service.get('ServiceEnabled') and service.get('ServerSentEventUri'):
+                uri = service['ServerSentEventUri']
+        self.mode = 'polling' if uri is None else 'events'
+
+        first = True
+        while not self._stop.is_set():
+            stream = None
+            if uri is not None:
+                try:
+                    # Subscribe before reading the collections so that no change falls in between
+                    stream = self._sfss.iter_events(uri)
+                except requests.RequestException:
+                    self.errors += 1
+
+            events = self.poll()
+            if not first or initial:
+                yield from events
+            first = False
+
+            if stream is not None:
+                try:
+                    for payload in stream:
+                        if payload is not None:
+                            yield from self._translate(payload)
+                        if self._stop.is_set():
+                            return
+                except requests.RequestException:
+                    pass  # Subscribe again, then catch up on the changes missed meanwhile
+                finally:
+                    stream.close()
+                if self._stop.is_set():
+                    return
+
+            self._stop.wait(self._interval)
+
+    def _translate(self, payload: dict):
+        '''@return: The Events corresponding to a Redfish Event payload'''
+        events = []
+        for record in payload.get('Events', []):
+            origin = (record.get('OriginOfCondition') or {}).get('@odata.id', '')
+            match = _ORIGIN.search(origin)
+            if match is None or match['instance'] != str(self._instance):
+                continue
+            collection = match['collection']
+            known = self._state.get(collection)
+            if known is None:
+                continue  # Not watched, or not read yet
+            if match['id'] is None:
+                events.extend(self.poll())  # The whole collection changed
+                continue
+
+            item_id = match['id']
+            kind = _KINDS.get(record.get('MessageId', '').rsplit('.', 1)[-1]) or _KINDS.get(record.get('EventType'))
+            if kind == 'removed':
+                if known.pop(item_id, None) is not None:
+                    events.append(Event('removed', collection, item_id))
+                continue
+
+            item = self._sfss.get_resource(origin)
+            if 'Id' not in item:
+                continue  # Gone already, or not readable: the removal event or the next poll will tell
+            digest = _digest(item)
+            previous = known.get(item_id)
+            if previous != digest:
+                known[item_id] = digest
+                events.append(Event('added' if previous is None else 'changed', collection, item_id, item))
+        return events
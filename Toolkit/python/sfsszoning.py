@@ -0,0 +1,411 @@
+"""
+Copyright 2022 Dell Inc. or its subsidiaries. All Rights Reserved.
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+    http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Bulk zoning and desired-state reconciliation on top of sfsslib.RestApi.
+"""
+
+import dataclasses
+import concurrent.futures
+import sfsslib
+
+
+@dataclasses.dataclass
+class ZonePlan:
+    '''A zone to create and the (member ID, role) pairs to add to it'''
+
+    name: str
+    members: list = dataclasses.field(default_factory=list)
+
+
+@dataclasses.dataclass
+class Failure:
+    '''An operation that the SFSS rejected (or that could not be sent)'''
+
+    operation: str
+    target: str
+    error: str = ''
+
+
+@dataclasses.dataclass
+class ZoningResult:
+    zone_group_id: str = None
+    zones: dict = dataclasses.field(default_factory=dict)  # zone name (Reconciler: (zone group name, zone name)) -> zone ID
+    members_added: int = 0
+    activated: bool = False
+    failures: list = dataclasses.field(default_factory=list)
+
+    @property
+    def ok(self):  # pylint: disable=invalid-name
+        return not self.failures
+
+
+def plan_host_zones(hosts: list, subsystems: list):
+    '''
+    Build one zone per host TransportAddress. Each zone contains the host(s)
+    using that address plus every subsystem.
+    @return: List of ZonePlan objects
+    '''
+    subsystem_members = [(subsystem['Id'], 'Subsystem') for subsystem in subsystems]
+    plans = {}
+    for host in hosts:
+        name = host['TransportAddress']
+        plan = plans.get(name)
+        if plan is None:
+            plan = plans[name] = ZonePlan(name)
+        plan.members.append((host['Id'], 'Host'))
+
+    for plan in plans.values():
+        plan.members.extend(subsystem_members)
+
+    return list(plans.values())
+
+
+class BulkZoner:
+    '''
+    Create many zones and zone members concurrently. Inventory is fetched
+    once per run and every create_zone/add_zone_member call is issued from a
+    pool of @max_workers threads. Errors are collected in the returned
+    ZoningResult instead of aborting the run.
+    @example:
+       sfss = sfsslib.RestApi('1.2.3.4', 'admin', 'adminpass', pool_size=32)
+       result = sfsszoning.BulkZoner(sfss, max_workers=32).zone_hosts(1, 'ZG-VLAN100')
+       for failure in result.failures:
+           print(failure)
+    '''
+
+    def __init__(self, sfss: sfsslib.RestApi, max_workers: int = 16, batch_size: int = 0):
+        '''
+        @param batch_size: When > 0, send the zones, then the members, with OData $batch
+            requests of up to that many operations (see sfsslib.RestApi.batch())
+        '''
+        self._sfss = sfss
+        self._max_workers = max_workers
+        self._batch_size = batch_size
+
+    def zone_hosts(self, instance: int, zone_group_name: str, activate: bool = True):
+        '''
+        Create zone group @zone_group_name with one zone per host (see
+        plan_host_zones()) and optionally activate it.
+        @return: A ZoningResult
+        '''
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
+            hosts = pool.submit(self._sfss.get_hosts, instance)
+            subsystems = pool.submit(self._sfss.get_subsystems, instance)
+            plans = plan_host_zones(hosts.result(), subsystems.result())
+
+        return self.apply(instance, zone_group_name, plans, activate)
+
+    def apply(self, instance: int, zone_group_name: str, plans: list, activate: bool = True):
+        '''
+        Create zone group @zone_group_name, the zones described by @plans
+        (a list of ZonePlan) and their members, then optionally activate the
+        zone group.
+        @return: A ZoningResult
+        '''
+        result = ZoningResult()
+        result.zone_group_id = self._sfss.create_zone_group(instance, zone_group_name)
+        if result.zone_group_id is None:
+            result.failures.append(Failure('create_zone_group', zone_group_name))
+            return result
+
+        if self._batch_size > 0:
+            self._create_batched(instance, result, plans)
+        else:
+            self._create(instance, result, plans)
+
+        if activate:
+            result.activated = self._sfss.activate_zone_group(instance, result.zone_group_id)
+            if not result.activated:
+                result.failures.append(Failure('activate_zone_group', result.zone_group_id))
+
+        return result
+
+    def _create(self, instance: int, result: ZoningResult, plans: list):
+        zone_group_id = result.zone_group_id
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers) as pool:
+            pending = {
+                pool.submit(self._sfss.create_zone, instance, zone_group_id, plan.name): ('create_zone', plan)
+                for plan in plans
+            }
+            while pending:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    operation, item = pending.pop(future)
+                    try:
+                        reply = future.result()
+                        error = ''
+                    except Exception as ex:  # pylint: disable=broad-except
+                        reply = None
+                        error = str(ex)
+
+                    if operation == 'create_zone':
+                        if reply is None:
+                            result.failures.append(Failure(operation, item.name, error))
+                            continue
+                        result.zones[item.name] = reply
+                        # The zone exists, its members can now be added in parallel
+                        for member, role in item.members:
+                            future = pool.submit(self._sfss.add_zone_member, instance, zone_group_id, reply, member, role)
+                            pending[future] = ('add_zone_member', f'{item.name}/{member}')
+                    elif reply is None:
+                        result.failures.append(Failure(operation, item, error))
+                    else:
+                        result.members_added += 1
+
+    def _create_batched(self, instance: int, result: ZoningResult, plans: list):
+        zone_group_id = result.zone_group_id
+        with self._sfss.batch(self._batch_size) as batch:
+            zones = [(plan, batch.create_zone(instance, zone_group_id, plan.name)) for plan in plans]
+
+        members = []
+        with self._sfss.batch(self._batch_size) as batch:
+            for plan, zone in zones:
+                zone_id, error = _outcome(zone)
+                if zone_id is None:
+                    result.failures.append(Failure('create_zone', plan.name, error))
+                    continue
+                result.zones[plan.name] = zone_id
+                for member, role in plan.members:
+                    added = batch.add_zone_member(instance, zone_group_id, zone_id, member, role)
+                    members.append((f'{plan.name}/{member}', added))
+
+        for target, added in members:
+            member_id, error = _outcome(added)
+            if member_id is None:
+                result.failures.append(Failure('add_zone_member', target, error))
+            else:
+                result.members_added += 1
+
+
+def _outcome(batch_result: sfsslib.BatchResult):
+    '''@return: (value, error message) of a sent batch call'''
+    try:
+        return batch_result.result(), ''
+    except Exception as ex:  # pylint: disable=broad-except
+        return None, str(ex)
+
+
+# ******************************************************************************
+@dataclasses.dataclass
+class Operation:
+    '''One write call of a ReconcilePlan'''
+
+    operation: str  # Name of the RestApi method to call
+    zone_group: str
+    zone: str = None
+    member: str = None
+    role: str = None
+    zone_group_id: str = None  # Known for existing zone groups
+    zone_id: str = None  # Known for existing zones
+
+    def __str__(self):
+        return ' '.join(str(field) for field in (self.operation, self.zone_group, self.zone, self.member) if field is not None)
+
+
+@dataclasses.dataclass
+class ReconcilePlan:
+    '''The writes needed to bring a CDC instance's config ZoneDB to the desired state'''
+
+    instance: int
+    operations: list = dataclasses.field(default_factory=list)
+    reads: int = 0  # Number of GET requests used to build the plan
+
+    def __len__(self):
+        return len(self.operations)
+
+    def count(self, operation: str):
+        return sum(1 for op in self.operations if op.operation == operation)
+
+
+class Reconciler:
+    '''
+    Bring the config ZoneDB of a CDC instance to a desired state with the
+    smallest set of writes. The desired state is a dict:
+        {zone_group_name: {zone_name: {member_id: role, ...}, ...}, ...}
+    where role is 'Host' or 'Subsystem'.
+
+    Zones that are not in the spec are deleted from the zone groups listed
+    in the spec. Zone groups that are not in the spec are only deleted when
+    @prune is True. The SFSS API has no call to remove a single zone member,
+    so a zone with unwanted members is deleted and re-created.
+    @example:
+       spec = {'ZG-VLAN100': {'10.10.10.1': {'nqn.2014-08.org.nvmexpress:uuid:...': 'Host',
+                                             'nqn.1988-11.com.dell:powerstore:...': 'Subsystem'}}}
+       reconciler = sfsszoning.Reconciler(sfss)
+       plan = reconciler.plan(1, spec)   # Dry run: no writes
+       print(f'{len(plan)} writes needed')
+       result = reconciler.apply(plan)
+    '''
+
+    def __init__(self, sfss: sfsslib.RestApi, max_workers: int = 16):
+        self._sfss = sfss
+        self._max_workers = max_workers
+
+    def reconcile(self, instance: int, spec: dict, prune: bool = False, dry_run: bool = False):
+        '''
+        Plan and, unless @dry_run is True, apply the changes.
+        @return: (ReconcilePlan, ZoningResult or None when @dry_run is True)
+        '''
+        plan = self.plan(instance, spec, prune)
+        return plan, None if dry_run else self.apply(plan)
+
+    def _current(self, instance: int, spec: dict):
+        '''
+        Read the current state of the zone groups that may need changes.
+        @return: ({zone_group_name: zone_group_id}, {zone_group_name: {zone_name: (zone_id, {member_id: role})}}, reads)
+        '''
+        zone_group_ids = {}
+        for zone_group_id in self._sfss.get_zone_group_ids(instance):
+            zone_group_ids.setdefault(zone_group_id.split(':')[1], zone_group_id)
+        reads = 1
+
+        current = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers) as pool:
+            zones = {
+                name: pool.submit(self._sfss.get_zones, instance, zone_group_id)
+                for name, zone_group_id in zone_group_ids.items()
+                if name in spec
+            }
+            members = {}
+            for zone_group_name, future in zones.items():
+                reads += 1
+                zone_group_id = zone_group_ids[zone_group_name]
+                for zone in future.result():
+                    zone_id = zone.get('ZoneId')
+                    future = pool.submit(self._sfss.get_zone_members, instance, zone_group_id, zone_id)
+                    members[(zone_group_name, zone.get('ZoneName'))] = (zone_id, future)
+
+            for (zone_group_name, zone_name), (zone_id, future) in members.items():
+                reads += 1
+                prefix = f'{zone_id}:'
+                current.setdefault(zone_group_name, {})[zone_name] = (
+                    zone_id,
+                    {
+                        # ZoneMemberId is reported as "<zone id>:<member id>"
+                        member['ZoneMemberId'].removeprefix(prefix): member.get('Role')
+                        for member in future.result()
+                    },
+                )
+
+        return zone_group_ids, current, reads
+
+    def plan(self, instance: int, spec: dict, prune: bool = False):
+        '''
+        Compare @spec with the config ZoneDB. Only GET requests are issued.
+        @return: A ReconcilePlan
+        '''
+        zone_group_ids, current, reads = self._current(instance, spec)
+        plan = ReconcilePlan(instance, reads=reads)
+        ops = plan.operations
+
+        if prune:
+            for zone_group_name, zone_group_id in zone_group_ids.items():
+                if zone_group_name not in spec:
+                    ops.append(Operation('delete_zone_group', zone_group_name, zone_group_id=zone_group_id))
+
+        for zone_group_name, zones in spec.items():
+            zone_group_id = zone_group_ids.get(zone_group_name)
+            if zone_group_id is None:
+                ops.append(Operation('create_zone_group', zone_group_name))
+
+            existing = current.get(zone_group_name, {})
+            for zone_name, (zone_id, _) in existing.items():
+                if zone_name not in zones:
+                    ops.append(Operation('delete_zone', zone_group_name, zone_name, zone_group_id=zone_group_id, zone_id=zone_id))
+
+            for zone_name, members in zones.items():
+                zone_id, current_members = existing.get(zone_name, (None, {}))
+                if zone_id is not None and any(members.get(member) != role for member, role in current_members.items()):
+                    # A member must be removed (or its role changed): re-create the zone
+                    ops.append(Operation('delete_zone', zone_group_name, zone_name, zone_group_id=zone_group_id, zone_id=zone_id))
+                    zone_id, current_members = None, {}
+
+                if zone_id is None:
+                    ops.append(Operation('create_zone', zone_group_name, zone_name, zone_group_id=zone_group_id))
+
+                for member, role in members.items():
+                    if member not in current_members:
+                        ops.append(
+                            Operation(
+                                'add_zone_member',
+                                zone_group_name,
+                                zone_name,
+                                member,
+                                role,
+                                zone_group_id=zone_group_id,
+                                zone_id=zone_id,
+                            )
+                        )
+
+        return plan
+
+    def apply(self, plan: ReconcilePlan):
+        '''
+        Execute @plan. Deletions run first, then zone group, zone and member
+        creations, each stage with up to @max_workers concurrent requests.
+        @return: A ZoningResult
+        '''
+        result = ZoningResult()
+        instance = plan.instance
+        zone_group_ids = {}
+        zone_ids = {}
+
+        def run(operation, calls):
+            '''Issue @calls [(Operation, args)] concurrently and return the Operations that succeeded with their reply'''
+            succeeded = []
+            futures = {pool.submit(getattr(self._sfss, operation), instance, *args): op for op, args in calls}
+            for future in concurrent.futures.as_completed(futures):
+                op = futures[future]
+                try:
+                    reply = future.result()
+                    error = ''
+                except Exception as ex:  # pylint: disable=broad-except
+                    reply = None
+                    error = str(ex)
+                if reply is None or reply is False:
+                    result.failures.append(Failure(operation, str(op), error))
+                else:
+                    succeeded.append((op, reply))
+            return succeeded
+
+        def stage(operation):
+            return [op for op in plan.operations if op.operation == operation]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers) as pool:
+            run('delete_zone_group', [(op, (op.zone_group_id,)) for op in stage('delete_zone_group')])
+            run('delete_zone', [(op, (op.zone_group_id, op.zone_id)) for op in stage('delete_zone')])
+
+            for op, reply in run('create_zone_group', [(op, (op.zone_group,)) for op in stage('create_zone_group')]):
+                zone_group_ids[op.zone_group] = reply
+
+            calls = []
+            for op in stage('create_zone'):
+                zone_group_id = op.zone_group_id or zone_group_ids.get(op.zone_group)
+                if zone_group_id is not None:
+                    calls.append((op, (zone_group_id, op.zone)))
+                else:
+                    result.failures.append(Failure(op.operation, str(op), 'parent not created'))
+            for op, reply in run('create_zone', calls):
+                zone_ids[(op.zone_group, op.zone)] = reply
+                result.zones[(op.zone_group, op.zone)] = reply
+
+            calls = []
+            for op in stage('add_zone_member'):
+                zone_group_id = op.zone_group_id or zone_group_ids.get(op.zone_group)
+                zone_id = op.zone_id or zone_ids.get((op.zone_group, op.zone))
+                if zone_group_id is not None and zone_id is not None:
+                    calls.append((op, (zone_group_id, zone_id, op.member, op.role)))
+                else:
+                    result.failures.append(Failure(op.operation, str(op), 'parent not created'))
+            result.members_added = len(run('add_zone_member', calls))
+
+        return result